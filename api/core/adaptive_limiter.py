@@ -0,0 +1,337 @@
+"""
+Limite adaptativo de concorrência para subprocessos Claude.
+
+Em vez de constantes fixas, o número de requisições simultâneas permitidas
+é ajustado continuamente a partir da latência observada (tempo até o
+primeiro token e duração do turno) e da carga da máquina (CPU e memória).
+Dois algoritmos estão disponíveis:
+
+- ``aimd``: aumento aditivo enquanto tudo está saudável, redução
+  multiplicativa quando há erro, latência alta ou máquina sobrecarregada.
+- ``gradient``: estilo Vegas; compara o TTFT atual com o menor TTFT recente
+  (linha de base sem fila) e escala o limite pelo gradiente.
+
+Requisições acima do limite esperam numa fila FIFO limitada; quando a fila
+está cheia ou a espera expira, ``ConcurrencyLimitExceeded`` é lançada com
+um ``retry_after`` sugerido, para o servidor responder 503 + Retry-After.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.logging_config import get_contextual_logger
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    psutil = None
+    PSUTIL_AVAILABLE = False
+
+logger = get_contextual_logger(__name__)
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """Lançada quando não há capacidade para atender a requisição."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class AdaptiveLimitConfig:
+    """Configuração do limite adaptativo."""
+    algorithm: str = "aimd"                 # "aimd" ou "gradient"
+    initial_limit: int = 4
+    min_limit: int = 1
+    max_limit: int = 10
+    max_queue_size: int = 20                # Requisições aguardando além do limite
+    queue_timeout_seconds: float = 30.0     # Espera máxima na fila
+
+    # Sinais de sobrecarga
+    ttft_threshold_seconds: float = 15.0    # TTFT acima disso conta como sobrecarga
+    cpu_high_percent: float = 85.0
+    memory_high_percent: float = 90.0
+    resource_sample_interval: float = 1.0   # Intervalo mínimo entre leituras psutil
+
+    # AIMD
+    backoff_ratio: float = 0.9
+
+    # Gradient
+    smoothing: float = 0.2
+    baseline_window: int = 100             # Amostras usadas para a linha de base
+
+    # Estatísticas
+    latency_window: int = 500              # Amostras mantidas para percentis
+
+
+class ConcurrencySlot:
+    """Vaga obtida no limitador; registra TTFT e resultado do turno."""
+
+    def __init__(self, limiter: "AdaptiveConcurrencyLimiter"):
+        self._limiter = limiter
+        self.started_at = time.monotonic()
+        self.first_token_at: Optional[float] = None
+        self.queue_wait: float = 0.0
+        self._released = False
+
+    def mark_first_token(self) -> None:
+        """Marca o momento do primeiro token recebido do modelo."""
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Tempo até o primeiro token em segundos."""
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    def release(self, error: bool = False) -> None:
+        """Devolve a vaga; chamadas repetidas são ignoradas."""
+        if self._released:
+            return
+        self._released = True
+        self._limiter._on_release(self, error)
+
+
+class AdaptiveConcurrencyLimiter:
+    """Limitador de requisições simultâneas com ajuste automático."""
+
+    def __init__(self, config: Optional[AdaptiveLimitConfig] = None):
+        self.config = config or AdaptiveLimitConfig()
+        if self.config.algorithm not in ("aimd", "gradient"):
+            raise ValueError(f"Algoritmo desconhecido: {self.config.algorithm}")
+
+        self._limit = float(self.config.initial_limit)
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        # Amostras de latência para percentis e linha de base
+        self._ttft_samples: Deque[float] = deque(maxlen=self.config.latency_window)
+        self._latency_samples: Deque[float] = deque(maxlen=self.config.latency_window)
+        self._baseline_samples: Deque[float] = deque(maxlen=self.config.baseline_window)
+
+        # Cache da leitura de recursos
+        self._last_resource_sample = 0.0
+        self._cpu_percent = 0.0
+        self._memory_percent = 0.0
+
+        self._stats = {
+            "admitted": 0,
+            "queued": 0,
+            "shed": 0,
+            "errors": 0,
+            "limit_increases": 0,
+            "limit_decreases": 0,
+        }
+
+    @property
+    def limit(self) -> int:
+        """Número atual de requisições simultâneas permitidas."""
+        return max(self.config.min_limit, int(self._limit))
+
+    @property
+    def queue_depth(self) -> int:
+        """Requisições aguardando vaga."""
+        return len(self._waiters)
+
+    async def acquire(self, timeout: Optional[float] = None) -> ConcurrencySlot:
+        """
+        Obtém uma vaga, aguardando na fila se necessário.
+
+        Raises:
+            ConcurrencyLimitExceeded: Fila cheia ou espera expirada
+        """
+        if self.in_flight < self.limit and not self._waiters:
+            return self._admit()
+
+        if len(self._waiters) >= self.config.max_queue_size:
+            self._stats["shed"] += 1
+            raise ConcurrencyLimitExceeded(
+                "Capacidade esgotada, tente novamente mais tarde",
+                retry_after=self._retry_after()
+            )
+
+        self._stats["queued"] += 1
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        started = time.monotonic()
+        wait_timeout = timeout if timeout is not None else self.config.queue_timeout_seconds
+
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), wait_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(fut)
+            self._stats["shed"] += 1
+            raise ConcurrencyLimitExceeded(
+                "Tempo de espera por capacidade esgotado",
+                retry_after=self._retry_after()
+            )
+        except asyncio.CancelledError:
+            self._abandon(fut)
+            raise
+
+        # A vaga já foi contabilizada em _wake_waiters
+        slot = ConcurrencySlot(self)
+        slot.queue_wait = time.monotonic() - started
+        return slot
+
+    def _admit(self) -> ConcurrencySlot:
+        """Contabiliza uma nova requisição em andamento."""
+        self.in_flight += 1
+        self._stats["admitted"] += 1
+        return ConcurrencySlot(self)
+
+    def _abandon(self, fut: asyncio.Future) -> None:
+        """Remove da fila um chamador que desistiu."""
+        if fut.done() and not fut.cancelled():
+            # A vaga foi concedida enquanto o chamador desistia
+            self.in_flight -= 1
+        else:
+            fut.cancel()
+            try:
+                self._waiters.remove(fut)
+            except ValueError:
+                pass
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        """Libera chamadores da fila enquanto houver vagas."""
+        while self._waiters and self.in_flight < self.limit:
+            fut = self._waiters.popleft()
+            if fut.done():
+                continue
+            self.in_flight += 1
+            self._stats["admitted"] += 1
+            fut.set_result(True)
+
+    def _on_release(self, slot: ConcurrencySlot, error: bool) -> None:
+        """Atualiza o limite com a amostra do turno e acorda a fila."""
+        self.in_flight -= 1
+        latency = time.monotonic() - slot.started_at
+        self._latency_samples.append(latency)
+        ttft = slot.ttft
+        if ttft is not None:
+            self._ttft_samples.append(ttft)
+            self._baseline_samples.append(ttft)
+        if error:
+            self._stats["errors"] += 1
+
+        overloaded = error or self._machine_overloaded() or (
+            ttft is not None and ttft > self.config.ttft_threshold_seconds
+        )
+
+        previous = self.limit
+        if self.config.algorithm == "gradient":
+            self._update_gradient(ttft, overloaded)
+        else:
+            self._update_aimd(overloaded)
+        self._limit = min(float(self.config.max_limit), max(float(self.config.min_limit), self._limit))
+
+        if self.limit > previous:
+            self._stats["limit_increases"] += 1
+        elif self.limit < previous:
+            self._stats["limit_decreases"] += 1
+            logger.warning(
+                "Limite de concorrência reduzido",
+                extra={
+                    "event": "concurrency_limit_decreased",
+                    "previous_limit": previous,
+                    "limit": self.limit,
+                    "ttft": ttft,
+                    "error": error,
+                    "cpu_percent": self._cpu_percent,
+                    "memory_percent": self._memory_percent,
+                }
+            )
+
+        self._wake_waiters()
+
+    def _update_aimd(self, overloaded: bool) -> None:
+        """Aumento aditivo / redução multiplicativa."""
+        if overloaded:
+            self._limit *= self.config.backoff_ratio
+        elif self.in_flight + 1 >= self.limit or self._waiters:
+            # Só cresce quando o limite está de fato sendo usado
+            self._limit += 1.0 / max(self._limit, 1.0)
+
+    def _update_gradient(self, ttft: Optional[float], overloaded: bool) -> None:
+        """Ajuste estilo Vegas pelo gradiente entre TTFT base e atual."""
+        if overloaded and ttft is None:
+            self._limit *= self.config.backoff_ratio
+            return
+        if ttft is None or not self._baseline_samples:
+            return
+
+        baseline = min(self._baseline_samples)
+        gradient = max(0.5, min(1.0, baseline / ttft)) if ttft > 0 else 1.0
+        if overloaded:
+            gradient = min(gradient, self.config.backoff_ratio)
+        queue_allowance = math.sqrt(self._limit)
+        target = self._limit * gradient + queue_allowance
+        self._limit += self.config.smoothing * (target - self._limit)
+
+    def _machine_overloaded(self) -> bool:
+        """Lê CPU e memória (no máximo uma vez por intervalo)."""
+        if not PSUTIL_AVAILABLE:
+            return False
+        now = time.monotonic()
+        if now - self._last_resource_sample >= self.config.resource_sample_interval:
+            self._last_resource_sample = now
+            try:
+                self._cpu_percent = psutil.cpu_percent(interval=None)
+                self._memory_percent = psutil.virtual_memory().percent
+            except Exception:
+                return False
+        return (
+            self._cpu_percent >= self.config.cpu_high_percent
+            or self._memory_percent >= self.config.memory_high_percent
+        )
+
+    def _retry_after(self) -> float:
+        """Estimativa de segundos até haver capacidade."""
+        if self._latency_samples:
+            typical = sorted(self._latency_samples)[len(self._latency_samples) // 2]
+        else:
+            typical = 5.0
+        waves = (len(self._waiters) + 1) / max(self.limit, 1)
+        return max(1.0, min(60.0, typical * waves))
+
+    @staticmethod
+    def _percentiles(samples: Deque[float]) -> Dict[str, Optional[float]]:
+        """Percentis p50/p95/p99 de uma janela de amostras."""
+        if not samples:
+            return {"p50": None, "p95": None, "p99": None}
+        ordered = sorted(samples)
+        last = len(ordered) - 1
+        return {
+            "p50": ordered[int(last * 0.50)],
+            "p95": ordered[int(last * 0.95)],
+            "p99": ordered[int(last * 0.99)],
+        }
+
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna estado atual do limitador."""
+        return {
+            "algorithm": self.config.algorithm,
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "min_limit": self.config.min_limit,
+            "max_limit": self.config.max_limit,
+            "cpu_percent": self._cpu_percent,
+            "memory_percent": self._memory_percent,
+            "ttft_seconds": self._percentiles(self._ttft_samples),
+            "latency_seconds": self._percentiles(self._latency_samples),
+            **self._stats,
+        }
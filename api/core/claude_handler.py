@@ -6,7 +6,7 @@ import asyncio
 import uuid
 import weakref
 import threading
-from typing import AsyncGenerator, Optional, Dict, Any, List
+from typing import AsyncGenerator, Optional, Dict, Any, List, Set
 import json
 import time
 from datetime import datetime, timedelta
@@ -17,9 +17,21 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.logging_config import get_contextual_logger
+from utils.logging_config import configure_log_event, get_contextual_logger
 from middleware.exception_middleware import handle_errors
 from core.session_manager import ClaudeCodeSessionManager
+from core.adaptive_limiter import (
+    AdaptiveConcurrencyLimiter,
+    AdaptiveLimitConfig,
+    ConcurrencyLimitExceeded,
+    ConcurrencySlot,
+)
+from core.process_resources import ProcessResourceSampler, ResourceLimits
+from monitoring.stability_monitor import (
+    CircuitBreakerOpenException,
+    SlidingWindowConfig,
+    stability_monitor,
+)
 
 # Adiciona o diretório do SDK ao path  
 sdk_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'sdk')
@@ -37,6 +49,21 @@ from claude_code_sdk import (
     ClaudeCodeOptions,
     __version__
 )
+from claude_code_sdk._internal.query import Query
+from claude_code_sdk.tracing import current_span, get_tracer, traced
+
+from monitoring import metrics
+
+metrics.install_sdk_hooks(Query)
+
+# Eventos de hot path: registrados sem sobrescrever a configuração da aplicação
+configure_log_event("client_from_pool", every_n=100, replace=False)
+configure_log_event("client_returned_to_pool", every_n=100, replace=False)
+configure_log_event("client_options", rate_per_second=1, burst=10, replace=False)
+configure_log_event("client_created", rate_per_second=1, burst=10, replace=False)
+for _event in ("session_create_start", "session_created", "session_destroy_start",
+               "session_destroyed", "client_pooled_on_destroy"):
+    configure_log_event(_event, rate_per_second=5, burst=50, replace=False)
 
 @dataclass
 class SessionConfig:
@@ -57,6 +84,7 @@ class SessionHistory:
     messages: List[Dict[str, Any]] = field(default_factory=list)
     total_tokens: int = 0
     total_cost: float = 0.0
+    cli_session_id: Optional[str] = None  # Sessão do CLI, usada para --resume ao reciclar
 
 @dataclass
 class PooledConnection:
@@ -77,6 +105,11 @@ class ClaudeHandler:
     CONNECTION_MAX_USES = 100
     HEALTH_CHECK_INTERVAL = 300  # 5 minutos
     
+    # Reciclagem por recursos do subprocesso (verificada entre turnos)
+    RECYCLE_MAX_RSS_MB = 1536
+    RECYCLE_MAX_CPU_SECONDS = 3600
+    RECYCLE_MAX_OPEN_FDS = 1024
+    
     def __init__(self):
         self.clients: Dict[str, ClaudeSDKClient] = {}
         self.active_sessions: Dict[str, bool] = {}
@@ -95,6 +128,37 @@ class ClaudeHandler:
         self.pool_maintenance_task = None
         self._pool_maintenance_started = False
         
+        # Limite adaptativo de turnos simultâneos (subprocessos CLI ativos)
+        self.concurrency_limiter = AdaptiveConcurrencyLimiter(
+            AdaptiveLimitConfig(max_limit=self.POOL_MAX_SIZE)
+        )
+        
+        # Circuit breaker do caminho Claude: taxa de turnos com erro e de TTFT lento
+        self.circuit_breaker = stability_monitor.register_sliding_window_breaker(
+            "claude",
+            SlidingWindowConfig(
+                window_seconds=120.0,
+                bucket_seconds=10.0,
+                minimum_calls=5,
+                slow_call_duration=30.0,
+                open_seconds=30.0
+            )
+        )
+        
+        # RSS/CPU/fds dos subprocessos do CLI e política de reciclagem
+        self.resource_sampler = ProcessResourceSampler()
+        self.resource_limits = ResourceLimits(
+            max_rss_mb=self.RECYCLE_MAX_RSS_MB,
+            max_cpu_seconds=self.RECYCLE_MAX_CPU_SECONDS,
+            max_open_fds=self.RECYCLE_MAX_OPEN_FDS
+        )
+        # Turnos em andamento por cliente (id do objeto): um cliente reciclado
+        # só é desconectado quando o último turno que o usa termina
+        self._client_turns: Dict[int, int] = {}
+        self._retiring_clients: Dict[int, ClaudeSDKClient] = {}
+        self._recycling: Set[str] = set()
+        self._background_tasks: Set[asyncio.Task] = set()
+        
         self.logger.info(
             "Claude Handler inicializado com pool de conexões",
             extra={
@@ -109,6 +173,7 @@ class ClaudeHandler:
             }
         )
         
+    @traced("session.create")
     @handle_errors(timeout_seconds=30.0)
     async def create_session(self, session_id: str, config: Optional[SessionConfig] = None) -> None:
         """Cria uma nova sessão de chat com configuração opcional."""
@@ -251,13 +316,91 @@ class ClaudeHandler:
     async def send_message(
         self, 
         session_id: str, 
-        message: str
+        message: str,
+        slot: Optional[ConcurrencySlot] = None
     ) -> AsyncGenerator[Dict[str, Any], None]:
-        """Envia mensagem e retorna stream de respostas - FORÇA SESSION ID FIXO."""
+        """Envia mensagem e retorna stream de respostas - FORÇA SESSION ID FIXO.
+        
+        Args:
+            session_id: ID da sessão
+            message: Mensagem do usuário
+            slot: Vaga já obtida em ``concurrency_limiter`` (o servidor obtém
+                antes de abrir o stream para poder responder 503); se omitida,
+                é obtida aqui
+        """
         
         # FORÇA usar sempre o session ID unificado
         UNIFIED_SESSION_ID = "00000000-0000-0000-0000-000000000001"
         session_id = UNIFIED_SESSION_ID  # SEMPRE usa o ID fixo
+        real_session_id = UNIFIED_SESSION_ID
+        
+        # Circuito aberto: falha imediata em vez de esperar timeouts do CLI
+        try:
+            breaker_started = self.circuit_breaker.acquire()
+        except CircuitBreakerOpenException as e:
+            if slot is not None:
+                slot.release()
+            yield {
+                "type": "error",
+                "error": str(e),
+                "retry_after": e.retry_after,
+                "session_id": real_session_id
+            }
+            return
+        
+        if slot is None:
+            try:
+                slot = await self.concurrency_limiter.acquire()
+            except ConcurrencyLimitExceeded as e:
+                self.circuit_breaker.release(breaker_started)
+                yield {
+                    "type": "error",
+                    "error": str(e),
+                    "retry_after": e.retry_after,
+                    "session_id": real_session_id
+                }
+                return
+            except BaseException:
+                # Cancelado na fila: devolve a vaga de teste do circuito
+                self.circuit_breaker.release(breaker_started)
+                raise
+        
+        turn_failed = False
+        interrupted = False
+        try:
+            with get_tracer().span(
+                "chat.turn",
+                session_id=real_session_id,
+                queue_wait_ms=slot.queue_wait * 1000
+            ) as span:
+                async for event in self._send_message_stream(session_id, message, slot):
+                    if event.get("type") == "error":
+                        turn_failed = True
+                        span.set_attribute("error", event.get("error"))
+                    yield event
+        except BaseException as e:
+            turn_failed = True
+            interrupted = not isinstance(e, Exception)  # Cliente desconectou/cancelou
+            raise
+        finally:
+            metrics.observe_turn(slot, turn_failed)
+            slot.release(error=turn_failed)
+            if interrupted:
+                self.circuit_breaker.release(breaker_started)
+            else:
+                # Lentidão medida pelo TTFT: turnos longos com ferramentas são normais
+                self.circuit_breaker.record(breaker_started, failed=turn_failed, duration=slot.ttft)
+        
+        # Entre turnos: contabiliza recursos e recicla o cliente se passou dos limites
+        await self._account_client_resources(session_id)
+    
+    async def _send_message_stream(
+        self,
+        session_id: str,
+        message: str,
+        slot: ConcurrencySlot
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Executa o turno no cliente SDK e converte mensagens em eventos."""
         
         # Cria sessão se não existir
         if session_id not in self.clients:
@@ -266,9 +409,14 @@ class ClaudeHandler:
         # Atualiza atividade da sessão
         self.session_manager.update_session_activity(session_id)
             
-        # Usa sempre o session_id unificado
-        real_session_id = UNIFIED_SESSION_ID
+        real_session_id = session_id
         client = self.clients[session_id]
+        self._begin_client_turn(client)
+        
+        # Spans explícitos: o modelo e cada ferramenta (tool_use até tool_result)
+        tracer = get_tracer()
+        model_span = tracer.start_span("model.response", session_id=session_id)
+        tool_spans: Dict[str, Any] = {}
         
         try:
             # Notifica que começou a processar
@@ -284,6 +432,9 @@ class ClaudeHandler:
             # SIMPLIFICADO - Recebe resposta e envia em chunks
             async for msg in client.receive_response():
                 if isinstance(msg, AssistantMessage):
+                    if slot.first_token_at is None:
+                        model_span.add_event("first_token")
+                    slot.mark_first_token()
                     for block in msg.content:
                         if isinstance(block, TextBlock):
                             # Pega o texto completo
@@ -301,6 +452,9 @@ class ClaudeHandler:
                                     }
                         
                         elif isinstance(block, ToolUseBlock):
+                            tool_spans[block.id] = tracer.start_span(
+                                f"tool.{block.name}", parent=model_span, tool_use_id=block.id
+                            )
                             yield {
                                 "type": "tool_use",
                                 "tool": block.name,
@@ -319,6 +473,9 @@ class ClaudeHandler:
                 elif isinstance(msg, UserMessage):
                     for block in msg.content:
                         if isinstance(block, ToolResultBlock):
+                            tool_span = tool_spans.pop(block.tool_use_id, None)
+                            if tool_span is not None:
+                                tool_span.end(error="tool_error" if block.is_error else None)
                             yield {
                                 "type": "tool_result",
                                 "tool_id": block.tool_use_id,
@@ -331,6 +488,10 @@ class ClaudeHandler:
                     # Ignora completamente o que o SDK retorna
                     sdk_session_id = session_id  # Força usar o original SEMPRE
                     
+                    # Guarda a sessão do CLI só para retomar a conversa ao reciclar o cliente
+                    if session_id in self.session_histories and getattr(msg, 'session_id', None):
+                        self.session_histories[session_id].cli_session_id = msg.session_id
+                    
                     # Não tenta pegar session_id do SDK para manter consistência
                     # sdk_session_id = getattr(msg, 'session_id', None)  # DESABILITADO
                     
@@ -378,6 +539,13 @@ class ClaudeHandler:
                                     message_count=len(history.messages) + 1
                                 )
                             
+                    session_config = self.session_configs.get(session_id)
+                    metrics.record_usage(
+                        session_config.project_id if session_config else "unknown",
+                        getattr(msg, 'usage', None),
+                        getattr(msg, 'total_cost_usd', None)
+                    )
+                    
                     if hasattr(msg, 'total_cost_usd') and msg.total_cost_usd:
                         result_data["cost_usd"] = msg.total_cost_usd
                         # Atualiza custo total
@@ -405,11 +573,17 @@ class ClaudeHandler:
             except:
                 pass  # Não deixa falhas de métricas impedirem relatório de erro
             
+            model_span.record_exception(e)
             yield {
                 "type": "error",
                 "error": str(e),
                 "session_id": real_session_id
             }
+        finally:
+            for tool_span in tool_spans.values():
+                tool_span.end(error="no tool_result")
+            model_span.end()
+            self._end_client_turn(client)
             
     async def interrupt_session(self, session_id: str) -> bool:
         """Interrompe a execução atual."""
@@ -434,6 +608,7 @@ class ClaudeHandler:
             
         config = self.session_configs.get(session_id, SessionConfig())
         history = self.session_histories.get(session_id, SessionHistory())
+        resources = self.resource_sampler.last(self.clients[session_id].pid)
         
         return {
             "session_id": session_id,
@@ -450,7 +625,8 @@ class ClaudeHandler:
                 "message_count": len(history.messages),
                 "total_tokens": history.total_tokens,
                 "total_cost": history.total_cost
-            }
+            },
+            "resources": resources.to_dict() if resources else None
         }
         
     async def get_all_sessions(self) -> List[Dict[str, Any]]:
@@ -477,6 +653,156 @@ class ClaudeHandler:
         
         return True
     
+    # ===========================================
+    # RECURSOS DOS SUBPROCESSOS DO CLI
+    # ===========================================
+    
+    async def _account_client_resources(self, session_id: str) -> None:
+        """Amostra RSS/CPU/fds do subprocesso da sessão e recicla se necessário."""
+        client = self.clients.get(session_id)
+        if client is None or not self.resource_sampler.available:
+            return
+        
+        try:
+            resources = await asyncio.to_thread(self.resource_sampler.sample, client.pid)
+        except Exception as e:
+            self.logger.warning(
+                "Falha ao amostrar recursos do subprocesso",
+                extra={"event": "process_resources_error", "session_id": session_id, "error": str(e)}
+            )
+            return
+        if resources is None:
+            return
+        
+        self.session_manager.update_session_metrics(
+            session_id,
+            rss_bytes=resources.rss_bytes,
+            peak_rss_bytes=resources.peak_rss_bytes,
+            cpu_seconds=resources.cpu_seconds,
+            open_fds=resources.open_fds
+        )
+        
+        reason = self.resource_limits.exceeded(resources)
+        if reason:
+            await self._recycle_session_client(session_id, client, reason, resources)
+    
+    def _begin_client_turn(self, client: ClaudeSDKClient) -> None:
+        self._client_turns[id(client)] = self._client_turns.get(id(client), 0) + 1
+    
+    def _end_client_turn(self, client: ClaudeSDKClient) -> None:
+        """Fim de um turno; desconecta o cliente reciclado quando ficar ocioso."""
+        key = id(client)
+        remaining = self._client_turns.get(key, 1) - 1
+        if remaining > 0:
+            self._client_turns[key] = remaining
+            return
+        self._client_turns.pop(key, None)
+        retiring = self._retiring_clients.pop(key, None)
+        if retiring is not None:
+            task = asyncio.create_task(self._disconnect_client(retiring))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+    
+    async def _disconnect_client(self, client: ClaudeSDKClient) -> None:
+        try:
+            await asyncio.wait_for(client.disconnect(), timeout=10.0)
+        except Exception:
+            pass
+    
+    async def _recycle_session_client(
+        self, session_id: str, old_client: ClaudeSDKClient, reason: str, resources
+    ) -> None:
+        """
+        Troca o cliente da sessão por um novo, retomando a conversa do CLI.
+        
+        Turnos concorrentes podem estar lendo do cliente antigo (a sessão é
+        compartilhada): novos turnos já vão para o substituto e o antigo só é
+        desconectado quando o último turno em andamento termina.
+        """
+        if session_id in self._recycling or self.clients.get(session_id) is not old_client:
+            return  # Outro turno já está reciclando (ou reciclou) este cliente
+        self._recycling.add(session_id)
+        try:
+            await self._replace_session_client(session_id, old_client, reason, resources)
+        finally:
+            self._recycling.discard(session_id)
+    
+    async def _replace_session_client(
+        self, session_id: str, old_client: ClaudeSDKClient, reason: str, resources
+    ) -> None:
+        config = self.session_configs.get(session_id, SessionConfig())
+        history = self.session_histories.get(session_id)
+        resume = history.cli_session_id if history else None
+        
+        self.logger.warning(
+            "Reciclando cliente por uso de recursos",
+            extra={
+                "event": "client_recycled",
+                "session_id": session_id,
+                "reason": reason,
+                "resume": bool(resume),
+                "resources": resources.to_dict()
+            }
+        )
+        
+        try:
+            new_client = await self._create_new_client(config, resume=resume)
+        except Exception as e:
+            # Mantém o cliente antigo: melhor pesado do que sem sessão
+            self.logger.error(
+                "Falha ao criar cliente substituto, mantendo o atual",
+                extra={"event": "client_recycle_error", "session_id": session_id, "error": str(e)}
+            )
+            return
+        
+        if self.clients.get(session_id) is not old_client:
+            # Sessão destruída ou recriada enquanto o substituto subia
+            await self._disconnect_client(new_client)
+            return
+        
+        self.clients[session_id] = new_client
+        metrics.CLI_RECYCLES_TOTAL.labels(reason).inc()
+        current = self.session_manager.get_session_metrics(session_id)
+        self.session_manager.update_session_metrics(
+            session_id, client_recycles=(current.client_recycles if current else 0) + 1
+        )
+        
+        self.resource_sampler.forget(resources.pid)
+        if self._client_turns.get(id(old_client)):
+            self._retiring_clients[id(old_client)] = old_client
+        else:
+            await self._disconnect_client(old_client)
+    
+    def get_resource_usage(self) -> Dict[str, Any]:
+        """Última amostra de recursos por sessão e o total agregado."""
+        sessions = {}
+        for session_id, client in self.clients.items():
+            resources = self.resource_sampler.last(client.pid)
+            session_metrics = self.session_manager.get_session_metrics(session_id)
+            sessions[session_id] = {
+                "resources": resources.to_dict() if resources else None,
+                "client_recycles": session_metrics.client_recycles if session_metrics else 0
+            }
+        
+        sampled = [s["resources"] for s in sessions.values() if s["resources"]]
+        return {
+            "sampling_available": self.resource_sampler.available,
+            "limits": {
+                "max_rss_mb": self.resource_limits.max_rss_mb,
+                "max_cpu_seconds": self.resource_limits.max_cpu_seconds,
+                "max_open_fds": self.resource_limits.max_open_fds
+            },
+            "totals": {
+                "sessions_sampled": len(sampled),
+                "rss_bytes": sum(r["rss_bytes"] for r in sampled),
+                "max_rss_bytes": max((r["rss_bytes"] for r in sampled), default=0),
+                "cpu_seconds": round(sum(r["cpu_seconds"] for r in sampled), 3),
+                "open_fds": sum(r["open_fds"] for r in sampled),
+                "client_recycles": sum(s["client_recycles"] for s in sessions.values())
+            },
+            "sessions": sessions
+        }
+    
     # ===========================================
     # POOL DE CONEXÕES OTIMIZADO
     # ===========================================
@@ -507,6 +833,10 @@ class ClaudeHandler:
     
     async def _maintain_pool(self):
         """Mantém o pool de conexões removendo conexões antigas e não saudáveis."""
+        # psutil é síncrono: amostra todo o pool numa thread, fora do event loop
+        pids = [conn.client.pid for conn in list(self.connection_pool)]
+        samples = await asyncio.to_thread(self._sample_pids, pids) if self.resource_sampler.available else {}
+        
         with self.pool_lock:
             now = datetime.now()
             connections_to_remove = []
@@ -526,10 +856,19 @@ class ClaudeHandler:
                 # Remove conexões não saudáveis
                 if not conn.is_healthy:
                     connections_to_remove.append(i)
+                    continue
+                
+                # Remove conexões cujo subprocesso passou dos limites de recursos
+                resources = samples.get(conn.client.pid)
+                reason = resources and self.resource_limits.exceeded(resources)
+                if reason:
+                    metrics.CLI_RECYCLES_TOTAL.labels(reason).inc()
+                    connections_to_remove.append(i)
             
             # Remove conexões identificadas (em ordem reversa)
             for i in reversed(connections_to_remove):
                 removed_conn = self.connection_pool.pop(i)
+                self.resource_sampler.forget(removed_conn.client.pid)
                 try:
                     await removed_conn.client.disconnect()
                 except:
@@ -541,6 +880,9 @@ class ClaudeHandler:
                     extra={"event": "pool_cleanup", "removed_count": len(connections_to_remove)}
                 )
     
+    def _sample_pids(self, pids: List[Optional[int]]) -> Dict[int, Any]:
+        return {pid: self.resource_sampler.sample(pid) for pid in pids if pid is not None}
+    
     async def _health_check_pool(self):
         """Verifica saúde das conexões no pool."""
         with self.pool_lock:
@@ -555,11 +897,18 @@ class ClaudeHandler:
         except Exception:
             return False
     
+    @traced("pool.acquire")
     async def _get_or_create_pooled_client(self, config: SessionConfig) -> ClaudeSDKClient:
         """Obtém cliente do pool ou cria um novo."""
+        started = time.perf_counter()
+        
         # Tenta obter do pool primeiro
         pooled_client = await self._get_from_pool()
+        span = current_span()
         if pooled_client:
+            metrics.POOL_ACQUIRE_SECONDS.labels("pool").observe(time.perf_counter() - started)
+            if span:
+                span.set_attribute("source", "pool")
             self.logger.info(
                 "Cliente obtido do pool",
                 extra={"event": "client_from_pool", "pool_size": len(self.connection_pool)}
@@ -567,7 +916,11 @@ class ClaudeHandler:
             return pooled_client
         
         # Se não há cliente disponível no pool, cria novo
-        return await self._create_new_client(config)
+        if span:
+            span.set_attribute("source", "new")
+        client = await self._create_new_client(config)
+        metrics.POOL_ACQUIRE_SECONDS.labels("new").observe(time.perf_counter() - started)
+        return client
     
     async def _get_from_pool(self) -> Optional[ClaudeSDKClient]:
         """Obtém cliente saudável do pool."""
@@ -582,15 +935,17 @@ class ClaudeHandler:
         
         return None
     
-    async def _create_new_client(self, config: SessionConfig) -> ClaudeSDKClient:
-        """Cria novo cliente SDK."""
+    @traced("cli.connect")
+    async def _create_new_client(self, config: SessionConfig, resume: Optional[str] = None) -> ClaudeSDKClient:
+        """Cria novo cliente SDK (``resume``: sessão do CLI a retomar)."""
         # SEMPRE cria opções para garantir que permission_mode seja aplicado
         options = ClaudeCodeOptions(
             system_prompt=config.system_prompt if config.system_prompt else None,
             allowed_tools=config.allowed_tools if config.allowed_tools else None,
             max_turns=config.max_turns if config.max_turns else None,
             permission_mode=config.permission_mode,  # SEMPRE inclui bypass
-            cwd=config.cwd if config.cwd else None
+            cwd=config.cwd if config.cwd else None,
+            resume=resume
         )
 
         # Log de debug para verificar permissões
@@ -605,7 +960,9 @@ class ClaudeHandler:
         )
 
         client = ClaudeSDKClient(options=options)
+        started = time.perf_counter()
         await asyncio.wait_for(client.connect(), timeout=20.0)
+        metrics.CLI_CONNECT_SECONDS.observe(time.perf_counter() - started)
 
         self.logger.info(
             "Novo cliente criado com bypass permissions",
@@ -0,0 +1,155 @@
+"""
+Requisições hedged para leituras idempotentes.
+
+Depois de um atraso igual ao p95 recente da operação, se a primeira
+tentativa ainda não respondeu, uma segunda é disparada (tipicamente contra
+outro access node); vale a primeira resposta bem-sucedida e a perdedora é
+cancelada. Como só ~5% das chamadas passam do p95, o tráfego extra é
+pequeno; o ``HedgeBudget`` garante o teto mesmo quando a latência piora
+de uma vez (todas as chamadas lentas ao mesmo tempo).
+
+Use apenas para operações sem efeito colateral: as duas tentativas podem
+chegar ao servidor.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sdk'))
+
+from claude_code_sdk.quantiles import WindowedQuantileSketch
+
+T = TypeVar("T")
+
+
+@dataclass
+class HedgePolicy:
+    """Configuração do hedging (desligado por padrão)."""
+    enabled: bool = False
+    quantile: float = 0.95          # Atraso do hedge = este quantil da latência recente
+    min_delay: float = 0.05         # Limites do atraso em segundos
+    max_delay: float = 2.0
+    min_samples: int = 20           # Antes disso usa max_delay
+    budget_ratio: float = 0.1       # Hedges permitidos por chamada primária (10%)
+    budget_burst: float = 10.0      # Hedges acumuláveis
+    window_seconds: float = 300.0   # Janela da latência observada
+
+
+class HedgeBudget:
+    """Token bucket proporcional ao tráfego: cada chamada rende ``ratio`` tokens."""
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+
+    def deposit(self) -> None:
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+class HedgedExecutor:
+    """
+    Executa leituras com hedging por operação.
+
+    ``attempt(n)`` cria a n-ésima tentativa (0 = primária, 1 = hedge), o que
+    permite mandar o hedge para outro endpoint.
+
+    Exemplo:
+        hedger = HedgedExecutor(HedgePolicy(enabled=True))
+        account = await hedger.run("get_account", lambda n: fetch(endpoints[n], address))
+    """
+
+    def __init__(self, policy: Optional[HedgePolicy] = None):
+        self.policy = policy or HedgePolicy()
+        self.budget = HedgeBudget(self.policy.budget_ratio, self.policy.budget_burst)
+        self._latencies: Dict[str, WindowedQuantileSketch] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _operation(self, operation: str):
+        latencies = self._latencies.get(operation)
+        if latencies is None:
+            latencies = self._latencies[operation] = WindowedQuantileSketch(
+                window_seconds=self.policy.window_seconds
+            )
+            self._stats[operation] = {
+                "calls": 0, "hedged": 0, "hedge_won": 0, "budget_denied": 0, "errors": 0
+            }
+        return latencies, self._stats[operation]
+
+    def hedge_delay(self, operation: str) -> float:
+        """Atraso antes do hedge: quantil recente limitado a [min_delay, max_delay]."""
+        latencies, _ = self._operation(operation)
+        snapshot = latencies.snapshot()
+        if len(snapshot) < self.policy.min_samples:
+            return self.policy.max_delay
+        delay = snapshot.quantile(self.policy.quantile)
+        return min(max(delay, self.policy.min_delay), self.policy.max_delay)
+
+    async def run(self, operation: str, attempt: Callable[[int], Awaitable[T]]) -> T:
+        """Executa a leitura; devolve a primeira resposta bem-sucedida."""
+        latencies, stats = self._operation(operation)
+        stats["calls"] += 1
+        started = time.perf_counter()
+
+        if not self.policy.enabled:
+            try:
+                result = await attempt(0)
+            except Exception:
+                stats["errors"] += 1
+                raise
+            latencies.add(time.perf_counter() - started)
+            return result
+
+        self.budget.deposit()
+        primary = asyncio.ensure_future(attempt(0))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay(operation))
+            if not done:
+                if self.budget.withdraw():
+                    stats["hedged"] += 1
+                    pending.add(asyncio.ensure_future(attempt(1)))
+                else:
+                    stats["budget_denied"] += 1
+
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        # Com hedge vencedor, o valor é um limite inferior da latência da primária
+                        latencies.add(time.perf_counter() - started)
+                        if task is not primary:
+                            stats["hedge_won"] += 1
+                        return task.result()
+                    error = task.exception()
+            stats["errors"] += 1
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores, atraso atual e percentis por operação."""
+        return {
+            "enabled": self.policy.enabled,
+            "budget_tokens": round(self.budget.tokens, 2),
+            "operations": {
+                operation: {
+                    **stats,
+                    "hedge_delay_ms": round(self.hedge_delay(operation) * 1000, 1),
+                    "latency_seconds": self._latencies[operation].summary(),
+                }
+                for operation, stats in self._stats.items()
+            },
+        }
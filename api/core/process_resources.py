@@ -0,0 +1,154 @@
+"""
+Contabilidade de recursos dos subprocessos do CLI.
+
+Cada cliente do SDK mantém um subprocesso do Claude Code (Node) que pode
+abrir filhos próprios (ferramentas, shells). ``ProcessResourceSampler`` lê,
+via psutil, RSS, tempo de CPU e descritores abertos do processo e de toda
+a sua árvore; ``ResourceLimits`` decide se um cliente deve ser reciclado.
+
+As leituras são feitas entre turnos (e na manutenção do pool), nunca no
+caminho do streaming. Sem psutil instalado, a amostragem fica desativada.
+"""
+
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.logging_config import get_contextual_logger
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    psutil = None
+    PSUTIL_AVAILABLE = False
+
+logger = get_contextual_logger(__name__)
+
+
+@dataclass
+class ProcessResources:
+    """Uso de recursos de um subprocesso do CLI e dos seus filhos."""
+    pid: int
+    rss_bytes: int
+    peak_rss_bytes: int
+    cpu_seconds: float
+    cpu_percent: Optional[float]   # Média desde a amostra anterior
+    open_fds: int
+    children: int
+    sampled_at: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class ResourceLimits:
+    """Limites acima dos quais o cliente é reciclado entre turnos (None desliga)."""
+    max_rss_mb: Optional[float] = 1536
+    max_cpu_seconds: Optional[float] = 3600
+    max_open_fds: Optional[int] = 1024
+
+    def exceeded(self, resources: ProcessResources) -> Optional[str]:
+        """Motivo da reciclagem (``rss``, ``cpu`` ou ``fds``) ou None."""
+        if self.max_rss_mb is not None and resources.rss_bytes > self.max_rss_mb * 1024 * 1024:
+            return "rss"
+        if self.max_cpu_seconds is not None and resources.cpu_seconds > self.max_cpu_seconds:
+            return "cpu"
+        if self.max_open_fds is not None and resources.open_fds > self.max_open_fds:
+            return "fds"
+        return None
+
+
+class ProcessResourceSampler:
+    """
+    Amostra recursos por PID, guardando o pico de RSS e a CPU anterior.
+
+    As chamadas ao psutil são síncronas (alguns syscalls por processo da
+    árvore); no event loop, use ``asyncio.to_thread(sampler.sample, pid)``.
+    """
+
+    def __init__(self):
+        self._processes: Dict[int, Any] = {}
+        self._last: Dict[int, ProcessResources] = {}
+
+    @property
+    def available(self) -> bool:
+        return PSUTIL_AVAILABLE
+
+    def sample(self, pid: Optional[int]) -> Optional[ProcessResources]:
+        """Lê o uso atual da árvore do processo; None se indisponível ou encerrado."""
+        if not PSUTIL_AVAILABLE or pid is None:
+            return None
+
+        try:
+            process = self._processes.get(pid)
+            if process is None:
+                process = self._processes[pid] = psutil.Process(pid)
+
+            rss, cpu, fds = self._read(process, include_reaped=True)
+            children = process.children(recursive=True)
+            for child in children:
+                try:
+                    child_rss, child_cpu, child_fds = self._read(child, include_reaped=False)
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+                rss += child_rss
+                cpu += child_cpu
+                fds += child_fds
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            self.forget(pid)
+            return None
+        except psutil.AccessDenied as e:
+            logger.warning(
+                "Sem permissão para ler recursos do subprocesso",
+                extra={"event": "process_resources_denied", "pid": pid, "error": str(e)}
+            )
+            return None
+
+        now = time.monotonic()
+        previous = self._last.get(pid)
+        cpu_percent = None
+        if previous is not None and now > previous.sampled_at:
+            cpu_percent = round(max(0.0, cpu - previous.cpu_seconds) / (now - previous.sampled_at) * 100, 1)
+
+        resources = ProcessResources(
+            pid=pid,
+            rss_bytes=rss,
+            peak_rss_bytes=max(rss, previous.peak_rss_bytes if previous else 0),
+            cpu_seconds=round(cpu, 3),
+            cpu_percent=cpu_percent,
+            open_fds=fds,
+            children=len(children),
+            sampled_at=now,
+        )
+        self._last[pid] = resources
+        return resources
+
+    @staticmethod
+    def _read(process, include_reaped: bool):
+        with process.oneshot():
+            rss = process.memory_info().rss
+            times = process.cpu_times()
+            cpu = times.user + times.system
+            if include_reaped:
+                # Filhos já encerrados (ferramentas que rodaram e terminaram)
+                cpu += getattr(times, "children_user", 0.0) + getattr(times, "children_system", 0.0)
+            if hasattr(process, "num_fds"):
+                fds = process.num_fds()
+            else:
+                fds = process.num_handles()
+        return rss, cpu, fds
+
+    def last(self, pid: Optional[int]) -> Optional[ProcessResources]:
+        """Última amostra do PID, sem ler o processo."""
+        return self._last.get(pid) if pid is not None else None
+
+    def forget(self, pid: Optional[int]) -> None:
+        """Descarta o estado de um processo encerrado ou reciclado."""
+        self._processes.pop(pid, None)
+        self._last.pop(pid, None)
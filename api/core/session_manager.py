@@ -27,6 +27,12 @@ class SessionMetrics:
     total_tokens: int = 0
     total_cost: float = 0.0
     connection_errors: int = 0
+    # Recursos do subprocesso do CLI (última amostra entre turnos)
+    rss_bytes: int = 0
+    peak_rss_bytes: int = 0
+    cpu_seconds: float = 0.0
+    open_fds: int = 0
+    client_recycles: int = 0
 
 
 class ClaudeCodeSessionManager:
@@ -331,7 +337,8 @@ class ClaudeCodeSessionManager:
         
         Args:
             session_id: ID da sessão
-            **kwargs: message_count, total_tokens, total_cost, connection_errors
+            **kwargs: message_count, total_tokens, total_cost, connection_errors,
+                rss_bytes, peak_rss_bytes, cpu_seconds, open_fds, client_recycles
         """
         if session_id not in self.session_metrics:
             self.session_metrics[session_id] = SessionMetrics()
@@ -381,6 +388,11 @@ class ClaudeCodeSessionManager:
         total_tokens = sum(m.total_tokens for m in self.session_metrics.values())
         total_cost = sum(m.total_cost for m in self.session_metrics.values())
         total_errors = sum(m.connection_errors for m in self.session_metrics.values())
+        total_rss = sum(m.rss_bytes for m in self.session_metrics.values())
+        max_rss = max((m.peak_rss_bytes for m in self.session_metrics.values()), default=0)
+        total_cpu = sum(m.cpu_seconds for m in self.session_metrics.values())
+        total_fds = sum(m.open_fds for m in self.session_metrics.values())
+        total_recycles = sum(m.client_recycles for m in self.session_metrics.values())
         
         return {
             "timestamp": now.isoformat(),
@@ -401,6 +413,13 @@ class ClaudeCodeSessionManager:
                 "cost_usd": total_cost,
                 "errors": total_errors
             },
+            "resources": {
+                "rss_bytes": total_rss,
+                "max_peak_rss_bytes": max_rss,
+                "cpu_seconds": round(total_cpu, 3),
+                "open_fds": total_fds,
+                "client_recycles": total_recycles
+            },
             "config": {
                 "timeout_minutes": self.SESSION_TIMEOUT_MINUTES,
                 "cleanup_interval": self.CLEANUP_INTERVAL_MINUTES
@@ -0,0 +1,187 @@
+"""Detecção de padrões de ataque com pré-filtro de literais."""
+
+import re
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+
+_REPEATS = {
+    sre_parse.MAX_REPEAT,
+    sre_parse.MIN_REPEAT,
+    getattr(sre_parse, "POSSESSIVE_REPEAT", sre_parse.MAX_REPEAT),
+}
+
+
+def _required_literals(pattern: str) -> Optional[FrozenSet[str]]:
+    """
+    Extrai literais (minúsculos) dos quais ao menos um aparece em todo match.
+
+    Retorna None quando o padrão não tem literal obrigatório; nesse caso o
+    regex completo sempre roda.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, re.IGNORECASE)
+    except re.error:
+        return None
+    return _sequence_literals(list(parsed))
+
+
+def _sequence_literals(items) -> Optional[FrozenSet[str]]:
+    """Escolhe o conjunto de literais mais seletivo de uma sequência."""
+    candidates = []
+    run: List[str] = []
+
+    def flush():
+        if run:
+            candidates.append(frozenset(["".join(run).lower()]))
+            run.clear()
+
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        if op is sre_parse.AT:
+            # Âncoras (\b, ^) não consomem caracteres
+            continue
+        flush()
+        literals = _item_literals(op, av)
+        if literals:
+            candidates.append(literals)
+    flush()
+
+    if not candidates:
+        return None
+    # O conjunto cujo menor literal é mais longo filtra melhor
+    return max(candidates, key=lambda s: (min(len(x) for x in s), -len(s)))
+
+
+def _item_literals(op, av) -> Optional[FrozenSet[str]]:
+    if op is sre_parse.SUBPATTERN:
+        return _sequence_literals(list(av[-1]))
+    if op is sre_parse.BRANCH:
+        branches = [_sequence_literals(list(branch)) for branch in av[1]]
+        if any(branch is None for branch in branches):
+            return None
+        return frozenset().union(*branches)
+    if op in _REPEATS and av[0] >= 1:
+        return _sequence_literals(list(av[2]))
+    return None
+
+
+class AttackDetector:
+    """
+    Detector multi-padrão para o SecurityMiddleware.
+
+    Cada padrão tem um conjunto de literais obrigatórios extraído do próprio
+    regex (ex.: ``select`` para ``\\bunion\\b.*\\bselect\\b``). O texto é
+    convertido para minúsculas uma vez e os literais são procurados com
+    busca de substring; só os padrões candidatos rodam o regex completo.
+    A entrada é limitada a ``max_input_length`` caracteres no início e no
+    fim do campo, o que limita o custo de padrões com backtracking, e
+    vereditos de campos curtos e repetidos (URL, query string) ficam num
+    cache LRU.
+    """
+
+    def __init__(
+        self,
+        patterns: Dict[str, List[str]],
+        max_input_length: int = 8192,
+        cache_size: int = 2048,
+        cacheable_length: int = 1024
+    ):
+        self.max_input_length = max_input_length
+        self.cache_size = cache_size
+        self.cacheable_length = cacheable_length
+
+        # (literal, índices dos padrões que dependem dele)
+        literal_index: Dict[str, List[int]] = {}
+        self._patterns: List[Tuple[str, re.Pattern]] = []
+        self._always_run: List[int] = []
+
+        for category, category_patterns in patterns.items():
+            for pattern in category_patterns:
+                index = len(self._patterns)
+                self._patterns.append(
+                    (category, re.compile(pattern, re.IGNORECASE | re.DOTALL))
+                )
+                literals = _required_literals(pattern)
+                if not literals:
+                    self._always_run.append(index)
+                    continue
+                for literal in literals:
+                    literal_index.setdefault(literal, []).append(index)
+
+        self._literals = list(literal_index.items())
+        self._cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def scan(self, text: str) -> Optional[str]:
+        """
+        Varre um texto e retorna a categoria de ataque encontrada, ou None.
+
+        Textos até ``cacheable_length`` caracteres usam o cache de vereditos.
+        """
+        if not text:
+            return None
+
+        if len(text) > self.cacheable_length:
+            return self._scan(text)
+
+        try:
+            verdict = self._cache[text]
+        except KeyError:
+            self.cache_misses += 1
+            verdict = self._scan(text)
+            self._cache[text] = verdict
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return verdict
+
+        self.cache_hits += 1
+        self._cache.move_to_end(text)
+        return verdict
+
+    def scan_fields(self, fields: Dict[str, str]) -> Optional[Tuple[str, str]]:
+        """Varre vários campos; retorna (categoria, campo) do primeiro achado."""
+        for field_name, value in fields.items():
+            category = self.scan(value)
+            if category:
+                return category, field_name
+        return None
+
+    def _scan(self, text: str) -> Optional[str]:
+        limit = self.max_input_length
+        if len(text) > 2 * limit:
+            # Início e fim do campo; o meio de entradas enormes não é varrido
+            return self._match(text[:limit]) or self._match(text[-limit:])
+        return self._match(text)
+
+    def _match(self, text: str) -> Optional[str]:
+        lowered = text.lower()
+        candidates = set(self._always_run)
+        for literal, indexes in self._literals:
+            if literal in lowered:
+                candidates.update(indexes)
+
+        for index in sorted(candidates):
+            category, regex = self._patterns[index]
+            if regex.search(text):
+                return category
+        return None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Estatísticas do pré-filtro e do cache de vereditos."""
+        return {
+            "patterns": len(self._patterns),
+            "literals": len(self._literals),
+            "unfiltered_patterns": len(self._always_run),
+            "cache_entries": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
@@ -7,11 +7,11 @@ Sistema robusto de captura e tratamento de erros com logging estruturado.
 import time
 import asyncio
 import traceback
-from typing import Callable, Any
+from typing import Callable, Any, Optional
 from fastapi import Request, Response, HTTPException
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 import sys
 import os
@@ -26,33 +26,45 @@ from utils.logging_config import (
 
 logger = get_contextual_logger(__name__)
 
-class ErrorHandlingMiddleware(BaseHTTPMiddleware):
-    """Middleware para tratamento global de exceções e logging de requests."""
+class ErrorHandlingMiddleware:
+    """
+    Middleware ASGI para tratamento global de exceções e logging de requests.
+    
+    Implementado como ASGI puro (sem BaseHTTPMiddleware) para não envolver
+    cada resposta em tasks e streams extras. O timeout é de inatividade:
+    a request só é interrompida se o app ficar ``timeout_seconds`` sem
+    produzir nada, então streams SSE longos e ativos não são cortados.
+    """
     
     def __init__(
         self, 
         app: ASGIApp,
-        timeout_seconds: float = 300.0  # 5 minutos default
+        timeout_seconds: float = 300.0  # 5 minutos sem atividade
     ):
-        super().__init__(app)
+        self.app = app
         self.timeout_seconds = timeout_seconds
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Processa request com tratamento de erros e timeout."""
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Processa request com tratamento de erros e timeout de inatividade."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request = Request(scope)
         
         # Gera ID único para a request
         req_id = generate_request_id()
         client_ip = self._get_client_ip(request)
         
         # Configura contexto da request
-        set_request_context(req_id, client_ip=client_ip)
+        set_request_context(req_id, client_ip=client_ip, route=f"{request.method} {request.url.path}")
         
         start_time = time.time()
         
-        # Log inicial da request
+        # Log inicial da request; o payload só é montado se o record for emitido
         logger.info(
             f"REQUEST_START: {request.method} {request.url.path}",
-            extra={
+            extra=lambda: {
                 "method": request.method,
                 "url": str(request.url),
                 "path": request.url.path,
@@ -60,36 +72,65 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
                 "headers": dict(request.headers),
                 "client_ip": client_ip,
                 "user_agent": request.headers.get("user-agent")
-            }
+            },
+            event="request_start"
         )
         
+        watchdog = _IdleWatchdog(self.timeout_seconds)
+        response_state = {"started": False, "status_code": None, "size": 0}
+        
+        async def receive_wrapper() -> Message:
+            watchdog.touch()
+            message = await receive()
+            watchdog.touch()
+            return message
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_state["started"] = True
+                response_state["status_code"] = message["status"]
+                
+                # Adiciona headers de debug
+                duration = (time.time() - start_time) * 1000
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = req_id
+                headers["X-Response-Time"] = f"{duration:.2f}ms"
+            elif message["type"] == "http.response.body":
+                response_state["size"] += len(message.get("body", b""))
+            
+            # Enviar para um cliente lento não conta como inatividade do app
+            watchdog.sending = True
+            try:
+                await send(message)
+            finally:
+                watchdog.sending = False
+                watchdog.touch()
+        
         try:
-            # Executa request com timeout
-            response = await asyncio.wait_for(
-                call_next(request),
-                timeout=self.timeout_seconds
-            )
+            watchdog.start()
+            try:
+                await self.app(scope, receive_wrapper, send_wrapper)
+            finally:
+                watchdog.stop()
             
             # Calcula duração
-            duration = (time.time() - start_time) * 1000  # em ms
+            duration = (time.time() - start_time) * 1000
             
             # Log de sucesso
             logger.info(
-                f"REQUEST_SUCCESS: {request.method} {request.url.path} - {response.status_code}",
+                f"REQUEST_SUCCESS: {request.method} {request.url.path} - {response_state['status_code']}",
                 extra={
-                    "status_code": response.status_code,
+                    "status_code": response_state["status_code"],
                     "duration_ms": duration,
-                    "response_size": response.headers.get("content-length")
-                }
+                    "response_size": response_state["size"]
+                },
+                event="request_success"
             )
             
-            # Adiciona headers de debug
-            response.headers["X-Request-ID"] = req_id
-            response.headers["X-Response-Time"] = f"{duration:.2f}ms"
-            
-            return response
-            
-        except asyncio.TimeoutError:
+        except asyncio.CancelledError:
+            if not watchdog.fired:
+                raise
+            watchdog.uncancel()
             duration = (time.time() - start_time) * 1000
             
             logger.error(
@@ -97,20 +138,26 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
                 extra={
                     "timeout_seconds": self.timeout_seconds,
                     "duration_ms": duration,
+                    "response_started": response_state["started"],
                     "error_type": "TimeoutError"
                 }
             )
             
-            return JSONResponse(
+            if response_state["started"]:
+                # Encerra o stream já iniciado de forma limpa
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+            
+            await JSONResponse(
                 status_code=408,
                 content={
                     "error": "Request Timeout",
-                    "message": f"Request excedeu o limite de {self.timeout_seconds} segundos",
+                    "message": f"Request ficou mais de {self.timeout_seconds} segundos sem atividade",
                     "request_id": req_id,
                     "type": "timeout_error"
                 },
                 headers={"X-Request-ID": req_id}
-            )
+            )(scope, receive, send)
             
         except HTTPException as e:
             duration = (time.time() - start_time) * 1000
@@ -126,7 +173,10 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
                 }
             )
             
-            return JSONResponse(
+            if response_state["started"]:
+                raise
+            
+            await JSONResponse(
                 status_code=e.status_code,
                 content={
                     "error": "HTTP Error",
@@ -136,7 +186,7 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
                     "type": "http_error"
                 },
                 headers={"X-Request-ID": req_id}
-            )
+            )(scope, receive, send)
             
         except Exception as e:
             duration = (time.time() - start_time) * 1000
@@ -148,12 +198,17 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
                     "error_type": type(e).__name__,
                     "error_message": str(e),
                     "duration_ms": duration,
+                    "response_started": response_state["started"],
                     "traceback": traceback.format_exc()
                 }
             )
             
+            if response_state["started"]:
+                # Não é possível trocar uma resposta já iniciada
+                raise
+            
             # Em produção, não expor detalhes internos
-            return JSONResponse(
+            await JSONResponse(
                 status_code=500,
                 content={
                     "error": "Internal Server Error",
@@ -162,7 +217,7 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
                     "type": "internal_error"
                 },
                 headers={"X-Request-ID": req_id}
-            )
+            )(scope, receive, send)
             
         finally:
             # Sempre limpa contexto
@@ -183,6 +238,57 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
         # IP direto
         return request.client.host if request.client else "unknown"
 
+
+class _IdleWatchdog:
+    """
+    Cancela a task da request após um período sem atividade.
+    
+    Usa um único timer re-armado com o tempo restante, em vez de uma task
+    extra ou um timer por chunk enviado.
+    """
+    
+    def __init__(self, timeout_seconds: float):
+        self.timeout_seconds = timeout_seconds
+        self.last_activity = time.monotonic()
+        self.sending = False
+        self.fired = False
+        self._task: Optional[asyncio.Task] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+    
+    def start(self) -> None:
+        self._task = asyncio.current_task()
+        self.touch()
+        self._handle = asyncio.get_running_loop().call_later(
+            self.timeout_seconds, self._check
+        )
+    
+    def touch(self) -> None:
+        self.last_activity = time.monotonic()
+    
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+    
+    def uncancel(self) -> None:
+        """Desfaz o pedido de cancelamento feito pelo watchdog (3.11+)."""
+        if self._task is not None and hasattr(self._task, "uncancel"):
+            self._task.uncancel()
+    
+    def _check(self) -> None:
+        idle = time.monotonic() - self.last_activity
+        if self.sending or idle < self.timeout_seconds:
+            remaining = self.timeout_seconds - idle if not self.sending else self.timeout_seconds
+            self._handle = asyncio.get_running_loop().call_later(
+                max(remaining, 0.001), self._check
+            )
+            return
+        self._handle = None
+        self.fired = True
+        if self._task is not None:
+            self._task.cancel()
+
+
 class StreamingErrorHandler:
     """Handler específico para erros em endpoints de streaming."""
     
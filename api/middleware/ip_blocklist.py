@@ -0,0 +1,290 @@
+"""Blocklist de IPs com suporte a CIDR (IPv4 e IPv6) baseada em radix tree."""
+
+import asyncio
+import ipaddress
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+@dataclass
+class BlockEntry:
+    """Bloqueio ativo para uma rede."""
+    network: str
+    expires_at: float  # Epoch (time.time()); math.inf para permanente
+    reason: str = ""
+
+    @property
+    def permanent(self) -> bool:
+        return math.isinf(self.expires_at)
+
+
+class _Node:
+    """Nó da trie binária; ``entry`` marca um prefixo bloqueado."""
+    __slots__ = ("children", "entry")
+
+    def __init__(self):
+        self.children: List[Optional["_Node"]] = [None, None]
+        self.entry: Optional[BlockEntry] = None
+
+
+class IPBlocklist:
+    """
+    Blocklist de redes com expiração.
+
+    Cada família de endereços tem uma trie binária indexada pelos bits do
+    prefixo; a consulta percorre no máximo 32 (IPv4) ou 128 (IPv6) nós,
+    independentemente de quantas redes estão bloqueadas. Bloqueios vencidos
+    são descartados na consulta e removidos de vez em ``cleanup``.
+
+    Os horários de expiração usam epoch para poderem ser compartilhados
+    entre workers através de um ``BlocklistBackend``.
+    """
+
+    def __init__(self, backend: Optional["BlocklistBackend"] = None):
+        self.backend = backend
+        self._roots = {4: _Node(), 6: _Node()}
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @staticmethod
+    def _parse_network(network: Union[str, IPNetwork]) -> IPNetwork:
+        net = ipaddress.ip_network(network, strict=False)
+        if isinstance(net, ipaddress.IPv6Network) and net.prefixlen >= 96 and net.network_address.ipv4_mapped:
+            # ::ffff:a.b.c.d/n é tratado como a rede IPv4 correspondente
+            net = ipaddress.ip_network(
+                f"{net.network_address.ipv4_mapped}/{net.prefixlen - 96}"
+            )
+        return net
+
+    def _walk(self, net: IPNetwork, create: bool) -> Optional[_Node]:
+        node = self._roots[net.version]
+        bits = int(net.network_address)
+        width = net.max_prefixlen
+        for depth in range(net.prefixlen):
+            bit = (bits >> (width - 1 - depth)) & 1
+            child = node.children[bit]
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[bit] = _Node()
+            node = child
+        return node
+
+    def block(
+        self,
+        network: Union[str, IPNetwork],
+        duration_seconds: Optional[float] = None,
+        reason: str = "",
+        expires_at: Optional[float] = None
+    ) -> BlockEntry:
+        """
+        Bloqueia um IP ou rede CIDR.
+
+        Args:
+            network: IP ("10.0.0.1") ou CIDR ("10.0.0.0/24", "2001:db8::/32")
+            duration_seconds: Duração do bloqueio; None = permanente
+            reason: Motivo (para logs e status)
+            expires_at: Expiração absoluta (epoch); tem precedência sobre a duração
+        """
+        net = self._parse_network(network)
+        if expires_at is None:
+            expires_at = math.inf if duration_seconds is None else time.time() + duration_seconds
+
+        node = self._walk(net, create=True)
+        if node.entry is None:
+            self._count += 1
+        elif node.entry.expires_at > expires_at:
+            # Nunca encurta um bloqueio existente
+            expires_at = node.entry.expires_at
+        node.entry = BlockEntry(str(net), expires_at, reason)
+        return node.entry
+
+    def unblock(self, network: Union[str, IPNetwork]) -> bool:
+        """
+        Remove localmente o bloqueio exato de uma rede; retorna se existia.
+
+        Com backend compartilhado use ``withdraw``: senão a próxima ``sync``
+        reaplica o bloqueio.
+        """
+        node = self._walk(self._parse_network(network), create=False)
+        if node is None or node.entry is None:
+            return False
+        node.entry = None
+        self._count -= 1
+        return True
+
+    def lookup(self, ip: str) -> Optional[BlockEntry]:
+        """Retorna o bloqueio ativo que cobre o IP, ou None."""
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+
+        now = time.time()
+        node = self._roots[address.version]
+        bits = int(address)
+        width = address.max_prefixlen
+        depth = 0
+        while node is not None:
+            entry = node.entry
+            if entry is not None:
+                if entry.expires_at > now:
+                    return entry
+                node.entry = None
+                self._count -= 1
+            if depth == width:
+                break
+            node = node.children[(bits >> (width - 1 - depth)) & 1]
+            depth += 1
+        return None
+
+    def is_blocked(self, ip: str) -> bool:
+        return self.lookup(ip) is not None
+
+    def entries(self) -> Iterator[BlockEntry]:
+        """Itera sobre os bloqueios ativos."""
+        now = time.time()
+        for root in self._roots.values():
+            stack = [root]
+            while stack:
+                node = stack.pop()
+                if node.entry is not None and node.entry.expires_at > now:
+                    yield node.entry
+                stack.extend(child for child in node.children if child is not None)
+
+    def cleanup(self) -> int:
+        """Remove bloqueios vencidos e poda ramos vazios; retorna quantos saíram."""
+        now = time.time()
+        removed = 0
+
+        def prune(node: _Node) -> bool:
+            nonlocal removed
+            if node.entry is not None and node.entry.expires_at <= now:
+                node.entry = None
+                removed += 1
+            for bit in (0, 1):
+                child = node.children[bit]
+                if child is not None and prune(child):
+                    node.children[bit] = None
+            return node.entry is None and node.children[0] is None and node.children[1] is None
+
+        for root in self._roots.values():
+            prune(root)
+        self._count -= removed
+        return removed
+
+    async def sync(self) -> int:
+        """Aplica localmente os bloqueios publicados no backend compartilhado."""
+        if not self.backend:
+            return 0
+        applied = 0
+        for network, (expires_at, reason) in (await self.backend.load()).items():
+            try:
+                self.block(network, expires_at=expires_at, reason=reason)
+                applied += 1
+            except ValueError:
+                logger.warning(f"⚠️ Entrada inválida na blocklist compartilhada: {network}")
+        return applied
+
+    async def publish(self, entry: BlockEntry):
+        """Publica um bloqueio no backend compartilhado (se houver)."""
+        if self.backend:
+            await self.backend.store(entry)
+
+    async def withdraw(self, network: Union[str, IPNetwork]) -> bool:
+        """Remove o bloqueio localmente e do backend compartilhado."""
+        net = self._parse_network(network)
+        removed = self.unblock(net)
+        if self.backend:
+            await self.backend.remove(str(net))
+        return removed
+
+
+class BlocklistBackend(ABC):
+    """Interface de armazenamento compartilhado da blocklist."""
+
+    @abstractmethod
+    async def store(self, entry: BlockEntry):
+        """Publica (ou prolonga) o bloqueio de uma rede."""
+        pass
+
+    @abstractmethod
+    async def load(self) -> Dict[str, Tuple[float, str]]:
+        """Bloqueios vigentes: rede -> (expiração, motivo)."""
+        pass
+
+    @abstractmethod
+    async def remove(self, network: str):
+        """Apaga o bloqueio de uma rede (no formato de ``BlockEntry.network``)."""
+        pass
+
+
+class RedisBlocklistBackend(BlocklistBackend):
+    """
+    Blocklist compartilhada entre workers via Redis.
+
+    Cada rede é um campo de um hash (``rede -> expiração|motivo``);
+    campos vencidos são apagados por quem carrega a lista.
+    """
+
+    def __init__(self, redis_url: str = "redis://localhost:6379", key: str = "security:blocklist"):
+        self.redis_url = redis_url
+        self.key = key
+        self.redis_client = None
+
+    async def connect(self):
+        self.redis_client = redis.from_url(self.redis_url)
+        await self.redis_client.ping()
+
+    async def store(self, entry: BlockEntry):
+        if not self.redis_client:
+            return
+        expires = "inf" if entry.permanent else repr(entry.expires_at)
+        await self.redis_client.hset(self.key, entry.network, f"{expires}|{entry.reason}")
+
+    async def remove(self, network: str):
+        if not self.redis_client:
+            return
+        await self.redis_client.hdel(self.key, network)
+
+    async def load(self) -> Dict[str, Tuple[float, str]]:
+        if not self.redis_client:
+            return {}
+        now = time.time()
+        entries = {}
+        expired = []
+        for raw_network, raw_value in (await self.redis_client.hgetall(self.key)).items():
+            network = raw_network.decode()
+            expires, _, reason = raw_value.decode().partition("|")
+            expires_at = float(expires)
+            if expires_at <= now:
+                expired.append(network)
+            else:
+                entries[network] = (expires_at, reason)
+        if expired:
+            await self.redis_client.hdel(self.key, *expired)
+        return entries
+
+
+async def run_blocklist_sync(blocklist: IPBlocklist, interval_seconds: float = 10.0):
+    """Task periódica: puxa bloqueios do backend e limpa os vencidos."""
+    while True:
+        try:
+            await blocklist.sync()
+            blocklist.cleanup()
+        except Exception as e:
+            logger.error(f"❌ Erro na sincronização da blocklist: {e}")
+        await asyncio.sleep(interval_seconds)
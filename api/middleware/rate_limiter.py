@@ -1,11 +1,13 @@
 """Sistema de rate limiting robusto com suporte a Redis e fallback in-memory."""
 
 import time
+import math
+import uuid
 import asyncio
+import threading
 from typing import Dict, Optional, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
-from collections import defaultdict, deque
 import redis.asyncio as redis
 import logging
 import hashlib
@@ -35,99 +37,136 @@ class RateLimitResult:
     window_start: datetime = field(default_factory=datetime.now)
 
 
-class InMemoryRateLimiter:
-    """Rate limiter em memória como fallback."""
+class GCRARateLimiter:
+    """
+    Rate limiter em memória baseado em GCRA (generic cell rate algorithm).
     
-    def __init__(self, rule: RateLimitRule):
+    Guarda um único float por cliente (o "theoretical arrival time", em
+    tempo monotônico), distribuído em shards com um lock por shard. O custo
+    por requisição é constante, independente do número de clientes.
+    
+    Estouros bloqueiam o cliente empurrando o TAT para frente, então o
+    bloqueio não precisa de estrutura separada. Entradas com TAT no passado
+    equivalem a um cliente novo e são removidas de forma preguiçosa.
+    """
+    
+    def __init__(self, rule: RateLimitRule, shards: int = 64):
+        if shards < 1 or shards & (shards - 1):
+            raise ValueError("shards deve ser potência de 2")
         self.rule = rule
-        self.clients: Dict[str, deque] = defaultdict(deque)
-        self.blocked_clients: Dict[str, datetime] = {}
-        self.lock = asyncio.Lock()
+        self._emission_interval = rule.window_size_seconds / rule.requests_per_minute
+        # Tolerância permite rajada de até requests_per_minute na janela
+        self._tolerance = rule.window_size_seconds - self._emission_interval
+        self._mask = shards - 1
+        self._shards = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._cleanup_cursor = 0
     
-    async def check_rate_limit(self, client_id: str) -> RateLimitResult:
-        """Verifica rate limit para um cliente."""
-        async with self.lock:
-            now = datetime.now()
-            
-            # Verifica se cliente está bloqueado
-            if client_id in self.blocked_clients:
-                blocked_until = self.blocked_clients[client_id]
-                if now < blocked_until:
-                    retry_after = int((blocked_until - now).total_seconds())
-                    return RateLimitResult(
-                        allowed=False,
-                        requests_remaining=0,
-                        reset_time=blocked_until,
-                        retry_after_seconds=retry_after,
-                        current_usage=self.rule.requests_per_minute
-                    )
-                else:
-                    # Desbloqueio automático
-                    del self.blocked_clients[client_id]
-            
-            # Limpa requests antigos da janela
-            window_start = now - timedelta(seconds=self.rule.window_size_seconds)
-            client_requests = self.clients[client_id]
-            
-            while client_requests and client_requests[0] < window_start:
-                client_requests.popleft()
-            
-            current_count = len(client_requests)
-            
-            # Verifica se excedeu limite
-            if current_count >= self.rule.requests_per_minute:
-                # Bloqueia cliente temporariamente
-                self.blocked_clients[client_id] = now + timedelta(
-                    seconds=self.rule.block_duration_seconds
-                )
-                
-                return RateLimitResult(
-                    allowed=False,
-                    requests_remaining=0,
-                    reset_time=self.blocked_clients[client_id],
-                    retry_after_seconds=self.rule.block_duration_seconds,
-                    current_usage=current_count
-                )
-            
-            # Adiciona request atual
-            client_requests.append(now)
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+    
+    def _check(self, client_id: str) -> Tuple[bool, float, float]:
+        """Aplica GCRA e retorna (permitido, TAT resultante, agora)."""
+        index = hash(client_id) & self._mask
+        shard = self._shards[index]
+        with self._locks[index]:
+            now = time.monotonic()
+            tat = max(shard.get(client_id, now), now)
+            allow_at = tat - self._tolerance
             
-            # Calcula quando janela reseta
-            next_reset = window_start + timedelta(seconds=self.rule.window_size_seconds)
-            if client_requests:
-                oldest_request = client_requests[0]
-                next_reset = oldest_request + timedelta(seconds=self.rule.window_size_seconds)
+            if now >= allow_at:
+                tat += self._emission_interval
+                shard[client_id] = tat
+                return True, tat, now
             
+            if allow_at - now <= self._emission_interval:
+                # Acabou de estourar: inicia o bloqueio (nunca recua o TAT)
+                tat = max(tat, now + self._tolerance + self.rule.block_duration_seconds)
+                shard[client_id] = tat
+            return False, tat, now
+    
+    async def check_rate_limit(self, client_id: str) -> RateLimitResult:
+        """Verifica rate limit para um cliente."""
+        allowed, tat, now = self._check(client_id)
+        wall_now = datetime.now()
+        limit = self.rule.requests_per_minute
+        
+        if not allowed:
+            retry_after = tat - self._tolerance - now
             return RateLimitResult(
-                allowed=True,
-                requests_remaining=self.rule.requests_per_minute - current_count - 1,
-                reset_time=next_reset,
-                current_usage=current_count + 1,
-                window_start=window_start
+                allowed=False,
+                requests_remaining=0,
+                reset_time=wall_now + timedelta(seconds=retry_after),
+                retry_after_seconds=max(1, math.ceil(retry_after)),
+                limit_per_minute=limit,
+                current_usage=limit
             )
+        
+        usage = min(limit, math.ceil((tat - now) / self._emission_interval - 1e-9))
+        return RateLimitResult(
+            allowed=True,
+            requests_remaining=limit - usage,
+            reset_time=wall_now + timedelta(seconds=tat - now),
+            limit_per_minute=limit,
+            current_usage=usage,
+            window_start=wall_now - timedelta(seconds=self.rule.window_size_seconds)
+        )
     
-    async def cleanup_old_data(self):
-        """Limpa dados antigos periodicamente."""
-        now = datetime.now()
+    async def cleanup_old_data(self, max_shards: Optional[int] = None):
+        """
+        Remove clientes cujo TAT já passou.
         
-        async with self.lock:
-            # Remove clientes desbloqueados
-            expired_blocks = [
-                client_id for client_id, blocked_until in self.blocked_clients.items()
-                if now >= blocked_until
-            ]
-            for client_id in expired_blocks:
-                del self.blocked_clients[client_id]
-            
-            # Limpa requests muito antigos
-            cutoff = now - timedelta(seconds=self.rule.window_size_seconds * 2)
-            for client_id, requests in list(self.clients.items()):
-                while requests and requests[0] < cutoff:
-                    requests.popleft()
-                
-                # Remove clientes sem requests recentes
-                if not requests:
-                    del self.clients[client_id]
+        Args:
+            max_shards: Limita quantos shards são varridos nesta chamada
+                (round-robin); None varre todos
+        """
+        count = len(self._shards) if max_shards is None else min(max_shards, len(self._shards))
+        for _ in range(count):
+            index = self._cleanup_cursor
+            self._cleanup_cursor = (index + 1) & self._mask
+            shard = self._shards[index]
+            with self._locks[index]:
+                now = time.monotonic()
+                expired = [client_id for client_id, tat in shard.items() if tat <= now]
+                for client_id in expired:
+                    del shard[client_id]
+            await asyncio.sleep(0)
+
+
+# Verificação completa em um único round trip: bloqueio, limpeza da janela,
+# contagem, admissão e cálculo do reset rodam atomicamente no servidor.
+# KEYS[1] = janela (sorted set), KEYS[2] = bloqueio
+# ARGV = limite, janela (s), duração do bloqueio (s), membro único
+# Retorno = {permitido, restantes, uso, segundos até reset/retry}
+RATE_LIMIT_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local block = tonumber(ARGV[3])
+
+local blocked_ms = redis.call('PTTL', KEYS[2])
+if blocked_ms > 0 then
+    return {0, 0, limit, tostring(blocked_ms / 1000)}
+end
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+if count >= limit then
+    redis.call('SET', KEYS[2], '1', 'PX', math.floor(block * 1000))
+    return {0, 0, count, tostring(block)}
+end
+
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('PEXPIRE', KEYS[1], math.floor(window * 2000))
+
+local reset = now + window
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if oldest[2] then
+    reset = tonumber(oldest[2]) + window
+end
+return {1, limit - count - 1, count + 1, tostring(reset - now)}
+"""
 
 
 class RedisRateLimiter:
@@ -138,96 +177,71 @@ class RedisRateLimiter:
         self.redis_url = redis_url
         self.redis_client: Optional[redis.Redis] = None
         self.prefix = "rate_limit:"
+        self._script = None
     
     async def connect(self):
         """Conecta ao Redis."""
         try:
             self.redis_client = redis.from_url(self.redis_url)
             await self.redis_client.ping()
+            # EVALSHA com recarga automática em NOSCRIPT
+            self._script = self.redis_client.register_script(RATE_LIMIT_SCRIPT)
             logger.info("✅ Conectado ao Redis para rate limiting")
         except Exception as e:
             logger.error(f"❌ Erro ao conectar ao Redis: {e}")
             raise
     
-    async def check_rate_limit(self, client_id: str) -> RateLimitResult:
-        """Verifica rate limit usando Redis."""
-        if not self.redis_client:
+    async def check_rate_limit(
+        self,
+        client_id: str,
+        rule: Optional[RateLimitRule] = None
+    ) -> RateLimitResult:
+        """
+        Verifica rate limit usando Redis.
+        
+        Args:
+            client_id: ID do cliente
+            rule: Regra a aplicar (padrão: a regra do limiter)
+        """
+        if not self.redis_client or not self._script:
             raise RuntimeError("Redis não conectado")
         
-        now = datetime.now()
-        window_start = now - timedelta(seconds=self.rule.window_size_seconds)
+        rule = rule or self.rule
         
-        # Chave para controle de rate limit
-        key = f"{self.prefix}{client_id}"
-        block_key = f"{self.prefix}blocked:{client_id}"
+        # Hash tag mantém as duas chaves no mesmo slot em Redis Cluster
+        key = f"{self.prefix}{{{client_id}}}"
+        block_key = f"{self.prefix}blocked:{{{client_id}}}"
         
-        # Verifica se cliente está bloqueado
-        blocked_until_str = await self.redis_client.get(block_key)
-        if blocked_until_str:
-            blocked_until = datetime.fromisoformat(blocked_until_str.decode())
-            if now < blocked_until:
-                retry_after = int((blocked_until - now).total_seconds())
-                return RateLimitResult(
-                    allowed=False,
-                    requests_remaining=0,
-                    reset_time=blocked_until,
-                    retry_after_seconds=retry_after,
-                    current_usage=self.rule.requests_per_minute
-                )
-            else:
-                # Remove bloqueio expirado
-                await self.redis_client.delete(block_key)
+        allowed, remaining, usage, seconds = await self._script(
+            keys=[key, block_key],
+            args=[
+                rule.requests_per_minute,
+                rule.window_size_seconds,
+                rule.block_duration_seconds,
+                uuid.uuid4().hex
+            ]
+        )
         
-        # Pipeline para operações atômicas
-        async with self.redis_client.pipeline() as pipe:
-            # Remove requests antigos da janela
-            pipe.zremrangebyscore(key, 0, window_start.timestamp())
-            
-            # Conta requests na janela atual
-            pipe.zcard(key)
-            
-            # Executa pipeline
-            results = await pipe.execute()
-            current_count = results[1]
+        now = datetime.now()
+        delta = timedelta(seconds=float(seconds))
         
-        # Verifica limite
-        if current_count >= self.rule.requests_per_minute:
-            # Bloqueia cliente
-            blocked_until = now + timedelta(seconds=self.rule.block_duration_seconds)
-            await self.redis_client.setex(
-                block_key, 
-                self.rule.block_duration_seconds,
-                blocked_until.isoformat()
-            )
-            
+        if not allowed:
             return RateLimitResult(
                 allowed=False,
                 requests_remaining=0,
-                reset_time=blocked_until,
-                retry_after_seconds=self.rule.block_duration_seconds,
-                current_usage=current_count
-            )
-        
-        # Adiciona request atual
-        await self.redis_client.zadd(key, {str(now.timestamp()): now.timestamp()})
-        await self.redis_client.expire(key, self.rule.window_size_seconds * 2)
-        
-        # Calcula próximo reset
-        oldest_score = await self.redis_client.zrange(key, 0, 0, withscores=True)
-        if oldest_score:
-            oldest_timestamp = oldest_score[0][1]
-            next_reset = datetime.fromtimestamp(oldest_timestamp) + timedelta(
-                seconds=self.rule.window_size_seconds
+                reset_time=now + delta,
+                retry_after_seconds=max(1, math.ceil(float(seconds))),
+                limit_per_minute=rule.requests_per_minute,
+                current_usage=int(usage)
             )
-        else:
-            next_reset = now + timedelta(seconds=self.rule.window_size_seconds)
         
         return RateLimitResult(
             allowed=True,
-            requests_remaining=self.rule.requests_per_minute - current_count - 1,
-            reset_time=next_reset,
-            current_usage=current_count + 1,
-            window_start=window_start
+            requests_remaining=int(remaining),
+            reset_time=now + delta,
+            limit_per_minute=rule.requests_per_minute,
+            current_usage=int(usage),
+            window_start=now - timedelta(seconds=rule.window_size_seconds)
         )
 
 
@@ -245,12 +259,12 @@ class RateLimitManager:
         
         self.redis_url = redis_url
         self.redis_limiter: Optional[RedisRateLimiter] = None
-        self.memory_limiters: Dict[str, InMemoryRateLimiter] = {}
+        self.memory_limiters: Dict[str, GCRARateLimiter] = {}
         self.use_redis = False
         
         # Cria limiters em memória como fallback
         for endpoint, rule in self.rules.items():
-            self.memory_limiters[endpoint] = InMemoryRateLimiter(rule)
+            self.memory_limiters[endpoint] = GCRARateLimiter(rule)
     
     async def initialize(self):
         """Inicializa o gerenciador de rate limiting."""
@@ -283,9 +297,9 @@ class RateLimitManager:
         
         if self.use_redis and self.redis_limiter:
             try:
-                # Atualiza regra do Redis limiter
-                self.redis_limiter.rule = self.rules[rule_key]
-                return await self.redis_limiter.check_rate_limit(client_id)
+                return await self.redis_limiter.check_rate_limit(
+                    client_id, self.rules[rule_key]
+                )
             except Exception as e:
                 logger.error(f"❌ Erro no Redis rate limiting: {e}")
                 # Fallback para memória
@@ -1,6 +1,5 @@
 """Middleware de segurança robusto para validação e proteção da API."""
 
-import re
 import time
 import uuid
 import asyncio
@@ -8,7 +7,8 @@ from typing import Dict, Optional, Set, List, Any
 from datetime import datetime, timedelta
 from fastapi import Request, Response, HTTPException, status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logging
 import json
 from urllib.parse import urlparse
@@ -16,8 +16,12 @@ from urllib.parse import urlparse
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sdk'))
 
+from claude_code_sdk.tracing import get_tracer
 from middleware.rate_limiter import RateLimitManager
+from middleware.attack_detector import AttackDetector
+from middleware.ip_blocklist import IPBlocklist, RedisBlocklistBackend, run_blocklist_sync
 from utils.security_models import SecurityHeaders, RateLimitInfo
 
 logger = logging.getLogger(__name__)
@@ -26,29 +30,51 @@ logger = logging.getLogger(__name__)
 class SecurityValidationError(Exception):
     """Exceção personalizada para erros de validação de segurança."""
     
-    def __init__(self, message: str, code: str = "SECURITY_VALIDATION_ERROR", status_code: int = 400):
+    def __init__(
+        self,
+        message: str,
+        code: str = "SECURITY_VALIDATION_ERROR",
+        status_code: int = 400,
+        headers: Optional[Dict[str, str]] = None
+    ):
         self.message = message
         self.code = code
         self.status_code = status_code
+        self.headers = headers or {}
         super().__init__(message)
 
 
-class SecurityMiddleware(BaseHTTPMiddleware):
-    """Middleware principal de segurança."""
+class SecurityMiddleware:
+    """
+    Middleware principal de segurança.
     
-    def __init__(self, app, redis_url: Optional[str] = None):
-        super().__init__(app)
+    Implementado como ASGI puro: as validações rodam antes de chamar o app
+    e os headers de segurança são injetados na mensagem
+    ``http.response.start``, sem bufferizar nem re-empacotar a resposta
+    (importante para os streams SSE de /api/chat).
+    """
+    
+    def __init__(self, app: ASGIApp, redis_url: Optional[str] = None):
+        self.app = app
         self.rate_limiter = RateLimitManager(redis_url)
         self.security_config = self._load_security_config()
         self.suspicious_ips: Set[str] = set()
-        self.blocked_ips: Dict[str, datetime] = {}
         self.request_stats: Dict[str, Dict[str, int]] = {}
         
         # Headers de segurança padrão
         self.security_headers = SecurityHeaders.get_security_headers()
         
-        # Padrões de detecção de ataques
-        self.attack_patterns = self._load_attack_patterns()
+        # Detector de ataques (todos os padrões em uma passada por campo)
+        self.attack_detector = AttackDetector(
+            self.security_config["suspicious_patterns"],
+            max_input_length=self.security_config["max_scan_length"]
+        )
+        
+        # Blocklist de IPs/redes (compartilhada via Redis quando configurado)
+        self.redis_url = redis_url
+        self.ip_blocklist = IPBlocklist()
+        for network in self.security_config["blocked_networks"]:
+            self.ip_blocklist.block(network, reason="config")
         
         # Inicializa rate limiter
         asyncio.create_task(self._initialize())
@@ -60,6 +86,20 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             logger.info("✅ Security middleware inicializado")
         except Exception as e:
             logger.error(f"❌ Erro na inicialização do security middleware: {e}")
+        
+        if self.redis_url:
+            try:
+                backend = RedisBlocklistBackend(self.redis_url)
+                await backend.connect()
+                self.ip_blocklist.backend = backend
+                logger.info("✅ Blocklist de IPs compartilhada via Redis")
+            except Exception as e:
+                logger.warning(f"⚠️ Blocklist de IPs apenas local: {e}")
+        
+        asyncio.create_task(run_blocklist_sync(
+            self.ip_blocklist,
+            self.security_config["rate_limits"]["blocklist_sync_interval"]
+        ))
     
     def _load_security_config(self) -> Dict[str, Any]:
         """Carrega configurações de segurança."""
@@ -67,6 +107,7 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             "max_request_size": 50 * 1024 * 1024,  # 50MB
             "max_headers": 50,
             "max_header_size": 8192,  # 8KB por header
+            "max_scan_length": 8192,  # Caracteres varridos no início/fim de cada campo
             "allowed_methods": {"GET", "POST", "PUT", "DELETE", "OPTIONS"},
             "blocked_user_agents": {
                 "sqlmap", "nmap", "nikto", "burp", "w3af", 
@@ -105,56 +146,60 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             "rate_limits": {
                 "suspicious_threshold": 10,  # requests per minute
                 "block_duration": 3600,  # 1 hora
+                "block_prefix_v4": 32,  # Bloqueia só o IP; use 24 para a sub-rede inteira
+                "block_prefix_v6": 64,
+                "blocklist_sync_interval": 10,  # segundos
                 "max_concurrent_requests": 10,
-            }
+            },
+            # Redes bloqueadas permanentemente (CIDR)
+            "blocked_networks": [],
         }
     
-    def _load_attack_patterns(self) -> Dict[str, List[re.Pattern]]:
-        """Compila padrões regex para detecção de ataques."""
-        compiled_patterns = {}
-        
-        for category, patterns in self.security_config["suspicious_patterns"].items():
-            compiled_patterns[category] = [
-                re.compile(pattern, re.IGNORECASE | re.DOTALL)
-                for pattern in patterns
-            ]
-        
-        return compiled_patterns
-    
-    async def dispatch(self, request: Request, call_next) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Processa request através do pipeline de segurança."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
         start_time = time.time()
+        request = Request(scope, receive)
         client_ip = self._get_client_ip(request)
+        response_state = {"started": False, "status_code": 500}
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_state["started"] = True
+                response_state["status_code"] = message["status"]
+                # 6. Adiciona headers de segurança
+                self._add_security_headers(MutableHeaders(scope=message))
+            await send(message)
         
         try:
-            # 1. Verificações básicas de segurança
-            await self._basic_security_checks(request, client_ip)
+            with get_tracer().span("security.checks", client_ip=client_ip):
+                # 1. Verificações básicas de segurança
+                await self._basic_security_checks(request, client_ip)
+                
+                # 2. Rate limiting
+                await self._check_rate_limits(request, client_ip)
+                
+                # 3. Validação de conteúdo
+                await self._validate_request_content(request)
+                
+                # 4. Detecção de ataques
+                body = await self._detect_attacks(request)
             
-            # 2. Rate limiting
-            await self._check_rate_limits(request, client_ip)
-            
-            # 3. Validação de conteúdo
-            await self._validate_request_content(request)
-            
-            # 4. Detecção de ataques
-            await self._detect_attacks(request)
-            
-            # 5. Processa request
-            response = await call_next(request)
-            
-            # 6. Adiciona headers de segurança
-            self._add_security_headers(response)
+            # 5. Processa request (reentregando o body já lido, se houver)
+            app_receive = _replay_body(body, receive) if body is not None else receive
+            await self.app(scope, app_receive, send_wrapper)
             
             # 7. Log da request
-            await self._log_request(request, response, time.time() - start_time)
-            
-            return response
+            await self._log_request(request, response_state["status_code"], time.time() - start_time)
             
         except SecurityValidationError as e:
             logger.warning(f"🔒 Blocked request from {client_ip}: {e.message}")
             await self._handle_security_violation(client_ip, str(e))
             
-            return JSONResponse(
+            await JSONResponse(
                 status_code=e.status_code,
                 content={
                     "error": "Security validation failed",
@@ -163,44 +208,46 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                     "timestamp": datetime.now().isoformat(),
                     "request_id": str(uuid.uuid4())
                 },
-                headers=self.security_headers
-            )
+                headers={**self.security_headers, **e.headers}
+            )(scope, receive, send)
             
         except HTTPException as e:
+            if response_state["started"]:
+                raise
             # Pass through HTTP exceptions
-            response = JSONResponse(
+            await JSONResponse(
                 status_code=e.status_code,
                 content={"error": e.detail},
                 headers=self.security_headers
-            )
-            return response
+            )(scope, receive, send)
             
         except Exception as e:
             logger.error(f"❌ Erro no security middleware: {e}")
+            if response_state["started"]:
+                raise
             
-            return JSONResponse(
+            await JSONResponse(
                 status_code=500,
                 content={
                     "error": "Internal security error",
                     "message": "Request could not be processed securely"
                 },
                 headers=self.security_headers
-            )
+            )(scope, receive, send)
     
     async def _basic_security_checks(self, request: Request, client_ip: str):
         """Verificações básicas de segurança."""
-        # Verifica se IP está bloqueado
-        if client_ip in self.blocked_ips:
-            block_expires = self.blocked_ips[client_ip]
-            if datetime.now() < block_expires:
-                raise SecurityValidationError(
-                    f"IP {client_ip} blocked until {block_expires.isoformat()}",
-                    "IP_BLOCKED",
-                    status.HTTP_429_TOO_MANY_REQUESTS
-                )
-            else:
-                # Remove bloqueio expirado
-                del self.blocked_ips[client_ip]
+        # Verifica se IP (ou a rede dele) está bloqueado
+        block = self.ip_blocklist.lookup(client_ip)
+        if block:
+            until = "permanently" if block.permanent else (
+                f"until {datetime.fromtimestamp(block.expires_at).isoformat()}"
+            )
+            raise SecurityValidationError(
+                f"IP {client_ip} blocked {until}",
+                "IP_BLOCKED",
+                status.HTTP_429_TOO_MANY_REQUESTS
+            )
         
         # Valida método HTTP
         if request.method not in self.security_config["allowed_methods"]:
@@ -259,7 +306,8 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             raise SecurityValidationError(
                 f"Rate limit exceeded. Try again in {result.retry_after_seconds}s",
                 "RATE_LIMIT_EXCEEDED",
-                status.HTTP_429_TOO_MANY_REQUESTS
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                headers=headers
             )
         
         # Adiciona headers informativos
@@ -316,18 +364,23 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                     status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
                 )
     
-    async def _detect_attacks(self, request: Request):
-        """Detecta padrões de ataques comuns."""
+    async def _detect_attacks(self, request: Request) -> Optional[bytes]:
+        """
+        Detecta padrões de ataques comuns.
+        
+        Returns:
+            Body lido da request (para ser reentregue ao app) ou None
+        """
+        body = None
+        
         # Pula verificação para endpoint /api/chat - mensagens de chat normais
         if request.url.path == "/api/chat":
-            return  # Não aplica detecção de ataques em mensagens de chat
+            return None  # Não aplica detecção de ataques em mensagens de chat
         
-        # Coleta dados da request para análise
+        # Coleta dados da request para análise (path já está contido na URL)
         request_data = {
             "url": str(request.url),
             "query_params": str(request.query_params),
-            "headers": dict(request.headers),
-            "path": request.url.path,
         }
         
         # Tenta ler body se existir
@@ -344,21 +397,20 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             except Exception:
                 request_data["body"] = "<could_not_read>"
         
-        # Verifica cada categoria de ataque
-        for category, patterns in self.attack_patterns.items():
-            for field_name, field_value in request_data.items():
-                if isinstance(field_value, str):
-                    for pattern in patterns:
-                        if pattern.search(field_value):
-                            logger.warning(
-                                f"🚨 {category.upper()} attack detected from "
-                                f"{self._get_client_ip(request)} in {field_name}"
-                            )
-                            raise SecurityValidationError(
-                                f"Suspicious {category} pattern detected",
-                                f"ATTACK_{category.upper()}",
-                                status.HTTP_400_BAD_REQUEST
-                            )
+        detection = self.attack_detector.scan_fields(request_data)
+        if detection:
+            category, field_name = detection
+            logger.warning(
+                f"🚨 {category.upper()} attack detected from "
+                f"{self._get_client_ip(request)} in {field_name}"
+            )
+            raise SecurityValidationError(
+                f"Suspicious {category} pattern detected",
+                f"ATTACK_{category.upper()}",
+                status.HTTP_400_BAD_REQUEST
+            )
+        
+        return body
     
     def _get_client_ip(self, request: Request) -> str:
         """Obtém IP real do cliente considerando proxies."""
@@ -390,14 +442,14 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         except ValueError:
             return False
     
-    def _add_security_headers(self, response: Response):
+    def _add_security_headers(self, headers: MutableHeaders):
         """Adiciona headers de segurança à resposta."""
         for header, value in self.security_headers.items():
-            response.headers[header] = value
+            headers[header] = value
         
         # Headers dinâmicos
-        response.headers["X-Request-ID"] = str(uuid.uuid4())
-        response.headers["X-Timestamp"] = datetime.now().isoformat()
+        headers["X-Request-ID"] = str(uuid.uuid4())
+        headers["X-Timestamp"] = datetime.now().isoformat()
     
     async def _handle_security_violation(self, client_ip: str, violation: str):
         """Processa violação de segurança."""
@@ -411,14 +463,36 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         self.request_stats[client_ip]["violations"] += 1
         self.request_stats[client_ip]["last_violation"] = datetime.now()
         
-        # Bloqueia IP se muitas violações
-        if self.request_stats[client_ip]["violations"] >= 5:
-            block_duration = timedelta(seconds=self.security_config["rate_limits"]["block_duration"])
-            self.blocked_ips[client_ip] = datetime.now() + block_duration
+        # Bloqueia IP (ou sub-rede, conforme configurado) se muitas violações
+        if self.request_stats[client_ip]["violations"] >= 5 and self._is_valid_ip(client_ip):
+            limits = self.security_config["rate_limits"]
+            prefix = limits["block_prefix_v6"] if ":" in client_ip else limits["block_prefix_v4"]
+            block_duration = timedelta(seconds=limits["block_duration"])
+            entry = self.ip_blocklist.block(
+                f"{client_ip}/{prefix}",
+                block_duration.total_seconds(),
+                reason=violation
+            )
+            
+            logger.warning(f"🔒 {entry.network} blocked for {block_duration} due to repeated violations")
             
-            logger.warning(f"🔒 IP {client_ip} blocked for {block_duration} due to repeated violations")
+            try:
+                await self.ip_blocklist.publish(entry)
+            except Exception as e:
+                logger.error(f"❌ Erro ao publicar bloqueio: {e}")
     
-    async def _log_request(self, request: Request, response: Response, duration: float):
+    async def unblock(self, network: str) -> bool:
+        """Desbloqueia um IP ou rede em todos os workers (remove também do Redis)."""
+        removed = await self.ip_blocklist.withdraw(network)
+        ip = network.split("/")[0]
+        if ip in self.request_stats:
+            self.request_stats[ip]["violations"] = 0
+        self.suspicious_ips.discard(ip)
+        if removed:
+            logger.info(f"🔓 {network} desbloqueado")
+        return removed
+    
+    async def _log_request(self, request: Request, status_code: int, duration: float):
         """Log estruturado da request."""
         client_ip = self._get_client_ip(request)
         
@@ -427,26 +501,40 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             "client_ip": client_ip,
             "method": request.method,
             "path": request.url.path,
-            "status_code": response.status_code,
+            "status_code": status_code,
             "duration_ms": round(duration * 1000, 2),
             "user_agent": request.headers.get("user-agent", ""),
             "referer": request.headers.get("referer", ""),
         }
         
         # Log com nível baseado no status
-        if response.status_code >= 500:
+        if status_code >= 500:
             logger.error(f"Request error: {json.dumps(log_data)}")
-        elif response.status_code >= 400:
+        elif status_code >= 400:
             logger.warning(f"Request warning: {json.dumps(log_data)}")
         else:
             logger.info(f"Request ok: {json.dumps(log_data)}")
 
 
-class CORSSecurityMiddleware(BaseHTTPMiddleware):
-    """Middleware específico para configuração segura de CORS."""
+def _replay_body(body: bytes, receive: Receive) -> Receive:
+    """Cria um receive que entrega primeiro o body já consumido."""
+    delivered = False
+    
+    async def replay() -> Message:
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+    
+    return replay
+
+
+class CORSSecurityMiddleware:
+    """Middleware ASGI específico para configuração segura de CORS."""
     
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp):
+        self.app = app
         self.allowed_origins = {
             "http://localhost:3082",
             "http://localhost:3082",
@@ -455,32 +543,42 @@ class CORSSecurityMiddleware(BaseHTTPMiddleware):
             "http://suthub.agentesintegrados.com"
         }
     
-    async def dispatch(self, request: Request, call_next) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Processa CORS com validação de origem."""
-        origin = request.headers.get("origin")
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        origin = Request(scope).headers.get("origin")
         
         # Valida origem para requests cross-origin
         if origin and origin not in self.allowed_origins:
             logger.warning(f"🚨 Blocked CORS request from unauthorized origin: {origin}")
             
-            return JSONResponse(
+            await JSONResponse(
                 status_code=403,
                 content={
                     "error": "CORS policy violation",
                     "message": f"Origin {origin} not allowed"
                 }
-            )
+            )(scope, receive, send)
+            return
         
-        response = await call_next(request)
+        if not origin:
+            await self.app(scope, receive, send)
+            return
         
-        # Adiciona headers CORS seguros
-        if origin and origin in self.allowed_origins:
-            response.headers["Access-Control-Allow-Origin"] = origin
-            response.headers["Access-Control-Allow-Credentials"] = "true"
-            response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-            response.headers["Access-Control-Allow-Headers"] = (
-                "Accept, Accept-Language, Content-Language, Content-Type, Authorization, X-Requested-With"
-            )
-            response.headers["Access-Control-Max-Age"] = "86400"  # 24 horas
+        async def send_wrapper(message: Message) -> None:
+            # Adiciona headers CORS seguros
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["Access-Control-Allow-Origin"] = origin
+                headers["Access-Control-Allow-Credentials"] = "true"
+                headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+                headers["Access-Control-Allow-Headers"] = (
+                    "Accept, Accept-Language, Content-Language, Content-Type, Authorization, X-Requested-With"
+                )
+                headers["Access-Control-Max-Age"] = "86400"  # 24 horas
+            await send(message)
         
-        return response
\ No newline at end of file
+        await self.app(scope, receive, send_wrapper)
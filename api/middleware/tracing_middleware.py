@@ -0,0 +1,70 @@
+"""
+Middleware de tracing: abre o span raiz de cada request HTTP.
+
+Os spans abertos depois (middlewares internos, ClaudeHandler, SDK, control
+protocol e transporte) viram filhos dele via contextvars. O tempo gasto
+enviando a resposta (frames SSE incluídos) é somado no próprio span raiz,
+em vez de um span por frame.
+"""
+
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sdk'))
+
+from claude_code_sdk.tracing import SPAN_KIND_SERVER, get_tracer
+from utils.logging_config import request_route
+
+
+class TracingMiddleware:
+    """Middleware ASGI puro; sem exporters configurados só define ``request_route``."""
+
+    def __init__(self, app: ASGIApp, exclude_paths: tuple = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        path = scope["path"]
+        # Rota no contexto mesmo sem tracing (logs e profiler de CPU usam)
+        request_route.set(f"{method} {path}")
+
+        tracer = get_tracer()
+        if not tracer.enabled or path in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        send_state = {"seconds": 0.0, "frames": 0, "bytes": 0}
+
+        with tracer.span(f"{method} {path}", kind=SPAN_KIND_SERVER,
+                         **{"http.method": method, "http.target": path}) as span:
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if span.trace_id:
+                        MutableHeaders(scope=message)["X-Trace-ID"] = span.trace_id
+                elif message["type"] == "http.response.body":
+                    send_state["frames"] += 1
+                    send_state["bytes"] += len(message.get("body", b""))
+                started = time.perf_counter()
+                try:
+                    await send(message)
+                finally:
+                    send_state["seconds"] += time.perf_counter() - started
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                span.set_attribute("http.send_ms", send_state["seconds"] * 1000)
+                span.set_attribute("http.body_frames", send_state["frames"])
+                span.set_attribute("http.response_bytes", send_state["bytes"])
@@ -1,9 +1,11 @@
 """Sistema de fallbacks para operações críticas da API Hackathon Flow Blockchain Agents."""
 
 import asyncio
+import hashlib
 import json
 import time
-from typing import Dict, Any, List, Optional, Callable, Union
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable, Tuple, Union
 from datetime import datetime
 from dataclasses import dataclass
 import logging
@@ -33,44 +35,66 @@ class FallbackConfig:
 
 
 class CacheManager:
-    """Gerenciador de cache para respostas."""
+    """
+    Cache LRU com TTL para respostas.
+    
+    ``OrderedDict`` em ordem de uso: leitura, escrita e remoção do item
+    menos usado são O(1). Itens expirados saem quando são lidos. As chaves
+    são um blake2b do JSON canônico dos parâmetros, iguais em todos os
+    workers (``hash()`` de str muda entre processos). Os contadores são
+    mantidos a cada operação, então ``get_stats`` não percorre o cache.
+    """
     
     def __init__(self, max_size: int = 1000):
-        self.cache: Dict[str, Dict[str, Any]] = {}
+        self.cache: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()  # chave -> (expira_em, dados)
         self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.expirations = 0
         
-    def get_cache_key(self, operation: str, params: Dict[str, Any]) -> str:
-        """Gera chave de cache baseada na operação e parâmetros."""
-        # Simplifica parâmetros para criar chave estável
-        key_params = {k: v for k, v in params.items() if isinstance(v, (str, int, float, bool))}
-        return f"{operation}:{hash(str(sorted(key_params.items())))}"
+    def get_cache_key(self, operation: str, params: Optional[Dict[str, Any]]) -> str:
+        """Gera chave de cache estável entre processos para operação e parâmetros."""
+        # Só parâmetros primitivos entram na chave
+        key_params = {
+            k: v for k, v in (params or {}).items()
+            if isinstance(v, (str, int, float, bool))
+        }
+        canonical = json.dumps(key_params, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        digest = hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+        return f"{operation}:{digest}"
     
     def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
         """Obtém item do cache se ainda válido."""
-        if cache_key not in self.cache:
+        item = self.cache.get(cache_key)
+        if item is None:
+            self.misses += 1
             return None
-            
-        item = self.cache[cache_key]
-        if time.time() - item["timestamp"] > item["ttl"]:
+        
+        if time.monotonic() >= item[0]:
             del self.cache[cache_key]
+            self.expirations += 1
+            self.misses += 1
             return None
-            
-        logger.info(f"Cache hit para {cache_key}")
-        return item["data"]
+        
+        self.cache.move_to_end(cache_key)
+        self.hits += 1
+        logger.debug(f"Cache hit para {cache_key}")
+        return item[1]
     
     def set(self, cache_key: str, data: Any, ttl_seconds: int = 300):
-        """Armazena item no cache."""
-        if len(self.cache) >= self.max_size:
-            # Remove item mais antigo
-            oldest_key = min(self.cache.keys(), key=lambda k: self.cache[k]["timestamp"])
-            del self.cache[oldest_key]
+        """Armazena item no cache, removendo o menos usado se estiver cheio."""
+        if cache_key in self.cache:
+            self.cache.move_to_end(cache_key)
+        else:
+            while len(self.cache) >= self.max_size:
+                self.cache.popitem(last=False)
+                self.evictions += 1
         
-        self.cache[cache_key] = {
-            "data": data,
-            "timestamp": time.time(),
-            "ttl": ttl_seconds
-        }
-        logger.info(f"Item cacheado: {cache_key}")
+        self.cache[cache_key] = (time.monotonic() + ttl_seconds, data)
+        self.sets += 1
+        logger.debug(f"Item cacheado: {cache_key}")
     
     def clear(self):
         """Limpa todo o cache."""
@@ -79,16 +103,17 @@ class CacheManager:
     
     def get_stats(self) -> Dict[str, Any]:
         """Retorna estatísticas do cache."""
-        now = time.time()
-        valid_items = sum(1 for item in self.cache.values() 
-                         if now - item["timestamp"] <= item["ttl"])
-        
+        lookups = self.hits + self.misses
         return {
             "total_items": len(self.cache),
-            "valid_items": valid_items,
-            "expired_items": len(self.cache) - valid_items,
             "max_size": self.max_size,
-            "usage_percent": round(len(self.cache) / self.max_size * 100, 2)
+            "usage_percent": round(len(self.cache) / self.max_size * 100, 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "sets": self.sets,
+            "evictions": self.evictions,
+            "expirations": self.expirations
         }
 
 
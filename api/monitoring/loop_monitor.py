@@ -0,0 +1,259 @@
+"""
+Monitor de atraso e bloqueios do event loop.
+
+Uma thread watchdog agenda periodicamente um callback no loop via
+``call_soon_threadsafe`` e mede quanto tempo ele leva para rodar: esse é o
+atraso de agendamento (lag). Quando o callback não roda dentro de
+``block_threshold``, o loop está bloqueado; a watchdog captura a pilha da
+thread do loop naquele instante (``sys._current_frames``), o que aponta a
+chamada síncrona culpada (``subprocess.run``, leitura de arquivo, lock...).
+
+A captura da pilha completa é amostrada (no máximo uma a cada
+``stack_sample_interval`` segundos); o ponto de bloqueio (arquivo:linha da
+função mais interna fora do asyncio) é sempre contabilizado, então os
+locais mais frequentes aparecem em ``get_stats()``.
+
+Opcionalmente (``asyncio_debug=True``) liga o modo debug do asyncio com
+``slow_callback_duration = block_threshold`` e converte os avisos
+"Executing ... took N seconds" em métricas. O modo debug tem custo
+relevante em todo callback; use só para investigação.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitoring import metrics
+from utils.logging_config import configure_log_event, get_contextual_logger
+
+configure_log_event("event_loop_blocked", rate_per_second=1, burst=5, replace=False)
+configure_log_event("event_loop_slow_callback", rate_per_second=1, burst=5, replace=False)
+
+# Frames destes módulos são ignorados ao identificar o ponto de bloqueio
+_LOOP_INTERNALS = (os.sep + "asyncio" + os.sep, os.sep + "selectors.py", os.sep + "threading.py")
+MAX_BLOCKING_SITES = 200
+
+
+class _SlowCallbackHandler(logging.Handler):
+    """Captura os avisos de callback lento emitidos pelo asyncio em modo debug."""
+
+    def __init__(self, monitor: "EventLoopMonitor"):
+        super().__init__(level=logging.WARNING)
+        self.monitor = monitor
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if not isinstance(record.msg, str) or not record.msg.startswith("Executing"):
+            return
+        if not isinstance(record.args, tuple):
+            return
+        try:
+            handle, seconds = record.args[0], float(record.args[1])
+        except (IndexError, TypeError, ValueError):
+            return
+        self.monitor._on_slow_callback(str(handle), seconds)
+
+
+class EventLoopMonitor:
+    """
+    Mede o lag do event loop e detecta callbacks que o bloqueiam.
+
+    Exemplo:
+        monitor = EventLoopMonitor(block_threshold=0.1)
+        monitor.start()   # dentro do loop (startup do servidor)
+        ...
+        monitor.stop()
+    """
+
+    def __init__(
+        self,
+        check_interval: float = 0.1,
+        block_threshold: float = 0.1,
+        stack_sample_interval: float = 30.0,
+        stack_limit: int = 30,
+        asyncio_debug: bool = False,
+        max_reports: int = 20
+    ):
+        self.check_interval = check_interval
+        self.block_threshold = block_threshold
+        self.stack_sample_interval = stack_sample_interval
+        self.stack_limit = stack_limit
+        self.asyncio_debug = asyncio_debug
+        self.logger = get_contextual_logger(__name__)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._debug_handler: Optional[_SlowCallbackHandler] = None
+        self._last_stack_at = float("-inf")
+        # Watchdog escreve, o loop lê (get_stats): contadores e deque sob lock
+        self._lock = threading.Lock()
+
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.blocks = 0
+        self.slow_callbacks = 0
+        self.blocking_sites: Counter = Counter()
+        self.reports: Deque[Dict[str, Any]] = deque(maxlen=max_reports)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Inicia a watchdog para o loop em execução."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+
+        if self.asyncio_debug:
+            self._loop.set_debug(True)
+            self._loop.slow_callback_duration = self.block_threshold
+            self._debug_handler = _SlowCallbackHandler(self)
+            logging.getLogger("asyncio").addHandler(self._debug_handler)
+
+        self._thread = threading.Thread(
+            target=self._watch, name="event-loop-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Para a watchdog e desfaz o modo debug, se ligado."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._debug_handler is not None:
+            logging.getLogger("asyncio").removeHandler(self._debug_handler)
+            self._debug_handler = None
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.set_debug(False)
+
+    def _watch(self) -> None:
+        """Loop da thread watchdog: um ping por ``check_interval``."""
+        while not self._stop.wait(self.check_interval):
+            ran_at: List[float] = []
+            ran = threading.Event()
+
+            def ping() -> None:
+                ran_at.append(time.monotonic())
+                ran.set()
+
+            sent = time.monotonic()
+            try:
+                self._loop.call_soon_threadsafe(ping)
+            except RuntimeError:
+                return  # loop fechado
+
+            if not ran.wait(self.block_threshold):
+                stack = self._sample_stack()
+                site = self._blocking_site()
+                while not ran.wait(self.check_interval):
+                    if self._stop.is_set() or self._loop.is_closed():
+                        return
+                self._on_block(ran_at[0] - sent, site, stack)
+
+            lag = ran_at[0] - sent
+            self.last_lag = lag
+            if lag > self.max_lag:
+                self.max_lag = lag
+            metrics.observe_loop_lag(lag)
+
+    def _loop_frame(self):
+        return sys._current_frames().get(self._loop_thread_id)
+
+    def _blocking_site(self) -> Optional[str]:
+        """Frame mais interno da thread do loop que não pertence ao asyncio."""
+        frame = self._loop_frame()
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if not any(part in filename for part in _LOOP_INTERNALS):
+                return f"{filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+            frame = frame.f_back
+        return None
+
+    def _sample_stack(self) -> Optional[List[str]]:
+        """Pilha da thread do loop, no máximo uma a cada ``stack_sample_interval``."""
+        now = time.monotonic()
+        if now - self._last_stack_at < self.stack_sample_interval:
+            return None
+        frame = self._loop_frame()
+        if frame is None:
+            return None
+        self._last_stack_at = now
+        return [line.rstrip() for line in traceback.format_stack(frame, limit=self.stack_limit)]
+
+    def _record_site(self, site: Optional[str]) -> None:
+        if site is None:
+            return
+        if site in self.blocking_sites or len(self.blocking_sites) < MAX_BLOCKING_SITES:
+            self.blocking_sites[site] += 1
+
+    def _on_block(self, seconds: float, site: Optional[str], stack: Optional[List[str]]) -> None:
+        metrics.observe_loop_block("watchdog", seconds)
+        report = {
+            "source": "watchdog",
+            "blocked_ms": round(seconds * 1000, 1),
+            "site": site,
+            "timestamp": time.time(),
+        }
+        if stack is not None:
+            report["stack"] = stack
+        with self._lock:
+            self.blocks += 1
+            self._record_site(site)
+            self.reports.append(report)
+        self.logger.warning(
+            f"Event loop bloqueado por {seconds * 1000:.0f}ms",
+            extra=lambda: {k: v for k, v in report.items() if k != "timestamp"},
+            event="event_loop_blocked",
+        )
+
+    def _on_slow_callback(self, handle: str, seconds: float) -> None:
+        metrics.observe_loop_block("asyncio_debug", seconds)
+        report = {
+            "source": "asyncio_debug",
+            "blocked_ms": round(seconds * 1000, 1),
+            "callback": handle[:500],
+            "timestamp": time.time(),
+        }
+        with self._lock:
+            self.slow_callbacks += 1
+            self.reports.append(report)
+        self.logger.warning(
+            f"Callback lento no event loop: {seconds * 1000:.0f}ms",
+            extra=lambda: {"callback": report["callback"], "blocked_ms": report["blocked_ms"]},
+            event="event_loop_slow_callback",
+        )
+
+    def get_stats(self, top: int = 10) -> Dict[str, Any]:
+        """Lag atual/máximo, contagem de bloqueios e locais mais frequentes."""
+        with self._lock:
+            blocks = self.blocks
+            slow_callbacks = self.slow_callbacks
+            top_sites = self.blocking_sites.most_common(top)
+            reports = list(self.reports)
+        return {
+            "running": self.running,
+            "asyncio_debug": self.asyncio_debug,
+            "block_threshold_ms": self.block_threshold * 1000,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "blocks": blocks,
+            "slow_callbacks": slow_callbacks,
+            "top_blocking_sites": [
+                {"site": site, "count": count}
+                for site, count in top_sites
+            ],
+            "recent_reports": reports,
+        }
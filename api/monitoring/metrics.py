@@ -0,0 +1,256 @@
+"""
+Métricas Prometheus do pipeline de chat.
+
+Histogramas de latência (TTFT, turno completo, conexão do CLI, espera no
+pool e na fila de concorrência, round-trip de control requests), tamanho e
+intervalo dos frames SSE, atraso e bloqueios do event loop, contadores de
+tokens/custo por projeto e gauges de subprocessos, sessões e filas.
+
+Os gauges são lidos do ``ClaudeHandler`` apenas no momento do scrape
+(``register_handler_gauges``), então não custam nada no caminho da request;
+os histogramas custam uma busca de bucket e um incremento por observação.
+Sem ``prometheus_client`` instalado, todas as métricas viram no-ops.
+"""
+
+import os
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    Counter = Gauge = Histogram = None
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    PROMETHEUS_AVAILABLE = False
+
+
+class _NoopMetric:
+    """Substituto usado quando prometheus_client não está instalado."""
+
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+    def set_function(self, f: Callable[[], float]) -> None:
+        pass
+
+
+# Registry próprio: importar o módulo duas vezes não duplica séries
+REGISTRY = CollectorRegistry() if PROMETHEUS_AVAILABLE else None
+
+
+def _metric(kind, name: str, documentation: str, **kwargs):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return kind(name, documentation, registry=REGISTRY, **kwargs)
+
+
+def _histogram(name: str, documentation: str, buckets: Tuple[float, ...], **kwargs):
+    return _metric(Histogram, name, documentation, buckets=buckets, **kwargs)
+
+
+# Histogramas de latência
+TTFT_SECONDS = _histogram(
+    "claude_ttft_seconds", "Tempo até o primeiro token do modelo",
+    (0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60)
+)
+TURN_DURATION_SECONDS = _histogram(
+    "claude_turn_duration_seconds", "Duração do turno completo (query até ResultMessage)",
+    (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600),
+    labelnames=("outcome",)
+)
+CLI_CONNECT_SECONDS = _histogram(
+    "claude_cli_connect_seconds", "Tempo para iniciar e conectar um subprocesso do CLI",
+    (0.25, 0.5, 1, 2, 3, 5, 10, 20)
+)
+POOL_ACQUIRE_SECONDS = _histogram(
+    "claude_pool_acquire_seconds", "Tempo para obter um cliente (do pool ou novo)",
+    (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 20),
+    labelnames=("source",)
+)
+CONCURRENCY_WAIT_SECONDS = _histogram(
+    "claude_concurrency_queue_wait_seconds", "Espera na fila do limite adaptativo de concorrência",
+    (0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30)
+)
+CONTROL_REQUEST_SECONDS = _histogram(
+    "claude_control_request_seconds", "Round-trip de control requests ao CLI",
+    (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+    labelnames=("subtype",)
+)
+
+# Frames SSE
+SSE_FRAME_BYTES = _histogram(
+    "claude_sse_frame_bytes", "Tamanho dos frames SSE enviados",
+    (32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+)
+SSE_FRAME_INTERVAL_SECONDS = _histogram(
+    "claude_sse_frame_interval_seconds", "Intervalo entre frames SSE consecutivos",
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+# Event loop
+EVENT_LOOP_LAG_SECONDS = _histogram(
+    "claude_event_loop_lag_seconds", "Atraso entre agendar um callback e o loop executá-lo",
+    (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+EVENT_LOOP_BLOCK_SECONDS = _histogram(
+    "claude_event_loop_block_seconds", "Duração dos bloqueios do event loop acima do limite",
+    (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    labelnames=("source",)
+)
+
+# Contadores por projeto
+TOKENS_TOTAL = _metric(
+    Counter, "claude_tokens", "Tokens consumidos", labelnames=("project", "type")
+)
+COST_USD_TOTAL = _metric(
+    Counter, "claude_cost_usd", "Custo acumulado em USD", labelnames=("project",)
+)
+
+CLI_RECYCLES_TOTAL = _metric(
+    Counter, "claude_cli_recycles", "Clientes reciclados por limite de recursos", labelnames=("reason",)
+)
+
+# Gauges (lidos no scrape)
+CLI_PROCESSES = _metric(Gauge, "claude_cli_processes", "Subprocessos do CLI vivos (em uso + no pool)")
+CLI_RSS_BYTES = _metric(Gauge, "claude_cli_rss_bytes", "RSS somado dos subprocessos das sessões (última amostra)")
+SESSIONS_ACTIVE = _metric(Gauge, "claude_sessions_active", "Sessões de chat ativas")
+POOL_IDLE = _metric(Gauge, "claude_pool_idle_connections", "Clientes ociosos no pool")
+CONCURRENCY_IN_FLIGHT = _metric(Gauge, "claude_concurrency_in_flight", "Turnos em andamento")
+CONCURRENCY_QUEUE_DEPTH = _metric(Gauge, "claude_concurrency_queue_depth", "Turnos aguardando vaga")
+CONCURRENCY_LIMIT = _metric(Gauge, "claude_concurrency_limit", "Limite adaptativo atual")
+CIRCUIT_STATE = _metric(
+    Gauge, "claude_circuit_breaker_state", "Estado do circuit breaker (0 fechado, 1 half-open, 2 aberto)",
+    labelnames=("name",)
+)
+CIRCUIT_REJECTED = _metric(
+    Gauge, "claude_circuit_breaker_rejected_calls", "Chamadas rejeitadas pelo circuit breaker (acumulado)",
+    labelnames=("name",)
+)
+
+_CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+_TOKEN_FIELDS = (
+    ("input_tokens", "input"),
+    ("output_tokens", "output"),
+    ("cache_read_input_tokens", "cache_read"),
+    ("cache_creation_input_tokens", "cache_creation"),
+)
+
+
+def register_handler_gauges(handler: Any) -> None:
+    """Liga os gauges ao estado de um ``ClaudeHandler`` (avaliados no scrape)."""
+    limiter = handler.concurrency_limiter
+    CLI_PROCESSES.set_function(lambda: len(handler.clients) + len(handler.connection_pool))
+    SESSIONS_ACTIVE.set_function(lambda: len(handler.active_sessions))
+    POOL_IDLE.set_function(lambda: len(handler.connection_pool))
+    CONCURRENCY_IN_FLIGHT.set_function(lambda: limiter.in_flight)
+    CONCURRENCY_QUEUE_DEPTH.set_function(lambda: limiter.queue_depth)
+    CONCURRENCY_LIMIT.set_function(lambda: limiter.limit)
+    CLI_RSS_BYTES.set_function(lambda: handler.get_resource_usage()["totals"]["rss_bytes"])
+
+
+def register_circuit_breaker_gauges(monitor: Any) -> None:
+    """Liga os gauges aos circuit breakers registrados no ``StabilityMonitor``."""
+    for name, breaker in monitor.circuit_breakers.items():
+        CIRCUIT_STATE.labels(name).set_function(
+            lambda breaker=breaker: _CIRCUIT_STATE_VALUES.get(breaker.state.value, -1)
+        )
+        CIRCUIT_REJECTED.labels(name).set_function(
+            lambda breaker=breaker: getattr(breaker, "rejected_calls", 0)
+        )
+
+
+def install_sdk_hooks(query_cls: Any) -> None:
+    """Registra o observador de round-trip de control requests no SDK."""
+    query_cls.control_request_observer = _observe_control_request
+
+
+def _observe_control_request(subtype: str, seconds: float) -> None:
+    CONTROL_REQUEST_SECONDS.labels(subtype or "unknown").observe(seconds)
+
+
+def observe_turn(slot: Any, failed: bool) -> None:
+    """Registra TTFT, duração e espera na fila de um turno encerrado."""
+    ttft = slot.ttft
+    if ttft is not None:
+        TTFT_SECONDS.observe(ttft)
+    TURN_DURATION_SECONDS.labels("error" if failed else "ok").observe(
+        time.monotonic() - slot.started_at
+    )
+    if slot.queue_wait:
+        CONCURRENCY_WAIT_SECONDS.observe(slot.queue_wait)
+
+
+# project_id vem do corpo da request: só projetos conhecidos viram label,
+# o resto é agregado em "other" (METRICS_PROJECTS, separados por vírgula)
+KNOWN_PROJECTS = frozenset(
+    p.strip() for p in os.environ.get("METRICS_PROJECTS", "neo4j-agent").split(",") if p.strip()
+)
+
+
+def project_label(project: Optional[str]) -> str:
+    """Label limitada para o projeto: o próprio nome se conhecido, senão "other"."""
+    return project if project in KNOWN_PROJECTS else "other"
+
+
+def record_usage(project: str, usage: Optional[Dict[str, Any]], cost_usd: Optional[float]) -> None:
+    """Soma tokens (por tipo) e custo de um ResultMessage ao projeto."""
+    project = project_label(project)
+    if usage:
+        for field, token_type in _TOKEN_FIELDS:
+            value = usage.get(field) if isinstance(usage, dict) else getattr(usage, field, None)
+            if value:
+                TOKENS_TOTAL.labels(project, token_type).inc(value)
+    if cost_usd:
+        COST_USD_TOTAL.labels(project).inc(cost_usd)
+
+
+class SSEFrameRecorder:
+    """Mede tamanho e intervalo dos frames de um stream SSE."""
+
+    __slots__ = ("_last",)
+
+    def __init__(self):
+        self._last: Optional[float] = None
+
+    def record(self, frame: str) -> str:
+        """Registra o frame e o devolve (json.dumps gera ASCII: len == bytes)."""
+        now = time.monotonic()
+        if self._last is not None:
+            SSE_FRAME_INTERVAL_SECONDS.observe(now - self._last)
+        self._last = now
+        SSE_FRAME_BYTES.observe(len(frame))
+        return frame
+
+
+def observe_loop_lag(seconds: float) -> None:
+    EVENT_LOOP_LAG_SECONDS.observe(seconds)
+
+
+def observe_loop_block(source: str, seconds: float) -> None:
+    """``source``: ``watchdog`` (amostragem por thread) ou ``asyncio_debug``."""
+    EVENT_LOOP_BLOCK_SECONDS.labels(source).observe(seconds)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposição no formato texto do Prometheus: (corpo, content type)."""
+    if not PROMETHEUS_AVAILABLE:
+        return b"# prometheus_client nao instalado\n", CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,394 @@
+"""
+Profiling sob demanda de um worker em execução.
+
+- ``SamplingProfiler``: amostragem de pilhas por N segundos, exportada em
+  formato collapsed (flamegraph.pl / speedscope) ou JSON do speedscope.
+  No modo ``cpu`` usa ``signal.setitimer(ITIMER_PROF)``: o handler roda na
+  thread principal (a do event loop) entre bytecodes, dentro do contexto da
+  task interrompida, então cada amostra é atribuída à rota e à sessão dos
+  contextvars de ``utils.logging_config``. No modo ``wall`` (ou fora da
+  thread principal / sem ``setitimer``) uma thread lê
+  ``sys._current_frames()`` da thread do loop, sem atribuição.
+- ``MemoryProfiler``: snapshots do ``tracemalloc`` e diff entre snapshots
+  com os principais pontos de alocação.
+
+Nada é instalado enquanto os profilers estão desligados: sem handler de
+sinal, sem thread e sem tracemalloc, o custo é zero.
+"""
+
+import asyncio
+import json
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.logging_config import get_contextual_logger, request_route, session_id
+
+logger = get_contextual_logger(__name__)
+
+MAX_PROFILE_SECONDS = 300
+UNATTRIBUTED = "-"
+GROUP_BY = ("none", "route", "session")
+
+_Stack = Tuple[Any, ...]  # code objects, da raiz para a folha
+
+
+class ProfilerBusy(RuntimeError):
+    """Já existe uma sessão de profiling em andamento."""
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class CPUProfile:
+    """Resultado de uma sessão de amostragem."""
+
+    def __init__(
+        self,
+        samples: Dict[Tuple[str, str, _Stack], int],
+        mode: str,
+        interval: float,
+        started_at: float,
+        duration: float,
+        dropped: int
+    ):
+        self.samples = samples
+        self.mode = mode
+        self.interval = interval
+        self.started_at = started_at
+        self.duration = duration
+        self.dropped = dropped
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self.samples.values())
+
+    def _grouped(self, group_by: str) -> Dict[str, Dict[_Stack, int]]:
+        if group_by not in GROUP_BY:
+            raise ValueError(f"group_by deve ser um de {GROUP_BY}")
+        groups: Dict[str, Dict[_Stack, int]] = defaultdict(lambda: defaultdict(int))
+        for (route, session, stack), count in self.samples.items():
+            label = {"none": "all", "route": route, "session": session}[group_by]
+            groups[label][stack] += count
+        return groups
+
+    def collapsed(self, group_by: str = "none") -> str:
+        """Uma linha ``raiz;...;folha contagem`` por pilha distinta.
+
+        Com ``group_by`` a rota/sessão entra como frame raiz, separando os
+        flamegraphs por rota ou sessão.
+        """
+        lines = []
+        for label, stacks in self._grouped(group_by).items():
+            prefix = [] if group_by == "none" else [f"{group_by}:{label}"]
+            for stack, count in stacks.items():
+                names = prefix + [_frame_name(code) for code in stack]
+                lines.append(f"{';'.join(names)} {count}")
+        lines.sort()
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def speedscope(self, group_by: str = "none") -> Dict[str, Any]:
+        """Arquivo no formato do speedscope; um perfil por grupo."""
+        frames: List[Dict[str, Any]] = []
+        frame_index: Dict[Any, int] = {}
+        profiles = []
+
+        for label, stacks in sorted(self._grouped(group_by).items()):
+            samples, weights = [], []
+            for stack, count in stacks.items():
+                indexes = []
+                for code in stack:
+                    index = frame_index.get(code)
+                    if index is None:
+                        index = frame_index[code] = len(frames)
+                        frames.append({
+                            "name": code.co_name,
+                            "file": code.co_filename,
+                            "line": code.co_firstlineno,
+                        })
+                    indexes.append(index)
+                samples.append(indexes)
+                weights.append(count * self.interval)
+            profiles.append({
+                "type": "sampled",
+                "name": label if group_by == "none" else f"{group_by}:{label}",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            })
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.mode} profile {time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at))}",
+            "exporter": "neo4j-agent-flow monitoring.profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        by_route: Dict[str, int] = defaultdict(int)
+        by_session: Dict[str, int] = defaultdict(int)
+        for (route, session, _), count in self.samples.items():
+            by_route[route] += count
+            by_session[session] += count
+        return {
+            "mode": self.mode,
+            "interval_ms": self.interval * 1000,
+            "duration_seconds": round(self.duration, 3),
+            "samples": self.sample_count,
+            "distinct_stacks": len(self.samples),
+            "dropped": self.dropped,
+            "by_route": dict(by_route),
+            "by_session": dict(by_session),
+        }
+
+
+class SamplingProfiler:
+    """
+    Profiler de amostragem controlado por ``start``/``stop``.
+
+    Exemplo:
+        profiler = SamplingProfiler()
+        profiler.start(seconds=30)          # para sozinho após 30s
+        ...
+        profile = profiler.stop() or profiler.last_profile
+        open("cpu.txt", "w").write(profile.collapsed(group_by="route"))
+    """
+
+    def __init__(self, max_depth: int = 128, max_stacks: int = 50000):
+        self.max_depth = max_depth
+        self.max_stacks = max_stacks
+        self.last_profile: Optional[CPUProfile] = None
+
+        self._active = False
+        self._mode = "cpu"
+        self._interval = 0.005
+        self._samples: Dict[Tuple[str, str, _Stack], int] = {}
+        self._dropped = 0
+        self._started_at = 0.0
+        self._started_perf = 0.0
+        self._previous_handler = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_stop = threading.Event()
+        self._target_thread_id: Optional[int] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def active(self) -> bool:
+        return self._active
+
+    @staticmethod
+    def cpu_mode_available() -> bool:
+        return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+    def start(self, seconds: float = 30.0, interval: float = 0.005, mode: str = "cpu") -> Dict[str, Any]:
+        """Inicia a amostragem; chamada de dentro do event loop."""
+        if self._active:
+            raise ProfilerBusy("Profiling de CPU já está em andamento")
+        if mode not in ("cpu", "wall"):
+            raise ValueError("mode deve ser 'cpu' ou 'wall'")
+        seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+        if mode == "cpu" and not self.cpu_mode_available():
+            mode = "wall"
+
+        self._mode = mode
+        self._interval = max(interval, 0.001)
+        self._samples = {}
+        self._dropped = 0
+        self._started_at = time.time()
+        self._started_perf = time.perf_counter()
+        self._active = True
+
+        if mode == "cpu":
+            self._previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self._interval, self._interval)
+        else:
+            self._target_thread_id = threading.get_ident()
+            self._thread_stop.clear()
+            self._thread = threading.Thread(
+                target=self._sample_thread, name="cpu-profiler", daemon=True
+            )
+            self._thread.start()
+
+        self._timer = asyncio.get_running_loop().call_later(seconds, self.stop)
+        logger.info(f"Profiling {mode} iniciado por {seconds:.0f}s", extra={"interval_ms": self._interval * 1000})
+        return {"mode": mode, "seconds": seconds, "interval_ms": self._interval * 1000}
+
+    def stop(self) -> Optional[CPUProfile]:
+        """Encerra a amostragem e guarda o resultado em ``last_profile``."""
+        if not self._active:
+            return None
+        self._active = False
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._mode == "cpu":
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+            self._previous_handler = None
+        else:
+            self._thread_stop.set()
+            if self._thread is not None:
+                self._thread.join(1.0)
+                self._thread = None
+
+        self.last_profile = CPUProfile(
+            self._samples,
+            self._mode,
+            self._interval,
+            self._started_at,
+            time.perf_counter() - self._started_perf,
+            self._dropped,
+        )
+        self._samples = {}
+        logger.info("Profiling encerrado", extra=self.last_profile.summary())
+        return self.last_profile
+
+    def _record(self, frame, route: str, session: str) -> None:
+        stack = []
+        depth = 0
+        while frame is not None and depth < self.max_depth:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+            depth += 1
+        stack.reverse()
+        key = (route, session, tuple(stack))
+        samples = self._samples
+        if key in samples:
+            samples[key] += 1
+        elif len(samples) < self.max_stacks:
+            samples[key] = 1
+        else:
+            self._dropped += 1
+
+    def _on_signal(self, signum, frame) -> None:
+        """Handler de SIGPROF: roda no contexto da task interrompida."""
+        if self._active:
+            self._record(
+                frame,
+                request_route.get() or UNATTRIBUTED,
+                session_id.get() or UNATTRIBUTED,
+            )
+
+    def _sample_thread(self) -> None:
+        while not self._thread_stop.wait(self._interval):
+            frame = sys._current_frames().get(self._target_thread_id)
+            if frame is not None:
+                self._record(frame, UNATTRIBUTED, UNATTRIBUTED)
+            del frame
+
+
+class MemoryProfiler:
+    """
+    Snapshots do ``tracemalloc`` e diffs entre eles.
+
+    ``tracemalloc`` só rastreia alocações depois de ``start``; o diff entre
+    dois snapshots mostra onde a memória cresceu nesse intervalo. Alocações
+    não carregam contexto de request, então não há atribuição por sessão.
+    """
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._baseline_at: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 25) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._baseline = None
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._baseline = None
+        self._baseline_at = None
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            return {"tracing": False}
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": True,
+            "traceback_limit": tracemalloc.get_traceback_limit(),
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+            "baseline_at": self._baseline_at,
+        }
+
+    @staticmethod
+    def _take() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def snapshot(self, top: int = 25, key_type: str = "lineno", diff: bool = True) -> Dict[str, Any]:
+        """
+        Tira um snapshot e devolve os maiores pontos de alocação.
+
+        Com ``diff=True`` e um snapshot anterior, inclui também o crescimento
+        desde ele; o novo snapshot vira a linha de base seguinte.
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc não está ativo")
+        if key_type not in ("lineno", "filename", "traceback"):
+            raise ValueError("key_type deve ser 'lineno', 'filename' ou 'traceback'")
+
+        snapshot = self._take()
+        result: Dict[str, Any] = {
+            **self.status(),
+            "top": [self._stat_to_dict(stat) for stat in snapshot.statistics(key_type)[:top]],
+        }
+        if diff and self._baseline is not None:
+            result["since_seconds"] = round(time.time() - self._baseline_at, 3)
+            result["diff"] = [
+                self._stat_to_dict(stat)
+                for stat in snapshot.compare_to(self._baseline, key_type)[:top]
+            ]
+        self._baseline = snapshot
+        self._baseline_at = time.time()
+        return result
+
+    @staticmethod
+    def _stat_to_dict(stat) -> Dict[str, Any]:
+        frames = [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+        data = {"site": frames[0] if frames else None, "size_bytes": stat.size, "count": stat.count}
+        if len(frames) > 1:
+            data["traceback"] = frames
+        if isinstance(stat, tracemalloc.StatisticDiff):
+            data["size_diff_bytes"] = stat.size_diff
+            data["count_diff"] = stat.count_diff
+        return data
+
+
+cpu_profiler = SamplingProfiler()
+memory_profiler = MemoryProfiler()
+
+
+def render_profile(profile: CPUProfile, fmt: str = "collapsed", group_by: str = "none") -> Tuple[str, str]:
+    """(corpo, media type) de um perfil em ``collapsed`` ou ``speedscope``."""
+    if fmt == "collapsed":
+        return profile.collapsed(group_by), "text/plain; charset=utf-8"
+    if fmt == "speedscope":
+        return json.dumps(profile.speedscope(group_by)), "application/json"
+    raise ValueError("format deve ser 'collapsed' ou 'speedscope'")
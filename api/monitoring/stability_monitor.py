@@ -115,7 +115,250 @@ class CircuitBreaker:
 
 class CircuitBreakerOpenException(Exception):
     """Exceção lançada quando circuit breaker está aberto."""
-    pass
+    
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class SlidingWindowConfig:
+    """Configuração do circuit breaker por taxa de erro em janela deslizante."""
+    window_seconds: float = 60.0           # Janela avaliada
+    bucket_seconds: float = 5.0            # Granularidade da janela
+    minimum_calls: int = 10                # Chamadas mínimas na janela para avaliar
+    failure_rate_threshold: float = 0.5    # Abre com >= 50% de falhas
+    slow_call_duration: float = 10.0       # Acima disso a chamada é lenta
+    slow_call_rate_threshold: float = 0.8  # Abre com >= 80% de chamadas lentas
+    open_seconds: float = 30.0             # Tempo aberto antes de HALF_OPEN
+    half_open_max_calls: int = 3           # Chamadas de teste em HALF_OPEN
+
+
+class SlidingWindowCircuitBreaker:
+    """
+    Circuit breaker por taxa de erro e de chamadas lentas numa janela de tempo.
+    
+    A janela é um anel de buckets (chamadas, falhas, lentas) com totais
+    mantidos incrementalmente: registrar e consultar são O(1). Com pelo
+    menos ``minimum_calls`` na janela, o circuito abre quando a taxa de
+    falhas ou de chamadas lentas passa do limite. Aberto, ``acquire`` falha
+    imediatamente com ``CircuitBreakerOpenException`` (com ``retry_after``);
+    após ``open_seconds`` deixa passar ``half_open_max_calls`` chamadas de
+    teste: todas bem-sucedidas fecham o circuito, uma falha reabre. Sondas
+    sem veredito por ``open_seconds`` (reserva perdida) também reabrem, para
+    que o circuito nunca fique preso em HALF_OPEN.
+    
+    Toda reserva precisa terminar em ``record`` ou ``release``, inclusive
+    em cancelamento:
+        started = breaker.acquire()          # lança se aberto
+        try:
+            result = await chamada()
+        except Exception:
+            breaker.record(started, failed=True)
+            raise
+        except BaseException:
+            breaker.release(started)         # cancelada: não conta
+            raise
+        breaker.record(started, failed=False)
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        config: Optional[SlidingWindowConfig] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.config = config or SlidingWindowConfig()
+        self._clock = clock
+        self._bucket_count = max(1, int(round(self.config.window_seconds / self.config.bucket_seconds)))
+        # [época do bucket, chamadas, falhas, lentas]
+        self._buckets = [[-1, 0, 0, 0] for _ in range(self._bucket_count)]
+        self._calls = self._failures = self._slow = 0
+        
+        self.state = CircuitState.CLOSED
+        self.opened_at: Optional[float] = None
+        self.half_open_since: Optional[float] = None
+        self.half_open_in_flight = 0
+        self.half_open_successes = 0
+        self.rejected_calls = 0
+        self.last_open_reason: Optional[str] = None
+    
+    # Janela
+    
+    def _bucket(self, now: float) -> List[int]:
+        epoch = int(now // self.config.bucket_seconds)
+        bucket = self._buckets[epoch % self._bucket_count]
+        if bucket[0] != epoch:
+            # Bucket expirado: sai da janela antes de ser reutilizado
+            self._calls -= bucket[1]
+            self._failures -= bucket[2]
+            self._slow -= bucket[3]
+            bucket[0], bucket[1], bucket[2], bucket[3] = epoch, 0, 0, 0
+        return bucket
+    
+    def _expire(self, now: float) -> None:
+        oldest_epoch = int(now // self.config.bucket_seconds) - self._bucket_count + 1
+        for bucket in self._buckets:
+            if 0 <= bucket[0] < oldest_epoch:
+                self._calls -= bucket[1]
+                self._failures -= bucket[2]
+                self._slow -= bucket[3]
+                bucket[0], bucket[1], bucket[2], bucket[3] = -1, 0, 0, 0
+    
+    def _reset_window(self) -> None:
+        for bucket in self._buckets:
+            bucket[0], bucket[1], bucket[2], bucket[3] = -1, 0, 0, 0
+        self._calls = self._failures = self._slow = 0
+    
+    def rates(self) -> Dict[str, Any]:
+        """Chamadas, taxa de falhas e de chamadas lentas na janela atual."""
+        self._expire(self._clock())
+        calls = self._calls
+        return {
+            "calls": calls,
+            "failure_rate": self._failures / calls if calls else 0.0,
+            "slow_call_rate": self._slow / calls if calls else 0.0,
+        }
+    
+    # Estado
+    
+    def _open(self, now: float, reason: str) -> None:
+        self.state = CircuitState.OPEN
+        self.opened_at = now
+        self.half_open_in_flight = 0
+        self.half_open_successes = 0
+        self.last_open_reason = reason
+        logger.warning(f"Circuit breaker {self.name} ABERTO ({reason})")
+    
+    def _retry_after(self, now: float) -> float:
+        return max(0.0, self.opened_at + self.config.open_seconds - now)
+    
+    def check(self) -> None:
+        """Lança ``CircuitBreakerOpenException`` se uma chamada seria rejeitada, sem reservá-la."""
+        now = self._clock()
+        if self.state == CircuitState.OPEN:
+            retry_after = self._retry_after(now)
+            if retry_after > 0:
+                self.rejected_calls += 1
+                raise CircuitBreakerOpenException(
+                    f"Circuit breaker {self.name} está aberto", retry_after=retry_after
+                )
+            self.state = CircuitState.HALF_OPEN
+            self.half_open_since = now
+            self.half_open_in_flight = 0
+            self.half_open_successes = 0
+            logger.info(f"Circuit breaker {self.name} mudou para HALF_OPEN")
+        
+        if (self.state == CircuitState.HALF_OPEN
+                and self.half_open_in_flight >= self.config.half_open_max_calls):
+            if now - self.half_open_since >= self.config.open_seconds:
+                # Sondas sem veredito: reabre e descarta as reservas pendentes
+                self._open(now, "sondas em HALF_OPEN sem resposta")
+                self.rejected_calls += 1
+                raise CircuitBreakerOpenException(
+                    f"Circuit breaker {self.name} está aberto", retry_after=self.config.open_seconds
+                )
+            self.rejected_calls += 1
+            raise CircuitBreakerOpenException(
+                f"Circuit breaker {self.name} em HALF_OPEN sem vagas de teste",
+                retry_after=self.config.bucket_seconds
+            )
+    
+    def acquire(self) -> float:
+        """Reserva uma chamada; devolve o instante de início para ``record``."""
+        self.check()
+        if self.state == CircuitState.HALF_OPEN:
+            self.half_open_in_flight += 1
+        return self._clock()
+    
+    def record(self, started: float, failed: bool, duration: Optional[float] = None) -> None:
+        """
+        Registra o resultado de uma chamada obtida com ``acquire``.
+        
+        Args:
+            started: Valor devolvido por ``acquire``
+            failed: Se a chamada falhou
+            duration: Duração a comparar com ``slow_call_duration``
+                (padrão: tempo desde ``started``)
+        """
+        now = self._clock()
+        duration = now - started if duration is None else duration
+        slow = duration >= self.config.slow_call_duration
+        
+        if self.opened_at is not None and started < self.opened_at:
+            return  # Chamada iniciada antes da última abertura
+        
+        if self.state == CircuitState.HALF_OPEN:
+            self.half_open_in_flight = max(0, self.half_open_in_flight - 1)
+            if failed or slow:
+                self._open(now, "falha em HALF_OPEN" if failed else "chamada lenta em HALF_OPEN")
+                return
+            self.half_open_successes += 1
+            if self.half_open_successes >= self.config.half_open_max_calls:
+                self.state = CircuitState.CLOSED
+                self._reset_window()
+                logger.info(f"Circuit breaker {self.name} FECHADO (funcionando)")
+            return
+        
+        bucket = self._bucket(now)
+        bucket[1] += 1
+        self._calls += 1
+        if failed:
+            bucket[2] += 1
+            self._failures += 1
+        if slow:
+            bucket[3] += 1
+            self._slow += 1
+        
+        self._expire(now)
+        if self._calls >= self.config.minimum_calls and (self._failures or self._slow):
+            failure_rate = self._failures / self._calls
+            slow_rate = self._slow / self._calls
+            if failure_rate >= self.config.failure_rate_threshold:
+                self._open(now, f"taxa de falhas {failure_rate:.0%}")
+            elif slow_rate >= self.config.slow_call_rate_threshold:
+                self._open(now, f"taxa de chamadas lentas {slow_rate:.0%}")
+    
+    def release(self, started: float) -> None:
+        """Devolve uma chamada abandonada (cancelada pelo cliente) sem contá-la."""
+        if self.state == CircuitState.HALF_OPEN and (self.opened_at is None or started >= self.opened_at):
+            self.half_open_in_flight = max(0, self.half_open_in_flight - 1)
+    
+    async def execute(self, func: Callable, *args, **kwargs):
+        """Executa função protegida pelo circuit breaker."""
+        started = self.acquire()
+        try:
+            result = await func(*args, **kwargs) if asyncio.iscoroutinefunction(func) else func(*args, **kwargs)
+        except Exception:
+            self.record(started, failed=True)
+            raise
+        except BaseException:
+            self.release(started)
+            raise
+        self.record(started, failed=False)
+        return result
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do circuit breaker."""
+        now = self._clock()
+        return {
+            "name": self.name,
+            "type": "sliding_window",
+            "state": self.state.value,
+            **self.rates(),
+            "rejected_calls": self.rejected_calls,
+            "last_open_reason": self.last_open_reason,
+            "retry_after": self._retry_after(now) if self.state == CircuitState.OPEN else None,
+            "config": {
+                "window_seconds": self.config.window_seconds,
+                "minimum_calls": self.config.minimum_calls,
+                "failure_rate_threshold": self.config.failure_rate_threshold,
+                "slow_call_duration": self.config.slow_call_duration,
+                "slow_call_rate_threshold": self.config.slow_call_rate_threshold,
+                "open_seconds": self.config.open_seconds
+            }
+        }
 
 
 class ReconnectionManager:
@@ -152,15 +395,39 @@ class ReconnectionManager:
                 await asyncio.sleep(delay)
 
 
+@dataclass
+class HealthCheck:
+    """Health check registrado."""
+    func: Callable
+    timeout: float = 5.0        # Timeout individual
+    critical: bool = True       # Se falhar, a instância não está pronta (readiness)
+
+
 class StabilityMonitor:
-    """Monitor geral de estabilidade do sistema."""
+    """
+    Monitor geral de estabilidade do sistema.
+    
+    Os health checks rodam concorrentemente, cada um com seu timeout; o
+    resultado fica em cache e é reaproveitado por ``health_cache_max_age``
+    segundos. Execuções simultâneas compartilham a mesma rodada, então
+    probes de load balancer nunca se acumulam. ``liveness`` não executa
+    checks; ``readiness`` lê o cache (mantido fresco pelo refresher em
+    background, se iniciado).
+    """
     
     def __init__(self):
         self.circuit_breakers: Dict[str, CircuitBreaker] = {}
         self.reconnection_manager = ReconnectionManager()
-        self.health_checks: Dict[str, Callable] = {}
+        self.health_checks: Dict[str, HealthCheck] = {}
         self.last_health_check: Optional[datetime] = None
         self.health_check_interval = 300  # 5 minutos
+        self.health_cache_max_age = 30.0  # Idade máxima do resultado em cache
+        self.started_at = time.time()
+        
+        self._last_report: Optional[Dict[str, Any]] = None
+        self._last_report_at: float = 0.0  # time.monotonic()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresher_task: Optional[asyncio.Task] = None
         
     def register_circuit_breaker(
         self, 
@@ -173,46 +440,143 @@ class StabilityMonitor:
         logger.info(f"Circuit breaker '{name}' registrado")
         return cb
     
+    def register_sliding_window_breaker(
+        self,
+        name: str,
+        config: Optional[SlidingWindowConfig] = None
+    ) -> SlidingWindowCircuitBreaker:
+        """Registra um circuit breaker por taxa de erro/lentidão em janela deslizante."""
+        cb = SlidingWindowCircuitBreaker(name, config)
+        self.circuit_breakers[name] = cb
+        logger.info(f"Circuit breaker '{name}' (janela deslizante) registrado")
+        return cb
+    
     def get_circuit_breaker(self, name: str) -> Optional[CircuitBreaker]:
         """Obtém circuit breaker por nome."""
         return self.circuit_breakers.get(name)
     
-    def register_health_check(self, name: str, check_func: Callable):
-        """Registra função de health check."""
-        self.health_checks[name] = check_func
+    def register_health_check(
+        self,
+        name: str,
+        check_func: Callable,
+        timeout: float = 5.0,
+        critical: bool = True
+    ):
+        """
+        Registra função de health check.
+        
+        A função pode ser síncrona (roda numa thread, sem bloquear o loop) ou
+        coroutine; exceção ou timeout marcam o check como falho.
+        """
+        self.health_checks[name] = HealthCheck(check_func, timeout, critical)
         logger.info(f"Health check '{name}' registrado")
     
-    async def run_health_checks(self) -> Dict[str, Any]:
-        """Executa todos os health checks."""
-        results = {}
-        overall_healthy = True
+    async def run_health_checks(self, max_age: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Executa os health checks, ou devolve o resultado em cache.
         
-        for name, check_func in self.health_checks.items():
-            try:
-                if asyncio.iscoroutinefunction(check_func):
-                    result = await asyncio.wait_for(check_func(), timeout=30.0)
-                else:
-                    result = check_func()
-                    
-                results[name] = {"status": "healthy", "result": result}
-                
-            except asyncio.TimeoutError:
-                results[name] = {"status": "timeout", "error": "Health check timeout"}
-                overall_healthy = False
-                
-            except Exception as e:
-                results[name] = {"status": "error", "error": str(e)}
-                overall_healthy = False
-                logger.error(f"Health check '{name}' falhou: {e}")
+        Args:
+            max_age: Idade máxima aceita para o cache em segundos
+                (padrão ``health_cache_max_age``; 0 força nova rodada)
+        """
+        max_age = self.health_cache_max_age if max_age is None else max_age
+        if self._last_report is not None and time.monotonic() - self._last_report_at <= max_age:
+            return self._cached_report()
         
-        self.last_health_check = datetime.now()
+        # Single-flight: quem chega durante uma rodada espera a mesma rodada
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        await asyncio.shield(self._refresh_task)
+        return self._cached_report()
+    
+    async def _refresh(self) -> None:
+        names = list(self.health_checks)
+        outcomes = await asyncio.gather(*(self._run_check(name) for name in names))
+        results = dict(zip(names, outcomes))
+        overall_healthy = all(r["status"] == "healthy" for r in results.values())
         
-        return {
+        self.last_health_check = datetime.now()
+        self._last_report_at = time.monotonic()
+        self._last_report = {
             "timestamp": self.last_health_check.isoformat(),
             "overall_status": "healthy" if overall_healthy else "degraded",
             "checks": results
         }
     
+    async def _run_check(self, name: str) -> Dict[str, Any]:
+        check = self.health_checks[name]
+        started = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(check.func):
+                result = await asyncio.wait_for(check.func(), timeout=check.timeout)
+            else:
+                result = await asyncio.wait_for(asyncio.to_thread(check.func), timeout=check.timeout)
+            outcome = {"status": "healthy", "result": result}
+            
+        except asyncio.TimeoutError:
+            outcome = {"status": "timeout", "error": f"Health check timeout ({check.timeout}s)"}
+            
+        except Exception as e:
+            outcome = {"status": "error", "error": str(e)}
+            logger.error(f"Health check '{name}' falhou: {e}")
+        
+        outcome["critical"] = check.critical
+        outcome["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return outcome
+    
+    def _cached_report(self) -> Dict[str, Any]:
+        return {**self._last_report, "age_seconds": round(time.monotonic() - self._last_report_at, 3)}
+    
+    def start_background_refresh(self, interval: Optional[float] = None) -> None:
+        """Reexecuta os checks periodicamente para manter o cache fresco."""
+        if self._refresher_task is not None and not self._refresher_task.done():
+            return
+        interval = interval or self.health_cache_max_age / 2
+        self._refresher_task = asyncio.create_task(self._refresh_loop(interval))
+        logger.info(f"Refresher de health checks iniciado (intervalo {interval}s)")
+    
+    async def stop_background_refresh(self) -> None:
+        """Para o refresher em background."""
+        if self._refresher_task is None:
+            return
+        self._refresher_task.cancel()
+        try:
+            await self._refresher_task
+        except asyncio.CancelledError:
+            pass
+        self._refresher_task = None
+    
+    async def _refresh_loop(self, interval: float) -> None:
+        while True:
+            try:
+                await self.run_health_checks(max_age=0)
+            except Exception as e:
+                logger.error(f"Erro no refresher de health checks: {e}")
+            await asyncio.sleep(interval)
+    
+    def liveness(self) -> Dict[str, Any]:
+        """Processo vivo e loop respondendo; não executa nenhum check."""
+        return {
+            "status": "alive",
+            "timestamp": datetime.now().isoformat(),
+            "uptime_seconds": round(time.time() - self.started_at, 1)
+        }
+    
+    async def readiness(self, max_age: Optional[float] = None) -> Dict[str, Any]:
+        """Pronto quando todos os checks críticos estão saudáveis (resultado em cache)."""
+        report = await self.run_health_checks(max_age=max_age)
+        failing = [
+            name for name, result in report["checks"].items()
+            if result["critical"] and result["status"] != "healthy"
+        ]
+        return {
+            "ready": not failing,
+            "failing_checks": failing,
+            "checked_at": report["timestamp"],
+            "age_seconds": report["age_seconds"],
+            "checks": {name: result["status"] for name, result in report["checks"].items()}
+        }
+    
     def get_system_status(self) -> Dict[str, Any]:
         """Retorna status geral do sistema."""
         circuit_stats = {}
@@ -224,7 +588,8 @@ class StabilityMonitor:
             "circuit_breakers": circuit_stats,
             "health_checks": {
                 "last_check": self.last_health_check.isoformat() if self.last_health_check else None,
-                "registered_checks": list(self.health_checks.keys())
+                "registered_checks": list(self.health_checks.keys()),
+                "background_refresh": self._refresher_task is not None and not self._refresher_task.done()
             }
         }
     
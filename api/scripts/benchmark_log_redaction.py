@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark da redação de dados sensíveis nos logs do SDK.
+
+Compara o filtro antigo (um re.sub por padrão em cada campo string, sem
+exceções) com o SensitiveDataFilter atual (alternação única, chaves
+seguras e memoização), usando records típicos do StructuredLogger.
+
+Uso:
+    python scripts/benchmark_log_redaction.py --records 20000
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sdk"))
+
+from claude_code_sdk.logging import SensitiveDataFilter
+
+
+class LegacyFilter:
+    """Filtro usado antes da alternação única."""
+
+    def __init__(self):
+        self.compiled_patterns = [
+            (re.compile(pattern), replacement)
+            for pattern, replacement in SensitiveDataFilter.DEFAULT_PATTERNS
+        ]
+
+    def filter(self, text):
+        for pattern, replacement in self.compiled_patterns:
+            text = pattern.sub(replacement, text)
+        return text
+
+    def filter_dict(self, data):
+        filtered = {}
+        sensitive_keys = {'password', 'secret', 'token', 'api_key', 'apikey', 'auth'}
+        for key, value in data.items():
+            if any(sensitive in key.lower() for sensitive in sensitive_keys):
+                filtered[key] = '[REDACTED]'
+            elif isinstance(value, str):
+                filtered[key] = self.filter(value)
+            elif isinstance(value, dict):
+                filtered[key] = self.filter_dict(value)
+            elif isinstance(value, list):
+                filtered[key] = [self.filter(i) if isinstance(i, str) else i for i in value]
+            else:
+                filtered[key] = value
+        return filtered
+
+
+def build_records(count):
+    """Mistura de mensagens constantes, campos únicos e payloads maiores."""
+    records = []
+    for i in range(count):
+        record = {
+            "level": "INFO",
+            "message": "Cliente obtido do pool" if i % 3 else f"Sessão {i} criada",
+            "logger": "claude_code_sdk.client",
+            "_created": 1700000000.0 + i,
+            "event": "client_from_pool",
+            "pool_size": i % 10,
+            "context": {
+                "request_id": f"req-{i:08x}",
+                "session_id": f"session-{i % 50}",
+                "user_ip": "10.0.0.1",
+            },
+        }
+        if i % 10 == 0:
+            record["prompt"] = (
+                f"Usuário user{i}@example.com pediu para revisar o deploy; "
+                "api_key=sk-test-123 " + "texto de contexto " * 40
+            )
+        if i % 25 == 0:
+            record["tools"] = ["Read", "Write", "Bash", "mcp__neo4j__query"]
+        records.append(record)
+    return records
+
+
+def measure(name, filter_dict, records):
+    started = time.perf_counter()
+    for record in records:
+        filter_dict(record)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<24} {len(records) / elapsed:10,.0f} records/s  {elapsed / len(records) * 1e6:6.1f}µs/record")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000)
+    args = parser.parse_args()
+
+    records = build_records(args.records)
+    legacy_filter = LegacyFilter()
+    current_filter = SensitiveDataFilter()
+
+    sample = records[0]
+    assert legacy_filter.filter_dict(sample) == current_filter.filter_dict(sample)
+
+    legacy = measure("re.sub por padrão", legacy_filter.filter_dict, records)
+    current = measure("SensitiveDataFilter", current_filter.filter_dict, records)
+    print(f"speedup: {legacy / current:.1f}x  cache={current_filter._cached_filter.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark do overhead por request dos middlewares da API.
+
+Chama a pilha ASGI diretamente (sem servidor HTTP) e compara:
+- app sem middleware (referência)
+- passthrough em BaseHTTPMiddleware (custo do modelo antigo)
+- ErrorHandlingMiddleware, CORSSecurityMiddleware e SecurityMiddleware (ASGI puro)
+
+Também mede um stream SSE para confirmar que os chunks passam sem buffer.
+
+Uso:
+    python scripts/benchmark_middleware.py --requests 5000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middleware.exception_middleware import ErrorHandlingMiddleware
+from middleware.security_middleware import CORSSecurityMiddleware, SecurityMiddleware
+
+
+class PassthroughHTTPMiddleware(BaseHTTPMiddleware):
+    """BaseHTTPMiddleware que não faz nada: isola o custo do wrapping."""
+
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+def build_app(middleware_classes):
+    app = FastAPI()
+
+    @app.get("/api/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/api/stream")
+    async def stream():
+        async def events():
+            for i in range(20):
+                yield f"data: {i}\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    for middleware_class in middleware_classes:
+        app.add_middleware(middleware_class)
+    return app
+
+
+async def call(app, path):
+    """Executa uma request ASGI e retorna (status, chunks de body)."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"user-agent", b"bench")],
+        "client": ("127.0.0.1", 12345),
+        "server": ("localhost", 8080),
+    }
+    status = None
+    chunks = 0
+    request_sent = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Como um servidor real: só retorna no disconnect
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, chunks
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and message.get("body"):
+            chunks += 1
+
+    await app(scope, receive, send)
+    disconnected.set()
+    return status, chunks
+
+
+async def measure(name, app, total, baseline=None):
+    # Aquece a pilha e confirma o streaming antes que o rate limit atue
+    _, chunks = await call(app, "/api/stream")
+    started = time.perf_counter()
+    for _ in range(total):
+        await call(app, "/api/health")
+    per_request = (time.perf_counter() - started) / total * 1e6
+
+    overhead = f" (+{per_request - baseline:.1f}µs)" if baseline is not None else ""
+    print(f"{name:<40} {per_request:8.1f}µs/req{overhead}  stream chunks={chunks}")
+    return per_request
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    # Os middlewares logam cada request; o benchmark mede só o pipeline
+    logging.disable(logging.CRITICAL)
+
+    baseline = await measure("sem middleware", build_app([]), args.requests)
+    await measure("BaseHTTPMiddleware passthrough", build_app([PassthroughHTTPMiddleware]), args.requests, baseline)
+    await measure("ErrorHandlingMiddleware", build_app([ErrorHandlingMiddleware]), args.requests, baseline)
+    await measure("CORSSecurityMiddleware", build_app([CORSSecurityMiddleware]), args.requests, baseline)
+    await measure("SecurityMiddleware", build_app([SecurityMiddleware]), args.requests, baseline)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
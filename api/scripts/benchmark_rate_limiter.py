@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark e verificação do rate limiting.
+
+Backend redis: requer um redis-server local (padrão: redis://localhost:6379/15).
+Mede a latência por verificação (p50/p95/p99) e confirma que requisições
+concorrentes nunca ultrapassam o limite da regra.
+
+Backend memory: mede o GCRA em memória com muitos clientes distintos,
+reportando latência e memória por cliente.
+
+Uso:
+    python scripts/benchmark_rate_limiter.py --requests 5000 --concurrency 50
+    python scripts/benchmark_rate_limiter.py --backend memory --clients 100000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from middleware.rate_limiter import GCRARateLimiter, RateLimitRule, RedisRateLimiter
+
+
+def percentile(samples, fraction):
+    """Percentil de uma lista já ordenada."""
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def check_atomicity(limiter: RedisRateLimiter, concurrency: int) -> bool:
+    """Dispara requisições simultâneas contra uma regra pequena."""
+    rule = RateLimitRule(requests_per_minute=10, window_size_seconds=60, block_duration_seconds=5)
+    client_id = f"bench-atomic-{time.time_ns()}"
+    results = await asyncio.gather(*[
+        limiter.check_rate_limit(client_id, rule) for _ in range(concurrency)
+    ])
+    admitted = sum(1 for r in results if r.allowed)
+    print(f"🔒 Atomicidade: {admitted}/{concurrency} admitidas (limite {rule.requests_per_minute})")
+    return admitted == min(concurrency, rule.requests_per_minute)
+
+
+async def measure_latency(limiter: RedisRateLimiter, total: int, concurrency: int):
+    """Mede a latência de check_rate_limit com vários clientes."""
+    rule = RateLimitRule(requests_per_minute=total * 2)
+    latencies = []
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(f"bench-client-{i % 1000}")
+
+    async def worker():
+        while not queue.empty():
+            client_id = queue.get_nowait()
+            started = time.perf_counter()
+            await limiter.check_rate_limit(client_id, rule)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"⏱️  {total} verificações em {elapsed:.2f}s ({total / elapsed:,.0f}/s)")
+    print(
+        f"   p50={percentile(latencies, 0.50) * 1000:.3f}ms "
+        f"p95={percentile(latencies, 0.95) * 1000:.3f}ms "
+        f"p99={percentile(latencies, 0.99) * 1000:.3f}ms"
+    )
+
+
+async def benchmark_memory(total: int, clients: int):
+    """Mede o GCRA em memória: latência por verificação e bytes por cliente."""
+    limiter = GCRARateLimiter(RateLimitRule(requests_per_minute=300))
+    client_ids = [f"bench-client-{i}" for i in range(clients)]
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for client_id in client_ids:
+        await limiter.check_rate_limit(client_id)
+    per_client = (tracemalloc.get_traced_memory()[0] - baseline) / clients
+    tracemalloc.stop()
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(total):
+        t0 = time.perf_counter()
+        await limiter.check_rate_limit(client_ids[i % clients])
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"🧠 {clients} clientes, ~{per_client:.0f} bytes/cliente (inclui a chave)")
+    print(f"⏱️  {total} verificações em {elapsed:.2f}s ({total / elapsed:,.0f}/s)")
+    print(
+        f"   p50={percentile(latencies, 0.50) * 1e6:.1f}µs "
+        f"p95={percentile(latencies, 0.95) * 1e6:.1f}µs "
+        f"p99={percentile(latencies, 0.99) * 1e6:.1f}µs"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=["redis", "memory"], default="redis")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=100000)
+    args = parser.parse_args()
+
+    if args.backend == "memory":
+        await benchmark_memory(args.requests, args.clients)
+        return
+
+    limiter = RedisRateLimiter(RateLimitRule(), args.redis_url)
+    await limiter.connect()
+    try:
+        ok = await check_atomicity(limiter, args.concurrency)
+        await measure_latency(limiter, args.requests, args.concurrency)
+    finally:
+        await limiter.redis_client.aclose()
+
+    if not ok:
+        print("❌ Limite excedido sob concorrência")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,6 +3,7 @@
 import json
 import logging
 import os
+import time
 from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable
 from contextlib import suppress
 from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
@@ -23,6 +24,7 @@ from ..types import (
     SDKHookCallbackRequest,
     ToolPermissionContext,
 )
+from ..tracing import SPAN_KIND_CLIENT, get_tracer
 from .transport import Transport
 
 if TYPE_CHECKING:
@@ -40,8 +42,13 @@ class Query:
     - Tool permission callbacks
     - Message streaming
     - Initialization handshake
+
+    Set ``Query.control_request_observer`` to a ``(subtype, seconds)``
+    callable to record control request round-trip times.
     """
 
+    control_request_observer: Optional[Callable[[str, float], None]] = None
+
     def __init__(
         self,
         transport: Transport,
@@ -286,6 +293,11 @@ class Query:
         if not self.is_streaming_mode:
             raise Exception("Control requests require streaming mode")
 
+        with get_tracer().span(f"control.{request.get('subtype', 'unknown')}", kind=SPAN_KIND_CLIENT):
+            return await self._exchange_control_request(request)
+
+    async def _exchange_control_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Write a control request and wait for the matching response."""
         # Generate unique request ID
         self._request_counter += 1
         request_id = f"req_{self._request_counter}_{os.urandom(4).hex()}"
@@ -301,6 +313,7 @@ class Query:
             "request": request,
         }
 
+        started = time.perf_counter()
         await self.transport.write(json.dumps(control_request) + "\n")
 
         # Wait for response
@@ -308,6 +321,10 @@ class Query:
             with anyio.fail_after(60.0):
                 await event.wait()
 
+            observer = Query.control_request_observer
+            if observer is not None:
+                observer(request.get("subtype", ""), time.perf_counter() - started)
+
             result = self.pending_control_results.pop(request_id)
             self.pending_control_responses.pop(request_id, None)
 
@@ -18,6 +18,7 @@ from anyio.streams.text import TextReceiveStream, TextSendStream
 from ..._errors import CLIConnectionError, CLINotFoundError, ProcessError
 from ..._errors import CLIJSONDecodeError as SDKJSONDecodeError
 from ...types import ClaudeCodeOptions
+from ...tracing import get_tracer
 from . import Transport
 
 logger = logging.getLogger(__name__)
@@ -176,6 +177,12 @@ class SubprocessCLITransport(Transport):
             return
 
         cmd = self._build_command()
+        with get_tracer().span("cli.spawn", cli_path=str(self._cli_path)) as span:
+            await self._spawn(cmd)
+            if self._process is not None:
+                span.set_attribute("pid", self._process.pid)
+
+    async def _spawn(self, cmd: List[str]) -> None:
         try:
             # Merge environment variables: system -> user -> SDK required
             process_env = {
@@ -371,3 +378,10 @@ class SubprocessCLITransport(Transport):
     def is_ready(self) -> bool:
         """Check if transport is ready for communication."""
         return self._ready
+
+    @property
+    def pid(self) -> Optional[int]:
+        """PID of the CLI subprocess, or None when not running."""
+        if self._process is None or self._process.returncode is not None:
+            return None
+        return self._process.pid
@@ -2,8 +2,11 @@
 
 This module provides a sophisticated caching system with support for:
 - Multiple cache backends (memory, disk, Redis)
-- TTL-based expiration
+- TTL-based expiration with an optional background reaper
 - LRU eviction policy
+- Tag-based invalidation (e.g. by session, project or Flow address)
+- Transparent compression of large values (zlib, or zstd when installed)
+- Snapshot/restore of the memory cache across restarts
 - Cache statistics and monitoring
 - Async-safe operations
 - Serialization support for complex types
@@ -11,24 +14,97 @@ This module provides a sophisticated caching system with support for:
 
 import asyncio
 import hashlib
+import heapq
+import itertools
 import json
+import os
 import pickle
 import time
+import zlib
 from abc import ABC, abstractmethod
 from collections import OrderedDict
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, Optional, Union, TypeVar, Generic, Callable, Awaitable
+from typing import (
+    Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union, TypeVar, Generic, Callable, Awaitable
+)
 from contextlib import asynccontextmanager
 import logging
 
 from ._errors import ConfigurationError
 
+try:
+    import zstandard as zstd
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstd = None
+    ZSTD_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
 
+# Preferred compression codec for new entries
+DEFAULT_CODEC = "zstd" if ZSTD_AVAILABLE else "zlib"
+
+SNAPSHOT_VERSION = 1
+
+
+def _resolve_codec(codec: Optional[str]) -> str:
+    """Validate a codec name, falling back to the best available one."""
+    codec = codec or DEFAULT_CODEC
+    if codec == "zlib":
+        return codec
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise ConfigurationError(
+                "zstd compression requested but zstandard is not installed",
+                parameter="codec",
+                suggestion="pip install zstandard, or use codec='zlib'"
+            )
+        return codec
+    raise ConfigurationError(
+        f"Unknown compression codec: {codec}",
+        parameter="codec",
+        suggestion="Use 'zlib' or 'zstd'"
+    )
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    """Compress bytes with the given codec."""
+    if codec == "zstd":
+        return zstd.ZstdCompressor().compress(data)
+    return zlib.compress(data)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    """Decompress bytes produced by :func:`_compress`."""
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise ConfigurationError(
+                "Cache entry is zstd-compressed but zstandard is not installed",
+                parameter="codec"
+            )
+        return zstd.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _maybe_compress(
+    data: bytes, codec: str, threshold: Optional[int]
+) -> Tuple[bytes, Optional[str]]:
+    """Compress data when it is above threshold and compression actually helps.
+    
+    Returns:
+        Tuple of (payload, codec), where codec is None if left uncompressed
+    """
+    if threshold is None or len(data) < threshold:
+        return data, None
+    compressed = _compress(data, codec)
+    if len(compressed) >= len(data):
+        return data, None
+    return compressed, codec
+
 
 @dataclass
 class CacheStats:
@@ -39,6 +115,8 @@ class CacheStats:
     evictions: int = 0
     total_size_bytes: int = 0
     total_items: int = 0
+    expirations: int = 0
+    reclaimed_bytes: int = 0
     last_cleanup: Optional[datetime] = None
     
     @property
@@ -56,6 +134,8 @@ class CacheStats:
             "hit_rate": self.hit_rate,
             "total_size_bytes": self.total_size_bytes,
             "total_items": self.total_items,
+            "expirations": self.expirations,
+            "reclaimed_bytes": self.reclaimed_bytes,
             "last_cleanup": self.last_cleanup.isoformat() if self.last_cleanup else None
         }
 
@@ -71,9 +151,14 @@ class CacheEntry(Generic[T]):
     ttl_seconds: Optional[float]
     size_bytes: int
     access_count: int = 0
+    tags: FrozenSet[str] = frozenset()
+    expires_at: Optional[float] = None
+    codec: Optional[str] = None  # Set when value holds compressed pickled bytes
     
     def is_expired(self) -> bool:
         """Check if entry has expired based on TTL."""
+        if self.expires_at is not None:
+            return time.time() > self.expires_at
         if self.ttl_seconds is None:
             return False
         age = (datetime.now() - self.created_at).total_seconds()
@@ -94,8 +179,14 @@ class CacheBackend(ABC, Generic[T]):
         pass
     
     @abstractmethod
-    async def set(self, key: str, value: T, ttl: Optional[float] = None) -> None:
-        """Store value in cache."""
+    async def set(
+        self,
+        key: str,
+        value: T,
+        ttl: Optional[float] = None,
+        tags: Optional[Iterable[str]] = None
+    ) -> None:
+        """Store value in cache, optionally indexed under the given tags."""
         pass
     
     @abstractmethod
@@ -117,23 +208,105 @@ class CacheBackend(ABC, Generic[T]):
     async def get_stats(self) -> CacheStats:
         """Get cache statistics."""
         pass
+    
+    @abstractmethod
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Delete every entry carrying any of the given tags.
+        
+        Returns:
+            Number of entries removed
+        """
+        pass
+
+
+def _index_tags(index: Dict[str, Set[str]], key: str, tags: Iterable[str]) -> None:
+    """Register key under each tag in a tag-to-keys index."""
+    for tag in tags:
+        index.setdefault(tag, set()).add(key)
+
+
+def _unindex_tags(index: Dict[str, Set[str]], key: str, tags: Iterable[str]) -> None:
+    """Remove key from each tag in a tag-to-keys index, dropping empty tags."""
+    for tag in tags:
+        keys = index.get(tag)
+        if keys is None:
+            continue
+        keys.discard(key)
+        if not keys:
+            del index[tag]
 
 
 class MemoryCacheBackend(CacheBackend[T]):
-    """In-memory cache backend with LRU eviction."""
+    """In-memory cache backend with LRU eviction.
+    
+    Expiry times are kept in a min-heap, so :meth:`cleanup_expired` only
+    touches entries that have actually expired. Call :meth:`start_reaper`
+    to drain the heap periodically instead of waiting for reads.
     
-    def __init__(self, max_size: int = 100, max_memory_mb: float = 100):
+    With ``compress_threshold`` set, values whose pickled size reaches the
+    threshold are stored compressed and the compressed size counts toward
+    ``max_memory_mb``. Such values are unpickled on every read, so callers
+    get a fresh copy rather than the stored object.
+    """
+    
+    def __init__(
+        self,
+        max_size: int = 100,
+        max_memory_mb: float = 100,
+        compress_threshold: Optional[int] = None,
+        codec: Optional[str] = None
+    ):
         """Initialize memory cache.
         
         Args:
             max_size: Maximum number of entries
             max_memory_mb: Maximum memory usage in MB
+            compress_threshold: Minimum pickled size in bytes before a value
+                is compressed (None disables compression)
+            codec: Compression codec, "zlib" or "zstd" (defaults to the best
+                available)
         """
         self._cache: OrderedDict[str, CacheEntry[T]] = OrderedDict()
         self._max_size = max_size
         self._max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self._compress_threshold = compress_threshold
+        self._codec = _resolve_codec(codec)
         self._stats = CacheStats()
+        self._tag_index: Dict[str, Set[str]] = {}
         self._lock = asyncio.Lock()
+        
+        # Min-heap of (expires_at, seq, key); stale records are skipped lazily
+        self._expiry_heap: List[Tuple[float, int, str]] = []
+        self._expiry_seq = itertools.count()
+        self._reaper_task: Optional[asyncio.Task] = None
+    
+    def _expire_entry(self, key: str) -> None:
+        """Remove an expired entry and account for it. Caller must hold the lock."""
+        entry = self._remove_entry(key)
+        if entry is not None:
+            self._stats.evictions += 1
+            self._stats.expirations += 1
+            self._stats.reclaimed_bytes += entry.size_bytes
+    
+    def _compact_expiry_heap(self) -> None:
+        """Rebuild the heap from live entries once stale records dominate it."""
+        self._expiry_heap = [
+            (entry.expires_at, next(self._expiry_seq), key)
+            for key, entry in self._cache.items()
+            if entry.expires_at is not None
+        ]
+        heapq.heapify(self._expiry_heap)
+    
+    def _remove_entry(self, key: str) -> Optional[CacheEntry[T]]:
+        """Remove an entry and its tag references. Caller must hold the lock."""
+        entry = self._cache.pop(key, None)
+        if entry is None:
+            return None
+        self._stats.total_size_bytes -= entry.size_bytes
+        self._stats.total_items -= 1
+        if entry.tags:
+            _unindex_tags(self._tag_index, key, entry.tags)
+        return entry
     
     async def get(self, key: str) -> Optional[T]:
         """Retrieve value from cache."""
@@ -145,9 +318,8 @@ class MemoryCacheBackend(CacheBackend[T]):
                 return None
             
             if entry.is_expired():
-                del self._cache[key]
+                self._expire_entry(key)
                 self._stats.misses += 1
-                self._stats.evictions += 1
                 return None
             
             # Move to end (most recently used)
@@ -155,60 +327,116 @@ class MemoryCacheBackend(CacheBackend[T]):
             entry.touch()
             self._stats.hits += 1
             
+            if entry.codec:
+                return pickle.loads(_decompress(entry.value, entry.codec))
             return entry.value
     
-    async def set(self, key: str, value: T, ttl: Optional[float] = None) -> None:
+    def _encode(self, value: T) -> Tuple[Any, Optional[str], int]:
+        """Compute the stored form, codec and accounted size for a value."""
+        try:
+            data = pickle.dumps(value)
+        except Exception:
+            return value, None, 1024  # Default size for non-picklable objects
+        
+        payload, codec = _maybe_compress(data, self._codec, self._compress_threshold)
+        if codec is None:
+            return value, None, len(data)
+        return payload, codec, len(payload)
+    
+    async def set(
+        self,
+        key: str,
+        value: T,
+        ttl: Optional[float] = None,
+        tags: Optional[Iterable[str]] = None
+    ) -> None:
         """Store value in cache."""
         async with self._lock:
-            # Calculate size (approximate)
-            try:
-                size_bytes = len(pickle.dumps(value))
-            except:
-                size_bytes = 1024  # Default size for non-picklable objects
-            
-            # Check if we need to evict entries
-            while (len(self._cache) >= self._max_size or 
-                   self._stats.total_size_bytes + size_bytes > self._max_memory_bytes):
-                if not self._cache:
-                    break
-                # Evict least recently used
-                oldest_key = next(iter(self._cache))
-                oldest_entry = self._cache.pop(oldest_key)
-                self._stats.evictions += 1
-                self._stats.total_size_bytes -= oldest_entry.size_bytes
-                self._stats.total_items -= 1
-            
-            # Add new entry
-            entry = CacheEntry(
-                key=key,
-                value=value,
-                created_at=datetime.now(),
-                accessed_at=datetime.now(),
-                ttl_seconds=ttl,
-                size_bytes=size_bytes
+            stored, codec, size_bytes = self._encode(value)
+            expires_at = time.time() + ttl if ttl is not None else None
+            self._insert_entry(
+                key, stored, codec, size_bytes, ttl, expires_at, tags, datetime.now()
             )
-            
-            self._cache[key] = entry
-            self._stats.total_size_bytes += size_bytes
-            self._stats.total_items += 1
+    
+    def _insert_entry(
+        self,
+        key: str,
+        stored: Any,
+        codec: Optional[str],
+        size_bytes: int,
+        ttl: Optional[float],
+        expires_at: Optional[float],
+        tags: Optional[Iterable[str]],
+        created_at: datetime
+    ) -> None:
+        """Insert an already-encoded entry, evicting as needed. Caller must hold the lock."""
+        # Replacing a key must release its old size and tags first
+        self._remove_entry(key)
+        
+        # Check if we need to evict entries
+        while (len(self._cache) >= self._max_size or 
+               self._stats.total_size_bytes + size_bytes > self._max_memory_bytes):
+            if not self._cache:
+                break
+            # Evict least recently used
+            oldest_key = next(iter(self._cache))
+            self._remove_entry(oldest_key)
+            self._stats.evictions += 1
+        
+        # Add new entry
+        entry_tags = frozenset(tags) if tags else frozenset()
+        entry = CacheEntry(
+            key=key,
+            value=stored,
+            created_at=created_at,
+            accessed_at=datetime.now(),
+            ttl_seconds=ttl,
+            size_bytes=size_bytes,
+            tags=entry_tags,
+            expires_at=expires_at,
+            codec=codec
+        )
+        
+        self._cache[key] = entry
+        self._stats.total_size_bytes += size_bytes
+        self._stats.total_items += 1
+        if entry_tags:
+            _index_tags(self._tag_index, key, entry_tags)
+        
+        if expires_at is not None:
+            heapq.heappush(self._expiry_heap, (expires_at, next(self._expiry_seq), key))
+            if len(self._expiry_heap) > 2 * len(self._cache) + 64:
+                self._compact_expiry_heap()
     
     async def delete(self, key: str) -> bool:
         """Delete value from cache."""
         async with self._lock:
-            entry = self._cache.pop(key, None)
-            if entry:
-                self._stats.total_size_bytes -= entry.size_bytes
-                self._stats.total_items -= 1
-                return True
-            return False
+            return self._remove_entry(key) is not None
     
     async def clear(self) -> None:
         """Clear all cache entries."""
         async with self._lock:
             self._cache.clear()
+            self._tag_index.clear()
+            self._expiry_heap.clear()
             self._stats.total_size_bytes = 0
             self._stats.total_items = 0
     
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Delete every entry carrying any of the given tags.
+        
+        Cost is proportional to the number of affected entries, not the
+        size of the cache.
+        """
+        async with self._lock:
+            keys: Set[str] = set()
+            for tag in tags:
+                keys.update(self._tag_index.get(tag, ()))
+            
+            for key in keys:
+                self._remove_entry(key)
+            return len(keys)
+    
     async def exists(self, key: str) -> bool:
         """Check if key exists in cache."""
         async with self._lock:
@@ -221,40 +449,203 @@ class MemoryCacheBackend(CacheBackend[T]):
         """Get cache statistics."""
         return self._stats
     
-    async def cleanup_expired(self) -> int:
-        """Remove expired entries from cache."""
+    async def cleanup_expired(self, max_items: Optional[int] = None) -> int:
+        """Remove expired entries from cache.
+        
+        Args:
+            max_items: Upper bound on entries removed in this call, so a
+                large backlog can be drained in batches without holding
+                the lock for long
+                
+        Returns:
+            Number of entries removed
+        """
         async with self._lock:
-            expired_keys = []
+            now = time.time()
+            heap = self._expiry_heap
+            removed = 0
+            while heap and heap[0][0] <= now:
+                if max_items is not None and removed >= max_items:
+                    break
+                expires_at, _, key = heapq.heappop(heap)
+                entry = self._cache.get(key)
+                # Skip records for keys that were deleted or re-set since
+                if entry is None or entry.expires_at != expires_at:
+                    continue
+                self._expire_entry(key)
+                removed += 1
+            
+            self._stats.last_cleanup = datetime.now()
+            return removed
+    
+    def start_reaper(self, interval: float = 1.0, batch_size: int = 500) -> None:
+        """Start a background task that periodically drains expired entries.
+        
+        Args:
+            interval: Seconds between sweeps
+            batch_size: Maximum entries removed per lock acquisition
+        """
+        if self._reaper_task is None or self._reaper_task.done():
+            self._reaper_task = asyncio.create_task(
+                self._reaper_loop(interval, batch_size)
+            )
+    
+    async def stop_reaper(self) -> None:
+        """Stop the background reaper if it is running."""
+        if self._reaper_task:
+            self._reaper_task.cancel()
+            try:
+                await self._reaper_task
+            except asyncio.CancelledError:
+                pass
+            self._reaper_task = None
+    
+    async def _reaper_loop(self, interval: float, batch_size: int) -> None:
+        """Sweep expired entries in bounded batches until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                while await self.cleanup_expired(max_items=batch_size) >= batch_size:
+                    # Yield between batches so readers are not starved
+                    await asyncio.sleep(0)
+            except Exception as e:
+                logger.error(f"Cache reaper error: {e}")
+    
+    async def snapshot(self, path: Union[str, Path]) -> int:
+        """Write live entries to disk so a restarted worker can warm up.
+        
+        Entries are written in LRU order with their remaining TTL and tags.
+        Values that cannot be pickled are skipped. The file is replaced
+        atomically.
+        
+        Args:
+            path: Snapshot file path
+            
+        Returns:
+            Number of entries written
+        """
+        async with self._lock:
+            records = []
             for key, entry in self._cache.items():
                 if entry.is_expired():
-                    expired_keys.append(key)
-            
-            for key in expired_keys:
-                entry = self._cache.pop(key)
-                self._stats.evictions += 1
-                self._stats.total_size_bytes -= entry.size_bytes
-                self._stats.total_items -= 1
+                    continue
+                if entry.codec:
+                    payload = entry.value
+                else:
+                    try:
+                        payload = pickle.dumps(entry.value)
+                    except Exception as e:
+                        logger.warning(f"Skipping unpicklable cache entry {key}: {e}")
+                        continue
+                records.append({
+                    "key": key,
+                    "payload": payload,
+                    "codec": entry.codec,
+                    "ttl_seconds": entry.ttl_seconds,
+                    "expires_at": entry.expires_at,
+                    "tags": sorted(entry.tags),
+                    "created_at": entry.created_at.isoformat(),
+                })
+        
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({"version": SNAPSHOT_VERSION, "entries": records}, f)
+        os.replace(tmp_path, path)
+        
+        logger.info(f"Wrote cache snapshot with {len(records)} entries to {path}")
+        return len(records)
+    
+    async def restore(self, path: Union[str, Path]) -> int:
+        """Load entries written by :meth:`snapshot`.
+        
+        Expired entries are dropped, and size limits apply as for ``set``.
+        Values are re-encoded with this backend's compression settings.
+        A missing file is not an error.
+        
+        Args:
+            path: Snapshot file path
             
-            self._stats.last_cleanup = datetime.now()
-            return len(expired_keys)
+        Returns:
+            Number of entries restored
+        """
+        path = Path(path)
+        if not path.exists():
+            return 0
+        
+        try:
+            with open(path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to load cache snapshot {path}: {e}")
+            return 0
+        
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            logger.warning(f"Ignoring cache snapshot with version {snapshot.get('version')}")
+            return 0
+        
+        restored = 0
+        now = time.time()
+        async with self._lock:
+            for record in snapshot.get("entries", []):
+                expires_at = record["expires_at"]
+                if expires_at is not None and expires_at <= now:
+                    continue
+                try:
+                    data = record["payload"]
+                    if record["codec"]:
+                        data = _decompress(data, record["codec"])
+                    stored, codec, size_bytes = self._encode(pickle.loads(data))
+                except Exception as e:
+                    logger.warning(f"Skipping cache snapshot entry {record['key']}: {e}")
+                    continue
+                
+                self._insert_entry(
+                    record["key"],
+                    stored,
+                    codec,
+                    size_bytes,
+                    record["ttl_seconds"],
+                    expires_at,
+                    record["tags"],
+                    datetime.fromisoformat(record["created_at"])
+                )
+                restored += 1
+        
+        logger.info(f"Restored {restored} cache entries from {path}")
+        return restored
 
 
 class DiskCacheBackend(CacheBackend[T]):
     """Disk-based cache backend for persistent storage."""
     
-    def __init__(self, cache_dir: Union[str, Path], max_size_mb: float = 1000):
+    def __init__(
+        self,
+        cache_dir: Union[str, Path],
+        max_size_mb: float = 1000,
+        compress_threshold: Optional[int] = None,
+        codec: Optional[str] = None
+    ):
         """Initialize disk cache.
         
         Args:
             cache_dir: Directory for cache files
             max_size_mb: Maximum disk usage in MB
+            compress_threshold: Minimum pickled size in bytes before a value
+                is compressed on disk (None disables compression)
+            codec: Compression codec, "zlib" or "zstd" (defaults to the best
+                available)
         """
         self._cache_dir = Path(cache_dir)
         self._cache_dir.mkdir(parents=True, exist_ok=True)
         self._max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self._compress_threshold = compress_threshold
+        self._codec = _resolve_codec(codec)
         self._stats = CacheStats()
         self._metadata_file = self._cache_dir / ".cache_metadata.json"
         self._metadata: Dict[str, Dict[str, Any]] = {}
+        self._tag_index: Dict[str, Set[str]] = {}
         self._lock = asyncio.Lock()
         
         # Load existing metadata
@@ -270,6 +661,10 @@ class DiskCacheBackend(CacheBackend[T]):
                 except Exception as e:
                     logger.warning(f"Failed to load cache metadata: {e}")
                     self._metadata = {}
+            
+            self._tag_index = {}
+            for key, meta in self._metadata.items():
+                _index_tags(self._tag_index, key, meta.get("tags", ()))
     
     async def _save_metadata(self) -> None:
         """Save metadata to disk."""
@@ -279,6 +674,12 @@ class DiskCacheBackend(CacheBackend[T]):
         except Exception as e:
             logger.warning(f"Failed to save cache metadata: {e}")
     
+    def _drop_metadata(self, key: str) -> None:
+        """Forget metadata and tag references for key. Caller must hold the lock."""
+        meta = self._metadata.pop(key, None)
+        if meta and meta.get("tags"):
+            _unindex_tags(self._tag_index, key, meta["tags"])
+    
     def _get_cache_file(self, key: str) -> Path:
         """Get cache file path for key."""
         # Use hash to avoid filesystem issues with special characters
@@ -302,7 +703,7 @@ class DiskCacheBackend(CacheBackend[T]):
                 if age > meta["ttl_seconds"]:
                     # Expired
                     cache_file.unlink(missing_ok=True)
-                    self._metadata.pop(key, None)
+                    self._drop_metadata(key)
                     await self._save_metadata()
                     self._stats.misses += 1
                     self._stats.evictions += 1
@@ -311,7 +712,10 @@ class DiskCacheBackend(CacheBackend[T]):
             # Load from disk
             try:
                 with open(cache_file, 'rb') as f:
-                    value = pickle.load(f)
+                    data = f.read()
+                if meta.get("codec"):
+                    data = _decompress(data, meta["codec"])
+                value = pickle.loads(data)
                 
                 # Update access metadata
                 self._metadata[key]["accessed_at"] = datetime.now().isoformat()
@@ -324,19 +728,27 @@ class DiskCacheBackend(CacheBackend[T]):
             except Exception as e:
                 logger.warning(f"Failed to load cache entry {key}: {e}")
                 cache_file.unlink(missing_ok=True)
-                self._metadata.pop(key, None)
+                self._drop_metadata(key)
                 await self._save_metadata()
                 self._stats.misses += 1
                 return None
     
-    async def set(self, key: str, value: T, ttl: Optional[float] = None) -> None:
+    async def set(
+        self,
+        key: str,
+        value: T,
+        ttl: Optional[float] = None,
+        tags: Optional[Iterable[str]] = None
+    ) -> None:
         """Store value in cache."""
         async with self._lock:
             cache_file = self._get_cache_file(key)
             
             try:
                 # Serialize value
-                data = pickle.dumps(value)
+                data, codec = _maybe_compress(
+                    pickle.dumps(value), self._codec, self._compress_threshold
+                )
                 size_bytes = len(data)
                 
                 # Check disk space
@@ -350,13 +762,18 @@ class DiskCacheBackend(CacheBackend[T]):
                     f.write(data)
                 
                 # Update metadata
+                entry_tags = sorted(set(tags)) if tags else []
+                self._drop_metadata(key)
                 self._metadata[key] = {
                     "created_at": datetime.now().isoformat(),
                     "accessed_at": datetime.now().isoformat(),
                     "ttl_seconds": ttl,
                     "size_bytes": size_bytes,
-                    "access_count": 0
+                    "access_count": 0,
+                    "tags": entry_tags,
+                    "codec": codec
                 }
+                _index_tags(self._tag_index, key, entry_tags)
                 await self._save_metadata()
                 
                 self._stats.total_items = len(self._metadata)
@@ -379,7 +796,7 @@ class DiskCacheBackend(CacheBackend[T]):
         for key, _ in sorted_entries[:to_evict]:
             cache_file = self._get_cache_file(key)
             cache_file.unlink(missing_ok=True)
-            self._metadata.pop(key, None)
+            self._drop_metadata(key)
             self._stats.evictions += 1
     
     async def delete(self, key: str) -> bool:
@@ -388,7 +805,7 @@ class DiskCacheBackend(CacheBackend[T]):
             cache_file = self._get_cache_file(key)
             if cache_file.exists():
                 cache_file.unlink()
-                self._metadata.pop(key, None)
+                self._drop_metadata(key)
                 await self._save_metadata()
                 self._stats.total_items = len(self._metadata)
                 return True
@@ -400,6 +817,7 @@ class DiskCacheBackend(CacheBackend[T]):
             for cache_file in self._cache_dir.glob("*.cache"):
                 cache_file.unlink()
             self._metadata.clear()
+            self._tag_index.clear()
             await self._save_metadata()
             self._stats.total_items = 0
     
@@ -412,6 +830,22 @@ class DiskCacheBackend(CacheBackend[T]):
         """Get cache statistics."""
         self._stats.total_items = len(self._metadata)
         return self._stats
+    
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Delete every entry carrying any of the given tags."""
+        async with self._lock:
+            keys: Set[str] = set()
+            for tag in tags:
+                keys.update(self._tag_index.get(tag, ()))
+            
+            for key in keys:
+                self._get_cache_file(key).unlink(missing_ok=True)
+                self._drop_metadata(key)
+            
+            if keys:
+                await self._save_metadata()
+            self._stats.total_items = len(self._metadata)
+            return len(keys)
 
 
 class CacheManager:
@@ -442,6 +876,12 @@ class CacheManager:
         """Create full cache key with prefix."""
         return f"{self.key_prefix}{key}" if self.key_prefix else key
     
+    def _make_tags(self, tags: Optional[Iterable[str]]) -> Optional[list]:
+        """Namespace tags with the key prefix so managers sharing a backend stay isolated."""
+        if not tags:
+            return None
+        return [self._make_key(tag) for tag in tags]
+    
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache."""
         full_key = self._make_key(key)
@@ -451,12 +891,21 @@ class CacheManager:
         self,
         key: str,
         value: Any,
-        ttl: Optional[float] = None
+        ttl: Optional[float] = None,
+        tags: Optional[Iterable[str]] = None
     ) -> None:
-        """Set value in cache."""
+        """Set value in cache.
+        
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: TTL in seconds (defaults to ``default_ttl``)
+            tags: Labels such as a session id, project id or Flow address
+                that can later be passed to :meth:`invalidate_tags`
+        """
         full_key = self._make_key(key)
         ttl = ttl if ttl is not None else self.default_ttl
-        await self.backend.set(full_key, value, ttl)
+        await self.backend.set(full_key, value, ttl, tags=self._make_tags(tags))
     
     async def delete(self, key: str) -> bool:
         """Delete value from cache."""
@@ -476,7 +925,8 @@ class CacheManager:
         self,
         key: str,
         factory: Callable[[], Awaitable[T]],
-        ttl: Optional[float] = None
+        ttl: Optional[float] = None,
+        tags: Optional[Iterable[str]] = None
     ) -> T:
         """Get value from cache or compute and store it.
         
@@ -484,6 +934,7 @@ class CacheManager:
             key: Cache key
             factory: Async function to compute value if not cached
             ttl: TTL in seconds
+            tags: Tags to attach when the value is stored
             
         Returns:
             Cached or computed value
@@ -494,7 +945,7 @@ class CacheManager:
         
         # Compute value
         value = await factory()
-        await self.set(key, value, ttl)
+        await self.set(key, value, ttl, tags=tags)
         return value
     
     @asynccontextmanager
@@ -536,27 +987,45 @@ class CacheManager:
         """Add middleware for cache operations."""
         self._middleware.append(middleware)
     
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Invalidate all entries stored with any of the given tags.
+        
+        Unlike :meth:`invalidate_pattern`, this does not scan the cache; the
+        cost is proportional to the number of affected entries.
+        
+        Args:
+            *tags: Tags passed to :meth:`set` (e.g. a session id)
+            
+        Returns:
+            Number of entries invalidated
+        """
+        full_tags = self._make_tags(tags)
+        if not full_tags:
+            return 0
+        return await self.backend.invalidate_tags(full_tags)
+    
     async def invalidate_pattern(self, pattern: str) -> int:
         """Invalidate all keys matching a pattern.
         
+        This scans every key; prefer :meth:`invalidate_tags` for grouping
+        entries by session, project or address.
+        
         Args:
             pattern: Pattern to match (supports * wildcards)
             
         Returns:
             Number of keys invalidated
         """
-        # This is a simple implementation
-        # For production, consider using Redis with SCAN
         count = 0
         if isinstance(self.backend, MemoryCacheBackend):
             async with self.backend._lock:
-                keys_to_delete = []
-                for key in self.backend._cache.keys():
-                    if self._match_pattern(key, pattern):
-                        keys_to_delete.append(key)
-                
-                for key in keys_to_delete:
-                    await self.backend.delete(key)
+                keys_to_delete = [
+                    key for key in self.backend._cache.keys()
+                    if self._match_pattern(key, pattern)
+                ]
+            
+            for key in keys_to_delete:
+                if await self.backend.delete(key):
                     count += 1
         
         return count
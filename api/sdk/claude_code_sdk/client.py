@@ -7,6 +7,7 @@ from dataclasses import replace
 from typing import Any, Optional, Dict, Union, List
 
 from ._errors import CLIConnectionError
+from .tracing import SPAN_KIND_CLIENT, get_tracer
 from .types import ClaudeCodeOptions, HookEvent, HookMatcher, Message, ResultMessage
 
 
@@ -211,33 +212,34 @@ class ClaudeSDKClient:
         else:
             options = self.options
 
-        self._transport = SubprocessCLITransport(
-            prompt=actual_prompt,
-            options=options,
-        )
-        await self._transport.connect()
-
-        # Extract SDK MCP servers from options
-        sdk_mcp_servers = {}
-        if self.options.mcp_servers and isinstance(self.options.mcp_servers, dict):
-            for name, config in self.options.mcp_servers.items():
-                if isinstance(config, dict) and config.get("type") == "sdk":
-                    sdk_mcp_servers[name] = config["instance"]  # type: ignore[typeddict-item]
-
-        # Create Query to handle control protocol
-        self._query = Query(
-            transport=self._transport,
-            is_streaming_mode=True,  # ClaudeSDKClient always uses streaming mode
-            can_use_tool=self.options.can_use_tool,
-            hooks=self._convert_hooks_to_internal_format(self.options.hooks)
-            if self.options.hooks
-            else None,
-            sdk_mcp_servers=sdk_mcp_servers,
-        )
-
-        # Start reading messages and initialize
-        await self._query.start()
-        await self._query.initialize()
+        with get_tracer().span("sdk.connect", kind=SPAN_KIND_CLIENT):
+            self._transport = SubprocessCLITransport(
+                prompt=actual_prompt,
+                options=options,
+            )
+            await self._transport.connect()
+
+            # Extract SDK MCP servers from options
+            sdk_mcp_servers = {}
+            if self.options.mcp_servers and isinstance(self.options.mcp_servers, dict):
+                for name, config in self.options.mcp_servers.items():
+                    if isinstance(config, dict) and config.get("type") == "sdk":
+                        sdk_mcp_servers[name] = config["instance"]  # type: ignore[typeddict-item]
+
+            # Create Query to handle control protocol
+            self._query = Query(
+                transport=self._transport,
+                is_streaming_mode=True,  # ClaudeSDKClient always uses streaming mode
+                can_use_tool=self.options.can_use_tool,
+                hooks=self._convert_hooks_to_internal_format(self.options.hooks)
+                if self.options.hooks
+                else None,
+                sdk_mcp_servers=sdk_mcp_servers,
+            )
+
+            # Start reading messages and initialize
+            await self._query.start()
+            await self._query.initialize()
 
         # If we have an initial prompt stream, start streaming it
         if prompt is not None and isinstance(prompt, AsyncIterable) and self._query._tg:
@@ -345,6 +347,14 @@ class ClaudeSDKClient:
             raise CLIConnectionError("Not connected. Call connect() first.")
         await self._query.interrupt()
 
+    @property
+    def pid(self) -> Optional[int]:
+        """PID of the Claude Code CLI subprocess, or None when not connected.
+
+        Useful for resource accounting of long-lived clients (RSS, CPU, fds).
+        """
+        return getattr(self._transport, "pid", None)
+
     async def get_server_info(self) -> Optional[Dict[str, Any]]:
         """Get server initialization info including available commands and output styles.
 
@@ -7,12 +7,21 @@ This module provides structured logging with:
 - Sensitive data masking
 - Log aggregation support
 - Async-safe operations
+- Optional background pipeline (redaction, formatting and batched writes
+  off the calling thread)
+- Per-event sampling, rate limiting and every-Nth logging
+- Per-operation latency percentiles over a sliding window
 """
 
 import asyncio
+import atexit
+import functools
 import json
 import logging
+import queue
+import random
 import sys
+import threading
 import time
 import traceback
 from collections import defaultdict
@@ -24,11 +33,20 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional, Union, Callable, TypeVar, Set
 from uuid import uuid4
 import re
-import inspect
+
+from .quantiles import WindowedQuantileSketch
 
 T = TypeVar('T')
 
 
+def _record_time(record: Dict[str, Any]) -> datetime:
+    """Return the capture time of a record (set on the calling thread)."""
+    created = record.pop("_created", None)
+    if created is None:
+        return datetime.utcnow()
+    return datetime.utcfromtimestamp(created)
+
+
 class LogLevel(Enum):
     """Log levels with numeric values."""
     DEBUG = 10
@@ -96,11 +114,11 @@ class JSONFormatter(LogFormatter):
     def format(self, record: Dict[str, Any]) -> str:
         """Format log record as JSON."""
         # Add timestamp
-        record["timestamp"] = datetime.utcnow().isoformat() + "Z"
+        record["timestamp"] = _record_time(record).isoformat() + "Z"
         
-        # Add stack trace for errors
+        # Add stack trace for errors (already captured when queued)
         if self.include_stacktrace and record.get("level") in ["ERROR", "CRITICAL"]:
-            if "exception" not in record:
+            if "exception" not in record and "stacktrace" not in record:
                 record["stacktrace"] = traceback.format_stack()
         
         if self.pretty:
@@ -116,7 +134,7 @@ class PlainTextFormatter(LogFormatter):
     
     def format(self, record: Dict[str, Any]) -> str:
         """Format log record as plain text."""
-        record["timestamp"] = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        record["timestamp"] = _record_time(record).strftime("%Y-%m-%d %H:%M:%S")
         
         # Handle nested context
         if "context" in record and isinstance(record["context"], dict):
@@ -156,7 +174,15 @@ class ColoredFormatter(PlainTextFormatter):
 
 
 class SensitiveDataFilter:
-    """Filter for masking sensitive data in logs."""
+    """Filter for masking sensitive data in logs.
+    
+    Patterns are compiled into a single alternation, so each string is
+    scanned once and the replacement is chosen from the group that matched.
+    When every pattern has known trigger substrings (``PATTERN_TRIGGERS``),
+    strings containing none of them skip the alternation entirely. Values under known-safe keys and
+    non-string values are passed through untouched, and results for short
+    strings are memoized since log messages are mostly repeated constants.
+    """
     
     DEFAULT_PATTERNS = [
         (r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '[EMAIL]'),  # Email
@@ -165,48 +191,382 @@ class SensitiveDataFilter:
         (r'(?i)(api[_-]?key|password|secret|token)["\']?\s*[:=]\s*["\']?[^"\'\s]+', '[REDACTED]'),  # API keys
     ]
     
-    def __init__(self, patterns: Optional[List[tuple]] = None):
+    # Substrings of which at least one occurs in every match of the pattern
+    _DIGITS = tuple("0123456789")
+    PATTERN_TRIGGERS = {
+        DEFAULT_PATTERNS[0][0]: ("@",),
+        DEFAULT_PATTERNS[1][0]: _DIGITS,
+        DEFAULT_PATTERNS[2][0]: ("-",),
+        DEFAULT_PATTERNS[3][0]: ("=", ":"),
+    }
+    
+    SENSITIVE_KEYS = ('password', 'secret', 'token', 'api_key', 'apikey', 'auth')
+    
+    # Fields written by the logger itself
+    SAFE_KEYS = frozenset({
+        'level', 'logger', 'timestamp', '_created', 'source', 'stacktrace',
+        'event', 'sampling', 'duration_ms'
+    })
+    
+    _GLOBAL_FLAGS = re.compile(r'^\(\?([aiLmsux]+)\)')
+    
+    def __init__(
+        self,
+        patterns: Optional[List[tuple]] = None,
+        safe_keys: Optional[Set[str]] = None,
+        cache_size: int = 1024,
+        cacheable_length: int = 256
+    ):
         """Initialize filter with patterns.
         
         Args:
             patterns: List of (regex, replacement) tuples
+            safe_keys: Keys whose values are never filtered
+            cache_size: Number of filtered strings to memoize
+            cacheable_length: Longest string that is memoized
         """
         self.patterns = patterns or self.DEFAULT_PATTERNS
+        self.safe_keys = frozenset(safe_keys) if safe_keys is not None else self.SAFE_KEYS
+        self.cacheable_length = cacheable_length
         self.compiled_patterns = [
             (re.compile(pattern), replacement)
             for pattern, replacement in self.patterns
         ]
+        self._replacements = [replacement for _, replacement in self.patterns]
+        self._combined = self._combine(self.patterns)
+        triggers = [self.PATTERN_TRIGGERS.get(pattern) for pattern, _ in self.patterns]
+        self._trigger = None
+        if all(triggers):
+            self._trigger = re.compile("|".join(
+                re.escape(trigger) for group in triggers for trigger in group
+            ))
+        self._key_verdicts: Dict[str, bool] = {}
+        self._cached_filter = functools.lru_cache(maxsize=cache_size)(self._filter)
     
-    def filter(self, text: str) -> str:
-        """Filter sensitive data from text."""
+    @classmethod
+    def _combine(cls, patterns: List[tuple]) -> Optional[re.Pattern]:
+        """Build one alternation with a named group per pattern.
+        
+        Returns None when the patterns cannot be combined safely
+        (backreferences, non-literal replacements), in which case each
+        pattern is applied in turn.
+        """
+        branches = []
+        for index, (pattern, replacement) in enumerate(patterns):
+            if not isinstance(replacement, str) or '\\' in replacement:
+                return None
+            if re.search(r'\\[1-9]|\(\?P=', pattern):
+                return None
+            # Leading global flags become scoped flags inside the branch
+            flags = cls._GLOBAL_FLAGS.match(pattern)
+            if flags:
+                pattern = f"(?{flags.group(1)}:{pattern[flags.end():]})"
+            branches.append(f"(?P<_p{index}>{pattern})")
+        try:
+            return re.compile("|".join(branches))
+        except re.error:
+            return None
+    
+    def _dispatch(self, match: "re.Match") -> str:
+        # The branch group closes last, so lastgroup names it
+        return self._replacements[int(match.lastgroup[2:])]
+    
+    def _filter(self, text: str) -> str:
+        if self._trigger is not None and not self._trigger.search(text):
+            return text
+        if self._combined is not None:
+            return self._combined.sub(self._dispatch, text)
         for pattern, replacement in self.compiled_patterns:
             text = pattern.sub(replacement, text)
         return text
     
+    def filter(self, text: str) -> str:
+        """Filter sensitive data from text."""
+        if len(text) <= self.cacheable_length:
+            return self._cached_filter(text)
+        return self._filter(text)
+    
+    def _is_sensitive_key(self, key: str) -> bool:
+        verdict = self._key_verdicts.get(key)
+        if verdict is None:
+            lowered = key.lower()
+            verdict = any(sensitive in lowered for sensitive in self.SENSITIVE_KEYS)
+            if len(self._key_verdicts) < 4096:
+                self._key_verdicts[key] = verdict
+        return verdict
+    
+    def _filter_value(self, value: Any) -> Any:
+        if isinstance(value, str):
+            return self.filter(value)
+        if isinstance(value, dict):
+            return self.filter_dict(value)
+        if isinstance(value, list):
+            return [self._filter_value(item) for item in value]
+        return value
+    
     def filter_dict(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Filter sensitive data from dictionary."""
         filtered = {}
-        sensitive_keys = {'password', 'secret', 'token', 'api_key', 'apikey', 'auth'}
+        safe_keys = self.safe_keys
         
         for key, value in data.items():
-            # Check if key contains sensitive words
-            if any(sensitive in key.lower() for sensitive in sensitive_keys):
+            if key in safe_keys:
+                filtered[key] = value
+            elif self._is_sensitive_key(key):
                 filtered[key] = '[REDACTED]'
             elif isinstance(value, str):
                 filtered[key] = self.filter(value)
-            elif isinstance(value, dict):
-                filtered[key] = self.filter_dict(value)
-            elif isinstance(value, list):
-                filtered[key] = [
-                    self.filter(item) if isinstance(item, str) else item
-                    for item in value
-                ]
+            elif isinstance(value, (dict, list)):
+                filtered[key] = self._filter_value(value)
             else:
                 filtered[key] = value
         
         return filtered
 
 
+class EventPolicy:
+    """Emission policy for a named log event.
+    
+    A record is emitted only if it passes every configured check:
+    every Nth occurrence, random sampling and a token bucket. Emitted
+    records report how many occurrences were suppressed since the
+    previous emission.
+    """
+    
+    def __init__(
+        self,
+        sample_rate: float = 1.0,
+        rate_per_second: Optional[float] = None,
+        burst: Optional[int] = None,
+        every_n: Optional[int] = None
+    ):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        if every_n is not None and every_n < 1:
+            raise ValueError("every_n must be >= 1")
+        self.sample_rate = sample_rate
+        self.rate_per_second = rate_per_second
+        self.burst = burst if burst is not None else max(1, int(rate_per_second or 1))
+        self.every_n = every_n
+        self.occurrences = 0
+        self.suppressed_total = 0
+        self._suppressed = 0
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def admit(self) -> Optional[Dict[str, int]]:
+        """Return sampling counters if the record should be emitted, else None."""
+        with self._lock:
+            self.occurrences += 1
+            if self._allowed():
+                counters = {"occurrences": self.occurrences, "suppressed": self._suppressed}
+                self._suppressed = 0
+                return counters
+            self._suppressed += 1
+            self.suppressed_total += 1
+            return None
+    
+    def _allowed(self) -> bool:
+        if self.every_n is not None and (self.occurrences - 1) % self.every_n:
+            return False
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if self.rate_per_second is not None:
+            now = time.monotonic()
+            self._tokens = min(
+                float(self.burst),
+                self._tokens + (now - self._last_refill) * self.rate_per_second
+            )
+            self._last_refill = now
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+        return True
+
+
+def _snapshot(value: Any, depth: int = 8) -> Any:
+    """Copy nested dicts, lists, tuples and sets; other values are shared."""
+    if depth <= 0:
+        return value
+    kind = type(value)
+    if kind is dict:
+        return {k: _snapshot(v, depth - 1) for k, v in list(value.items())}
+    if kind is list or kind is tuple:
+        return kind(_snapshot(v, depth - 1) for v in list(value))
+    if kind is set:
+        return set(value)
+    return value
+
+
+class BackgroundLogWriter:
+    """Queue consumer that renders and writes log records on a worker thread.
+    
+    The calling thread only enqueues the raw record. The worker drains the
+    queue in batches, renders each record (redaction and formatting), writes
+    the batch with a single ``write`` call and flushes at most once per
+    ``flush_interval``. When the queue is full new records are dropped and
+    counted instead of blocking the caller.
+    
+    Loggers writing to the same stream share one writer (see ``for_output``)
+    so there is a single worker thread and ordered output per stream.
+    """
+    
+    _STOP = object()
+    _shared: Dict[int, "BackgroundLogWriter"] = {}
+    _shared_lock = threading.Lock()
+    
+    def __init__(
+        self,
+        render: Optional[Callable[[Dict[str, Any]], str]],
+        output: Any,
+        flush_interval: float = 0.5,
+        batch_size: int = 256,
+        max_queue_size: int = 10000
+    ):
+        self.render = render
+        self.output = output
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._users = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(
+            target=self._run, name="claude-sdk-log-writer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+    
+    @classmethod
+    def for_output(
+        cls,
+        output: Any,
+        flush_interval: float = 0.5,
+        max_queue_size: int = 10000
+    ) -> "BackgroundLogWriter":
+        """Return the shared writer for ``output``, starting it if needed.
+        
+        Each call must be paired with ``release``. Settings only apply when
+        the writer is created.
+        """
+        with cls._shared_lock:
+            writer = cls._shared.get(id(output))
+            if writer is None or not writer._thread.is_alive():
+                writer = cls(None, output, flush_interval=flush_interval, max_queue_size=max_queue_size)
+                cls._shared[id(output)] = writer
+            writer._users += 1
+            return writer
+    
+    def release(self) -> None:
+        """Drop one user of a shared writer; the last one closes it."""
+        with self._shared_lock:
+            self._users = max(0, self._users - 1)
+            if self._users:
+                return
+            if self._shared.get(id(self.output)) is self:
+                del self._shared[id(self.output)]
+        self.close()
+    
+    def submit(
+        self,
+        record: Dict[str, Any],
+        render: Optional[Callable[[Dict[str, Any]], str]] = None
+    ) -> None:
+        """Enqueue a record without blocking.
+        
+        Args:
+            record: Captured record
+            render: Renderer for this record (defaults to ``self.render``)
+        """
+        try:
+            self._queue.put_nowait((render or self.render, record))
+        except queue.Full:
+            self.dropped += 1
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued so far has been written."""
+        if not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+    
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Write pending records and stop the worker."""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(timeout)
+        atexit.unregister(self.close)
+    
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        pending_flush = False
+        
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if pending_flush:
+                    self._flush_output()
+                    pending_flush = False
+                last_flush = time.monotonic()
+                continue
+            
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            lines = []
+            waiters = []
+            stop = False
+            for item in batch:
+                if item is self._STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    render, record = item
+                    try:
+                        lines.append(render(record))
+                    except Exception:
+                        # A bad record must not kill the worker
+                        traceback.print_exc(file=sys.stderr)
+            
+            if lines:
+                self._write_lines(lines)
+                pending_flush = True
+            
+            now = time.monotonic()
+            if pending_flush and (waiters or stop or now - last_flush >= self.flush_interval):
+                self._flush_output()
+                pending_flush = False
+                last_flush = now
+            
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+    
+    def _write_lines(self, lines: List[str]) -> None:
+        try:
+            if hasattr(self.output, 'write'):
+                self.output.write('\n'.join(lines) + '\n')
+            else:
+                print('\n'.join(lines))
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+    
+    def _flush_output(self) -> None:
+        if hasattr(self.output, 'flush'):
+            try:
+                self.output.flush()
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+
+
 class StructuredLogger:
     """Main structured logger for Hackathon Flow Blockchain Agents."""
     
@@ -218,7 +578,12 @@ class StructuredLogger:
         output: Optional[Any] = None,
         enable_metrics: bool = True,
         enable_context: bool = True,
-        sensitive_filter: Optional[SensitiveDataFilter] = None
+        sensitive_filter: Optional[SensitiveDataFilter] = None,
+        background: bool = False,
+        capture_caller: bool = False,
+        flush_interval: float = 0.5,
+        max_queue_size: int = 10000,
+        metrics_window_seconds: float = 300.0
     ):
         """Initialize structured logger.
         
@@ -230,18 +595,41 @@ class StructuredLogger:
             enable_metrics: Whether to track metrics
             enable_context: Whether to include context
             sensitive_filter: Filter for sensitive data
+            background: Redact, format and write records on a worker thread
+            capture_caller: Include the caller's file/line/function
+            flush_interval: Max seconds between output flushes in background mode
+            max_queue_size: Records buffered before new ones are dropped
+            metrics_window_seconds: Window for per-operation timer percentiles
         """
         self.name = name
         self.level = level
         self.formatter = formatter or JSONFormatter()
         self.output = output or sys.stdout
         self.enable_metrics = enable_metrics
+        self.metrics_window_seconds = metrics_window_seconds
         self.enable_context = enable_context
         self.sensitive_filter = sensitive_filter or SensitiveDataFilter()
+        self.capture_caller = capture_caller
+        
+        # Background pipeline (None = write on the calling thread)
+        self._writer: Optional[BackgroundLogWriter] = None
+        if background:
+            self._writer = BackgroundLogWriter.for_output(
+                self.output,
+                flush_interval=flush_interval,
+                max_queue_size=max_queue_size
+            )
+        
+        # Per-event emission policies
+        self._event_policies: Dict[str, EventPolicy] = {}
         
         # Thread-local storage for context
         self._context_stack: List[LogContext] = []
-        self._metrics: Dict[str, LogMetrics] = {}
+        
+        # Timer durations per operation (fixed memory, sliding window)
+        self._active_timers = 0
+        self._operations: Dict[str, WindowedQuantileSketch] = {}
+        self._operation_errors = defaultdict(int)
         
         # Performance tracking
         self._log_count = defaultdict(int)
@@ -256,40 +644,77 @@ class StructuredLogger:
         """Check if message should be logged."""
         return level.value >= self.level.value
     
-    def _prepare_record(
+    def _capture_record(
         self,
         level: LogLevel,
         message: str,
-        **kwargs
+        kwargs: Dict[str, Any]
     ) -> Dict[str, Any]:
-        """Prepare log record."""
+        """Capture what must be read on the calling thread (cheap)."""
+        if self._writer is not None:
+            # Rendered later on the worker: copy containers the caller may mutate
+            kwargs = _snapshot(kwargs)
         record = {
             "level": level.name,
             "message": message,
             "logger": self.name,
+            "_created": time.time(),
             **kwargs
         }
         
-        # Add context if enabled
         if self.enable_context and self.current_context:
             record["context"] = self.current_context.to_dict()
         
-        # Add caller information
-        frame = inspect.currentframe()
-        if frame and frame.f_back and frame.f_back.f_back:
-            caller = frame.f_back.f_back
-            record["source"] = {
-                "file": caller.f_code.co_filename,
-                "line": caller.f_lineno,
-                "function": caller.f_code.co_name
-            }
+        # The worker thread cannot see the caller's stack
+        needs_stack = (
+            self._writer is not None
+            and level.value >= LogLevel.ERROR.value
+            and "exception" not in record
+            and getattr(self.formatter, "include_stacktrace", False)
+        )
+        
+        # Add caller information (opt-in: frame inspection is not free)
+        if self.capture_caller or needs_stack:
+            caller = sys._getframe(1)
+            while caller is not None and caller.f_code.co_filename == __file__:
+                caller = caller.f_back
+            if caller is not None and self.capture_caller:
+                record["source"] = {
+                    "file": caller.f_code.co_filename,
+                    "line": caller.f_lineno,
+                    "function": caller.f_code.co_name
+                }
+            if needs_stack:
+                record["stacktrace"] = traceback.format_stack(caller)
         
+        return record
+    
+    def _prepare_record(
+        self,
+        level: LogLevel,
+        message: str,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Prepare log record."""
+        return self._finalize_record(self._capture_record(level, message, kwargs))
+    
+    def _finalize_record(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Filter sensitive data."""
         # Filter sensitive data
         if self.sensitive_filter:
             record = self.sensitive_filter.filter_dict(record)
         
         return record
     
+    def _render(self, record: Dict[str, Any]) -> str:
+        """Finalize and format a captured record."""
+        record = self._finalize_record(record)
+        formatted = self.formatter.format(record)
+        
+        # Track log count
+        self._log_count[record["level"]] += 1
+        return formatted
+    
     def _write(self, record: Dict[str, Any]) -> None:
         """Write log record to output."""
         formatted = self.formatter.format(record)
@@ -304,14 +729,77 @@ class StructuredLogger:
         # Track log count
         self._log_count[record["level"]] += 1
     
-    def log(self, level: LogLevel, message: str, **kwargs) -> None:
-        """Log a message at specified level."""
+    def configure_event(
+        self,
+        event: str,
+        sample_rate: float = 1.0,
+        rate_per_second: Optional[float] = None,
+        burst: Optional[int] = None,
+        every_n: Optional[int] = None
+    ) -> EventPolicy:
+        """Configure sampling and rate limiting for an event name.
+        
+        Example:
+            >>> logger.configure_event("pool_checkout", every_n=100)
+            >>> logger.configure_event("chunk", rate_per_second=5, burst=10)
+        """
+        policy = EventPolicy(sample_rate, rate_per_second, burst, every_n)
+        self._event_policies[event] = policy
+        return policy
+    
+    def log(
+        self,
+        level: LogLevel,
+        message: str,
+        event: Optional[str] = None,
+        lazy: Optional[Callable[[], Dict[str, Any]]] = None,
+        **kwargs
+    ) -> None:
+        """Log a message at specified level.
+        
+        Args:
+            level: Log level
+            message: Log message
+            event: Event name; applies its policy (see ``configure_event``)
+            lazy: Callable returning extra fields, evaluated only if emitted
+            **kwargs: Extra record fields
+        """
         if not self._should_log(level):
             return
         
+        if event is not None:
+            kwargs["event"] = event
+            policy = self._event_policies.get(event)
+            if policy is not None:
+                counters = policy.admit()
+                if counters is None:
+                    return
+                if counters["suppressed"] or policy.every_n:
+                    kwargs["sampling"] = counters
+        
+        if lazy is not None:
+            kwargs.update(lazy())
+        
+        if self._writer is not None:
+            self._writer.submit(self._capture_record(level, message, kwargs), self._render)
+            return
+        
         record = self._prepare_record(level, message, **kwargs)
         self._write(record)
     
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until queued records are written (no-op when synchronous)."""
+        if self._writer is None:
+            return True
+        return self._writer.flush(timeout)
+    
+    def close(self) -> None:
+        """Write pending records and release the background worker."""
+        if self._writer is not None:
+            self._writer.flush(timeout=5.0)
+            self._writer.release()
+            self._writer = None
+    
     def debug(self, message: str, **kwargs) -> None:
         """Log debug message."""
         self.log(LogLevel.DEBUG, message, **kwargs)
@@ -326,6 +814,8 @@ class StructuredLogger:
     
     def error(self, message: str, exception: Optional[Exception] = None, **kwargs) -> None:
         """Log error message."""
+        if not self._should_log(LogLevel.ERROR):
+            return
         if exception:
             kwargs["exception"] = {
                 "type": type(exception).__name__,
@@ -365,6 +855,45 @@ class StructuredLogger:
         finally:
             self._context_stack.pop()
     
+    # Operations beyond this share the "_other" sketch
+    MAX_TRACKED_OPERATIONS = 256
+    
+    def _start_timer(self, operation: str, metadata: Dict[str, Any]) -> LogMetrics:
+        self._active_timers += 1
+        self.debug(f"Starting {operation}", metrics=metadata)
+        return LogMetrics(
+            operation=operation,
+            start_time=time.time(),
+            metadata=metadata
+        )
+    
+    def _finish_timer(self, metrics: LogMetrics) -> None:
+        self._active_timers -= 1
+        if not self.enable_metrics:
+            return
+        
+        operation = metrics.operation
+        sketch = self._operations.get(operation)
+        if sketch is None:
+            if len(self._operations) >= self.MAX_TRACKED_OPERATIONS:
+                operation = "_other"
+                sketch = self._operations.get(operation)
+            if sketch is None:
+                sketch = self._operations[operation] = WindowedQuantileSketch(
+                    self.metrics_window_seconds
+                )
+        if metrics.duration_ms is not None:
+            sketch.add(metrics.duration_ms)
+        if not metrics.success:
+            self._operation_errors[operation] += 1
+        
+        self.info(
+            f"Completed {metrics.operation}",
+            duration_ms=metrics.duration_ms,
+            success=metrics.success,
+            metrics=metrics.metadata
+        )
+    
     @contextmanager
     def timer(self, operation: str, **metadata):
         """Context manager for timing operations.
@@ -373,17 +902,8 @@ class StructuredLogger:
             >>> with logger.timer("api_call", endpoint="/query"):
             ...     result = await api.query()
         """
-        metrics = LogMetrics(
-            operation=operation,
-            start_time=time.time(),
-            metadata=metadata
-        )
-        
-        metric_id = str(uuid4())
-        self._metrics[metric_id] = metrics
-        
+        metrics = self._start_timer(operation, metadata)
         try:
-            self.debug(f"Starting {operation}", metrics=metadata)
             yield metrics
             metrics.complete(success=True)
             
@@ -392,29 +912,13 @@ class StructuredLogger:
             raise
         
         finally:
-            if self.enable_metrics:
-                self.info(
-                    f"Completed {operation}",
-                    duration_ms=metrics.duration_ms,
-                    success=metrics.success,
-                    metrics=metadata
-                )
-            del self._metrics[metric_id]
+            self._finish_timer(metrics)
     
     @asynccontextmanager
     async def async_timer(self, operation: str, **metadata):
         """Async context manager for timing operations."""
-        metrics = LogMetrics(
-            operation=operation,
-            start_time=time.time(),
-            metadata=metadata
-        )
-        
-        metric_id = str(uuid4())
-        self._metrics[metric_id] = metrics
-        
+        metrics = self._start_timer(operation, metadata)
         try:
-            self.debug(f"Starting {operation}", metrics=metadata)
             yield metrics
             metrics.complete(success=True)
             
@@ -423,14 +927,7 @@ class StructuredLogger:
             raise
         
         finally:
-            if self.enable_metrics:
-                self.info(
-                    f"Completed {operation}",
-                    duration_ms=metrics.duration_ms,
-                    success=metrics.success,
-                    metrics=metadata
-                )
-            del self._metrics[metric_id]
+            self._finish_timer(metrics)
     
     def get_stats(self) -> Dict[str, Any]:
         """Get logging statistics."""
@@ -440,12 +937,29 @@ class StructuredLogger:
             "uptime_seconds": uptime,
             "logs_per_second": sum(self._log_count.values()) / uptime if uptime > 0 else 0,
             "active_contexts": len(self._context_stack),
-            "active_metrics": len(self._metrics)
+            "active_metrics": self._active_timers,
+            "operations": {
+                operation: {
+                    **sketch.summary(),
+                    "errors": self._operation_errors.get(operation, 0)
+                }
+                for operation, sketch in self._operations.items()
+            },
+            "dropped_records": self._writer.dropped if self._writer else 0,
+            "events": {
+                event: {
+                    "occurrences": policy.occurrences,
+                    "suppressed": policy.suppressed_total
+                }
+                for event, policy in self._event_policies.items()
+            }
         }
     
     def reset_stats(self) -> None:
         """Reset logging statistics."""
         self._log_count.clear()
+        self._operations.clear()
+        self._operation_errors.clear()
         self._last_reset = time.time()
 
 
@@ -503,7 +1017,9 @@ class LoggerFactory:
             level=level,
             formatter=formatter,
             enable_metrics=os.environ.get("CLAUDE_SDK_LOG_METRICS", "true").lower() == "true",
-            enable_context=os.environ.get("CLAUDE_SDK_LOG_CONTEXT", "true").lower() == "true"
+            enable_context=os.environ.get("CLAUDE_SDK_LOG_CONTEXT", "true").lower() == "true",
+            background=os.environ.get("CLAUDE_SDK_LOG_BACKGROUND", "true").lower() == "true",
+            capture_caller=os.environ.get("CLAUDE_SDK_LOG_CALLER", "false").lower() == "true"
         )
 
 
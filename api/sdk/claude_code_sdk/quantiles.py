@@ -0,0 +1,223 @@
+"""Fixed-memory streaming quantile sketches.
+
+This module provides:
+- QuantileSketch: log-bucketed histogram (DDSketch-style) with a bounded
+  relative error on every quantile and a hard cap on bucket count
+- WindowedQuantileSketch: a ring of sketches covering a sliding time window,
+  so old samples decay out instead of accumulating forever
+
+Recording a value is O(1) and memory does not grow with the number of
+samples, which makes these suitable for long-running workers.
+"""
+
+import math
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def _quantile_label(q: float) -> str:
+    """0.5 -> "p50", 0.99 -> "p99", 0.999 -> "p999"."""
+    return "p" + f"{q * 100:g}".replace(".", "")
+
+
+class QuantileSketch:
+    """Streaming quantile estimator with bounded relative error.
+
+    Positive values are mapped to logarithmic buckets whose width is set by
+    ``relative_accuracy``; any reported quantile is within that relative
+    error of the true sample. Values at or below ``min_value`` share a
+    single zero bucket. When more than ``max_buckets`` buckets are in use,
+    the lowest ones are merged, which keeps memory fixed while preserving
+    accuracy for the high percentiles.
+
+    Example:
+        >>> sketch = QuantileSketch()
+        >>> for latency in latencies:
+        ...     sketch.add(latency)
+        >>> sketch.quantile(0.99)
+    """
+
+    def __init__(
+        self,
+        relative_accuracy: float = 0.01,
+        min_value: float = 1e-9,
+        max_buckets: int = 2048
+    ):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_buckets = max_buckets
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.clear()
+
+    def clear(self) -> None:
+        """Drop all samples."""
+        self._bins: Dict[int, int] = {}
+        self._zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, count: int = 1) -> None:
+        """Record a value (``count`` times)."""
+        self.count += count
+        self.sum += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+        if value <= self.min_value:
+            self._zero_count += count
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        bins = self._bins
+        bins[key] = bins.get(key, 0) + count
+        if len(bins) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self) -> None:
+        """Merge the lowest buckets until the cap is respected."""
+        keys = sorted(self._bins)
+        excess = len(keys) - self.max_buckets
+        target = keys[excess]
+        for key in keys[:excess]:
+            self._bins[target] += self._bins.pop(key)
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Add another sketch's samples (same relative accuracy required)."""
+        if other._gamma != self._gamma:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        if not other.count:
+            return
+        for key, count in other._bins.items():
+            self._bins[key] = self._bins.get(key, 0) + count
+        self._zero_count += other._zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self._bins) > self.max_buckets:
+            self._collapse()
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the ``q`` quantile (0 <= q <= 1); None when empty."""
+        return self.quantiles((q,))[q]
+
+    def quantiles(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> Dict[float, Optional[float]]:
+        """Estimate several quantiles in a single pass over the buckets."""
+        if not self.count:
+            return {q: None for q in qs}
+
+        ordered = sorted(qs)
+        ranks = [q * (self.count - 1) for q in ordered]
+        results: Dict[float, Optional[float]] = {}
+        index = 0
+        seen = self._zero_count
+
+        while index < len(ordered) and ranks[index] < seen:
+            results[ordered[index]] = self.min
+            index += 1
+
+        if index < len(ordered):
+            for key in sorted(self._bins):
+                seen += self._bins[key]
+                while index < len(ordered) and ranks[index] < seen:
+                    estimate = 2 * self._gamma ** key / (self._gamma + 1)
+                    results[ordered[index]] = min(max(estimate, self.min), self.max)
+                    index += 1
+                if index == len(ordered):
+                    break
+
+        for q in ordered[index:]:
+            results[q] = self.max
+        return results
+
+    def summary(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, Optional[float]]:
+        """Count, mean, min/max and labelled percentiles (``p50``, ``p999`` ...)."""
+        summary: Dict[str, Optional[float]] = {
+            "count": self.count,
+            "mean": self.mean,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+        for q, value in self.quantiles(qs).items():
+            summary[_quantile_label(q)] = value
+        return summary
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class WindowedQuantileSketch:
+    """Quantile sketch over a sliding time window.
+
+    The window is split into ``slices`` sub-sketches; samples go into the
+    current slice and whole slices expire as time advances, so the window
+    decays in steps of ``window_seconds / slices``.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 300.0,
+        slices: int = 6,
+        relative_accuracy: float = 0.01,
+        max_buckets: int = 2048,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        if slices < 1:
+            raise ValueError("slices must be >= 1")
+        self.window_seconds = window_seconds
+        self.slice_seconds = window_seconds / slices
+        self._clock = clock
+        self._slices: List[QuantileSketch] = [
+            QuantileSketch(relative_accuracy, max_buckets=max_buckets)
+            for _ in range(slices)
+        ]
+        self._epoch = self._current_epoch()
+
+    def _current_epoch(self) -> int:
+        return int(self._clock() // self.slice_seconds)
+
+    def _advance(self) -> None:
+        """Clear slices whose time range has left the window."""
+        epoch = self._current_epoch()
+        elapsed = epoch - self._epoch
+        if elapsed <= 0:
+            return
+        for step in range(1, min(elapsed, len(self._slices)) + 1):
+            self._slices[(self._epoch + step) % len(self._slices)].clear()
+        self._epoch = epoch
+
+    def add(self, value: float, count: int = 1) -> None:
+        """Record a value in the current slice."""
+        self._advance()
+        self._slices[self._epoch % len(self._slices)].add(value, count)
+
+    def snapshot(self) -> QuantileSketch:
+        """Merge the live slices into a single sketch."""
+        self._advance()
+        first = self._slices[0]
+        merged = QuantileSketch(first.relative_accuracy, first.min_value, first.max_buckets)
+        for sketch in self._slices:
+            merged.merge(sketch)
+        return merged
+
+    def quantiles(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> Dict[float, Optional[float]]:
+        return self.snapshot().quantiles(qs)
+
+    def summary(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, Optional[float]]:
+        return self.snapshot().summary(qs)
+
+    def clear(self) -> None:
+        for sketch in self._slices:
+            sketch.clear()
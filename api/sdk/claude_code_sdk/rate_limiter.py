@@ -3,26 +3,32 @@
 This module provides sophisticated rate limiting with:
 - Token bucket algorithm
 - Sliding window rate limiting
+- Fair FIFO waiting with exact wakeups (no polling, no sleeping under a lock)
+- LLM usage budgets (input/output tokens per minute, cost per hour)
+  reserved up front and reconciled against ``ResultMessage`` usage
 - Automatic retry with exponential backoff
 - Circuit breaker pattern
 - Distributed rate limiting support
-- Priority queuing
+- Priority scheduling with aging and weighted lanes
 """
 
 import asyncio
+import itertools
+from abc import ABC, abstractmethod
 import time
 import random
-from collections import deque, defaultdict
+from collections import OrderedDict, deque, defaultdict
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import Any, Dict, List, Optional, Callable, Awaitable, TypeVar, Deque
+from typing import Any, Dict, List, Optional, Callable, Awaitable, TypeVar, Deque, Tuple
 from contextlib import asynccontextmanager
 import math
 import heapq
 
 from ._errors import RateLimitError, TimeoutError
 from .logging import get_logger
+from .types import ResultMessage
 
 logger = get_logger(__name__)
 
@@ -71,28 +77,219 @@ class RateLimitConfig:
     # Priority settings
     enable_priority: bool = False
     priority_levels: int = 3
+    priority_aging_seconds: float = 5.0  # Waiting this long gains one priority level
+    lane_weights: Dict[str, float] = field(
+        default_factory=lambda: {"interactive": 3.0, "batch": 1.0}
+    )
+    default_lane: str = "interactive"
 
 
 @dataclass
-class RequestMetadata:
-    """Metadata for a request."""
+class UsageLimitConfig:
+    """Configuration for LLM usage budgets.
     
-    request_id: str
-    timestamp: float = field(default_factory=time.time)
-    priority: int = 0  # Lower is higher priority
-    attempt: int = 0
-    tokens_required: int = 1
-    metadata: Dict[str, Any] = field(default_factory=dict)
+    A limit left as None is not enforced. Estimates are used for the first
+    reservation on a key; afterwards they follow a moving average of the
+    actual usage reported for that key, scaled by ``estimate_headroom``.
+    """
     
-    def __lt__(self, other: "RequestMetadata") -> bool:
-        """Compare for priority queue."""
-        if self.priority != other.priority:
-            return self.priority < other.priority
-        return self.timestamp < other.timestamp
+    input_tokens_per_minute: Optional[int] = None
+    output_tokens_per_minute: Optional[int] = None
+    cost_usd_per_hour: Optional[float] = None
+    
+    # Initial per-request estimates
+    default_input_tokens: int = 4000
+    default_output_tokens: int = 1000
+    default_cost_usd: float = 0.05
+    
+    # Adaptive estimation
+    estimate_headroom: float = 1.2
+    estimate_smoothing: float = 0.2
+    
+    # Maximum number of tracked projects/sessions
+    max_keys: int = 10000
+
+
+@dataclass
+class UsageReservation:
+    """Budget held for one query until its actual usage is known."""
+    
+    key: str
+    input_tokens: float
+    output_tokens: float
+    cost_usd: float
+    created_at: float = field(default_factory=time.time)
+    reconciled: bool = False
+
+
+class _FifoWaiterQueue(ABC):
+    """FIFO queue of callers waiting for capacity.
+    
+    Callers that cannot be served immediately park on a future. A single
+    timer is armed for the exact moment the head of the queue can be
+    served, so nobody polls and nobody sleeps while holding a lock. New
+    non-waiting callers cannot jump ahead of queued waiters.
+    
+    Subclasses define capacity through ``_try_take``, ``_delay_until`` and
+    ``_give_back``, and may replace the queue discipline through
+    ``_enqueue``, ``_peek_waiter``, ``_pop_waiter`` and ``_remove_waiter``.
+    All state is only touched from the event loop thread, so no lock is
+    needed.
+    """
+    
+    def __init__(self):
+        """Initialize waiter queue."""
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        
+        # Running counters
+        self.acquired_total = 0
+        self.rejected_total = 0
+        self.waited_total = 0
+        self.wait_time_total = 0.0
+        self.max_queue_depth = 0
+    
+    @abstractmethod
+    def _try_take(self, cost: int, now: float) -> bool:
+        """Consume capacity if available."""
+        pass
+    
+    @abstractmethod
+    def _delay_until(self, cost: int, now: float) -> Optional[float]:
+        """Seconds until ``cost`` could be taken, or None if never."""
+        pass
+    
+    @abstractmethod
+    def _give_back(self, cost: int) -> None:
+        """Return capacity granted to a caller that went away."""
+        pass
+    
+    def release(self, cost: int = 1) -> None:
+        """Return capacity taken by a caller that did not use it."""
+        self._give_back(cost)
+        self._dispatch()
+    
+    @property
+    def queue_depth(self) -> int:
+        """Number of callers currently waiting."""
+        return len(self._waiters)
+    
+    def _enqueue(self, cost: int, fut: asyncio.Future, **waiter_info: Any) -> tuple:
+        """Add a waiter entry; entries start with (cost, future)."""
+        entry = (cost, fut)
+        self._waiters.append(entry)
+        return entry
+    
+    def _peek_waiter(self) -> Optional[tuple]:
+        """Entry that should be served next."""
+        return self._waiters[0] if self._waiters else None
+    
+    def _pop_waiter(self, entry: tuple) -> None:
+        """Remove the entry returned by ``_peek_waiter``."""
+        self._waiters.popleft()
+    
+    def _remove_waiter(self, entry: tuple) -> None:
+        """Remove an arbitrary entry that is no longer waiting."""
+        try:
+            self._waiters.remove(entry)
+        except ValueError:
+            pass
+    
+    async def _acquire_slot(
+        self,
+        cost: int,
+        wait: bool,
+        timeout: Optional[float],
+        **waiter_info: Any
+    ) -> bool:
+        """Take capacity now, or wait in queue order until it is granted."""
+        if not self.queue_depth and self._try_take(cost, time.monotonic()):
+            self.acquired_total += 1
+            return True
+        
+        if not wait:
+            self.rejected_total += 1
+            return False
+        
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        entry = self._enqueue(cost, fut, **waiter_info)
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        self._dispatch()
+        
+        started = time.monotonic()
+        try:
+            if timeout is None:
+                await asyncio.shield(fut)
+            else:
+                await asyncio.wait_for(asyncio.shield(fut), timeout)
+        except asyncio.TimeoutError:
+            self._abandon(entry)
+            self.rejected_total += 1
+            return False
+        except asyncio.CancelledError:
+            self._abandon(entry)
+            raise
+        
+        self.acquired_total += 1
+        self.waited_total += 1
+        self.wait_time_total += time.monotonic() - started
+        return True
+    
+    def _abandon(self, entry: tuple) -> None:
+        """Withdraw a waiter that timed out or was cancelled."""
+        cost, fut = entry[0], entry[1]
+        if fut.done() and not fut.cancelled():
+            # Granted just as the caller gave up; hand the capacity back
+            self._give_back(cost)
+        else:
+            fut.cancel()
+            self._remove_waiter(entry)
+        self._dispatch()
+    
+    def _dispatch(self) -> None:
+        """Grant capacity to waiters in order and re-arm the wakeup timer."""
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+        
+        now = time.monotonic()
+        while True:
+            entry = self._peek_waiter()
+            if entry is None:
+                break
+            cost, fut = entry[0], entry[1]
+            if fut.done():
+                self._remove_waiter(entry)
+                continue
+            if not self._try_take(cost, now):
+                break
+            self._pop_waiter(entry)
+            fut.set_result(True)
+        
+        entry = self._peek_waiter()
+        if entry is not None:
+            delay = self._delay_until(entry[0], now)
+            if delay is not None:
+                self._wakeup = asyncio.get_running_loop().call_later(
+                    max(delay, 0.0), self._dispatch
+                )
+    
+    def _waiter_stats(self) -> Dict[str, Any]:
+        """Running counters shared by all waiter-queue limiters."""
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "acquired_total": self.acquired_total,
+            "rejected_total": self.rejected_total,
+            "waited_total": self.waited_total,
+            "avg_wait_seconds": (
+                self.wait_time_total / self.waited_total if self.waited_total else 0.0
+            ),
+        }
 
 
-class TokenBucket:
-    """Token bucket rate limiter."""
+class TokenBucket(_FifoWaiterQueue):
+    """Token bucket rate limiter with fair FIFO waiting."""
     
     def __init__(self, capacity: int, refill_rate: float):
         """Initialize token bucket.
@@ -101,61 +298,93 @@ class TokenBucket:
             capacity: Maximum number of tokens
             refill_rate: Tokens added per second
         """
+        super().__init__()
         self.capacity = capacity
         self.refill_rate = refill_rate
         self.tokens = float(capacity)
-        self.last_refill = time.time()
-        self._lock = asyncio.Lock()
+        self.last_refill = time.monotonic()
+    
+    def _refill(self, now: float) -> None:
+        """Add tokens accrued since the last refill."""
+        elapsed = now - self.last_refill
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.last_refill = now
+    
+    def _try_take(self, cost: int, now: float) -> bool:
+        """Consume tokens if available."""
+        self._refill(now)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+    
+    def adjust(self, delta: float) -> None:
+        """Credit (positive) or debit (negative) tokens after the fact.
+        
+        Debits may push the balance below zero; later callers then wait
+        until the debt has been refilled.
+        """
+        self._refill(time.monotonic())
+        self.tokens = min(self.capacity, self.tokens + delta)
+        if delta > 0 and self._waiters:
+            self._dispatch()
+    
+    def _delay_until(self, cost: int, now: float) -> Optional[float]:
+        """Exact time until enough tokens have accrued."""
+        if self.refill_rate <= 0:
+            return None
+        self._refill(now)
+        return (cost - self.tokens) / self.refill_rate
+    
+    def _give_back(self, cost: int) -> None:
+        """Return unused tokens."""
+        self.tokens = min(self.capacity, self.tokens + cost)
     
-    async def acquire(self, tokens: int = 1, wait: bool = True) -> bool:
+    async def acquire(
+        self,
+        tokens: int = 1,
+        wait: bool = True,
+        timeout: Optional[float] = None
+    ) -> bool:
         """Acquire tokens from bucket.
         
         Args:
             tokens: Number of tokens to acquire
             wait: Whether to wait if tokens not available
+            timeout: Maximum seconds to wait (None waits indefinitely)
             
         Returns:
             True if tokens acquired, False otherwise
+            
+        Raises:
+            RateLimitError: If more tokens are requested than the bucket holds
         """
-        async with self._lock:
-            # Refill tokens
-            now = time.time()
-            elapsed = now - self.last_refill
-            self.tokens = min(
-                self.capacity,
-                self.tokens + elapsed * self.refill_rate
+        if tokens > self.capacity:
+            raise RateLimitError(
+                f"Requested {tokens} tokens exceeds bucket capacity {self.capacity}",
+                limit_type="tokens"
             )
-            self.last_refill = now
-            
-            # Check if enough tokens
-            if self.tokens >= tokens:
-                self.tokens -= tokens
-                return True
-            
-            if not wait:
-                return False
-            
-            # Calculate wait time
-            tokens_needed = tokens - self.tokens
-            wait_time = tokens_needed / self.refill_rate
-            
-            # Wait and try again
-            await asyncio.sleep(wait_time)
-            return await self.acquire(tokens, wait=False)
+        return await self._acquire_slot(tokens, wait, timeout)
     
     @property
     def available_tokens(self) -> float:
         """Get current available tokens."""
-        now = time.time()
-        elapsed = now - self.last_refill
+        elapsed = time.monotonic() - self.last_refill
         return min(
             self.capacity,
             self.tokens + elapsed * self.refill_rate
         )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get bucket statistics."""
+        stats = self._waiter_stats()
+        stats["available_tokens"] = self.available_tokens
+        return stats
 
 
-class SlidingWindowLimiter:
-    """Sliding window rate limiter."""
+class SlidingWindowLimiter(_FifoWaiterQueue):
+    """Sliding window rate limiter with fair FIFO waiting."""
     
     def __init__(self, window_size: int, max_requests: int):
         """Initialize sliding window limiter.
@@ -164,10 +393,50 @@ class SlidingWindowLimiter:
             window_size: Window size in seconds
             max_requests: Maximum requests per window
         """
+        super().__init__()
         self.window_size = window_size
         self.max_requests = max_requests
         self.requests: Deque[float] = deque()
-        self._lock = asyncio.Lock()
+    
+    def _trim(self, now: float) -> None:
+        """Drop timestamps that left the window (amortized O(1))."""
+        cutoff = now - self.window_size
+        while self.requests and self.requests[0] < cutoff:
+            self.requests.popleft()
+    
+    def _try_take(self, cost: int, now: float) -> bool:
+        """Record a request if the window has room."""
+        self._trim(now)
+        if len(self.requests) >= self.max_requests:
+            return False
+        self.requests.append(now)
+        return True
+    
+    def _delay_until(self, cost: int, now: float) -> Optional[float]:
+        """Time until the oldest request leaves the window."""
+        if self.max_requests <= 0:
+            return None
+        self._trim(now)
+        if len(self.requests) < self.max_requests:
+            return 0.0
+        return self.requests[0] + self.window_size - now
+    
+    def _give_back(self, cost: int) -> None:
+        """Forget the most recently recorded request."""
+        if self.requests:
+            self.requests.pop()
+    
+    async def acquire(self, wait: bool = True, timeout: Optional[float] = None) -> bool:
+        """Record a request, waiting for room in the window if asked to.
+        
+        Args:
+            wait: Whether to wait if the window is full
+            timeout: Maximum seconds to wait (None waits indefinitely)
+            
+        Returns:
+            True if the request fits in the window
+        """
+        return await self._acquire_slot(1, wait, timeout)
     
     async def check_limit(self) -> bool:
         """Check if request is within limit.
@@ -175,31 +444,180 @@ class SlidingWindowLimiter:
         Returns:
             True if within limit, False otherwise
         """
-        async with self._lock:
-            now = time.time()
-            cutoff = now - self.window_size
-            
-            # Remove old requests
-            while self.requests and self.requests[0] < cutoff:
-                self.requests.popleft()
-            
-            # Check limit
-            if len(self.requests) >= self.max_requests:
-                return False
-            
-            # Add current request
-            self.requests.append(now)
-            return True
+        return await self.acquire(wait=False)
     
     @property
     def current_rate(self) -> float:
         """Get current request rate per second."""
-        now = time.time()
-        cutoff = now - self.window_size
+        self._trim(time.monotonic())
+        return len(self.requests) / self.window_size if self.window_size > 0 else 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get window statistics."""
+        stats = self._waiter_stats()
+        stats["current_rate"] = self.current_rate
+        return stats
+
+
+class PriorityScheduler(_FifoWaiterQueue):
+    """Priority scheduler in front of a token bucket.
+    
+    Waiters are grouped into lanes (e.g. interactive chat and background
+    batch) that share capacity in proportion to their weights using stride
+    scheduling; an idle lane does not bank credit. Within a lane, lower
+    priority values are served first, and every ``aging_seconds`` spent
+    waiting is worth one priority level, so low-priority work cannot
+    starve. Because aging is linear, the ordering key
+    ``enqueued_at + priority * aging_seconds`` never changes and a plain
+    heap suffices.
+    """
+    
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        lane_weights: Optional[Dict[str, float]] = None,
+        aging_seconds: float = 5.0,
+        default_lane: str = "interactive"
+    ):
+        """Initialize scheduler.
         
-        # Count recent requests
-        recent = sum(1 for t in self.requests if t >= cutoff)
-        return recent / self.window_size if self.window_size > 0 else 0
+        Args:
+            bucket: Token bucket that provides capacity
+            lane_weights: Relative share of capacity per lane
+            aging_seconds: Wait time worth one priority level
+            default_lane: Lane used when callers do not name one
+        """
+        super().__init__()
+        self.bucket = bucket
+        self.aging_seconds = aging_seconds
+        self.default_lane = default_lane
+        self.lane_weights: Dict[str, float] = dict(
+            lane_weights or {"interactive": 3.0, "batch": 1.0}
+        )
+        self.lane_weights.setdefault(default_lane, 1.0)
+        
+        self._lanes: Dict[str, List[tuple]] = {name: [] for name in self.lane_weights}
+        self._lane_pass: Dict[str, float] = {name: 0.0 for name in self.lane_weights}
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+        self._depth = 0
+        self.granted_by_lane: Dict[str, int] = defaultdict(int)
+    
+    def _try_take(self, cost: int, now: float) -> bool:
+        """Consume tokens from the underlying bucket."""
+        return self.bucket._try_take(cost, now)
+    
+    def _delay_until(self, cost: int, now: float) -> Optional[float]:
+        """Time until the bucket can serve ``cost``."""
+        return self.bucket._delay_until(cost, now)
+    
+    def _give_back(self, cost: int) -> None:
+        """Return tokens to the bucket."""
+        self.bucket._give_back(cost)
+    
+    @property
+    def queue_depth(self) -> int:
+        """Number of callers waiting across all lanes."""
+        return self._depth
+    
+    def _enqueue(
+        self,
+        cost: int,
+        fut: asyncio.Future,
+        priority: int = 0,
+        lane: Optional[str] = None,
+        **waiter_info: Any
+    ) -> tuple:
+        """Queue a waiter in its lane, ordered by aged priority."""
+        lane = lane or self.default_lane
+        if lane not in self._lanes:
+            self.lane_weights[lane] = 1.0
+            self._lanes[lane] = []
+            self._lane_pass[lane] = self._virtual_time
+        
+        heap = self._lanes[lane]
+        if not heap:
+            # A lane returning from idle starts at the current virtual time
+            self._lane_pass[lane] = max(self._lane_pass[lane], self._virtual_time)
+        
+        sort_key = time.monotonic() + priority * self.aging_seconds
+        entry = (cost, fut, lane, sort_key, next(self._seq))
+        heapq.heappush(heap, (sort_key, entry[4], entry))
+        self._depth += 1
+        return entry
+    
+    def _peek_waiter(self) -> Optional[tuple]:
+        """Head of the non-empty lane with the smallest pass value."""
+        best_lane = None
+        for lane, heap in self._lanes.items():
+            while heap and heap[0][2][1].done():
+                heapq.heappop(heap)
+                self._depth -= 1
+            if heap and (best_lane is None or self._lane_pass[lane] < self._lane_pass[best_lane]):
+                best_lane = lane
+        if best_lane is None:
+            return None
+        return self._lanes[best_lane][0][2]
+    
+    def _pop_waiter(self, entry: tuple) -> None:
+        """Remove the served head and advance its lane's pass."""
+        cost, _, lane = entry[0], entry[1], entry[2]
+        heapq.heappop(self._lanes[lane])
+        self._depth -= 1
+        self._virtual_time = self._lane_pass[lane]
+        self._lane_pass[lane] += max(cost, 1) / self.lane_weights[lane]
+        self.granted_by_lane[lane] += 1
+    
+    def _remove_waiter(self, entry: tuple) -> None:
+        """Remove a waiter that gave up."""
+        heap = self._lanes.get(entry[2], [])
+        for i, item in enumerate(heap):
+            if item[2] is entry:
+                heap[i] = heap[-1]
+                heap.pop()
+                heapq.heapify(heap)
+                self._depth -= 1
+                return
+    
+    async def acquire(
+        self,
+        tokens: int = 1,
+        priority: int = 0,
+        lane: Optional[str] = None,
+        wait: bool = True,
+        timeout: Optional[float] = None
+    ) -> bool:
+        """Acquire tokens, waiting in priority order if needed.
+        
+        Args:
+            tokens: Number of tokens required
+            priority: Request priority (lower is higher)
+            lane: Scheduling lane (defaults to ``default_lane``)
+            wait: Whether to wait if tokens not available
+            timeout: Maximum seconds to wait
+            
+        Returns:
+            True if tokens acquired, False otherwise
+        """
+        if tokens > self.bucket.capacity:
+            raise RateLimitError(
+                f"Requested {tokens} tokens exceeds bucket capacity {self.bucket.capacity}",
+                limit_type="tokens"
+            )
+        return await self._acquire_slot(tokens, wait, timeout, priority=priority, lane=lane)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get scheduler statistics."""
+        stats = self._waiter_stats()
+        stats["lanes"] = {
+            lane: {
+                "weight": self.lane_weights[lane],
+                "queue_depth": len(heap),
+                "granted": self.granted_by_lane[lane],
+            }
+            for lane, heap in self._lanes.items()
+        }
+        return stats
 
 
 class RetryManager:
@@ -426,51 +844,6 @@ class CircuitBreaker:
         }
 
 
-class PriorityQueue:
-    """Priority queue for requests."""
-    
-    def __init__(self):
-        """Initialize priority queue."""
-        self._queue: List[tuple] = []
-        self._counter = 0  # For stable sorting
-        self._lock = asyncio.Lock()
-    
-    async def put(self, item: RequestMetadata) -> None:
-        """Add item to queue."""
-        async with self._lock:
-            # Use counter for stable sorting
-            heapq.heappush(
-                self._queue,
-                (item.priority, self._counter, item)
-            )
-            self._counter += 1
-    
-    async def get(self) -> Optional[RequestMetadata]:
-        """Get highest priority item."""
-        async with self._lock:
-            if self._queue:
-                _, _, item = heapq.heappop(self._queue)
-                return item
-            return None
-    
-    async def peek(self) -> Optional[RequestMetadata]:
-        """Peek at highest priority item without removing."""
-        async with self._lock:
-            if self._queue:
-                _, _, item = self._queue[0]
-                return item
-            return None
-    
-    @property
-    def size(self) -> int:
-        """Get queue size."""
-        return len(self._queue)
-    
-    def is_empty(self) -> bool:
-        """Check if queue is empty."""
-        return len(self._queue) == 0
-
-
 class RateLimiter:
     """Comprehensive rate limiter with multiple strategies."""
     
@@ -494,10 +867,15 @@ class RateLimiter:
         self.retry_manager = RetryManager(self.config)
         self.circuit_breaker = CircuitBreaker(self.config)
         
-        # Priority queue if enabled
-        self.priority_queue: Optional[PriorityQueue] = None
+        # Priority scheduler if enabled
+        self.scheduler: Optional[PriorityScheduler] = None
         if self.config.enable_priority:
-            self.priority_queue = PriorityQueue()
+            self.scheduler = PriorityScheduler(
+                self.token_bucket,
+                lane_weights=self.config.lane_weights,
+                aging_seconds=self.config.priority_aging_seconds,
+                default_lane=self.config.default_lane
+            )
         
         # Statistics
         self._stats = {
@@ -536,19 +914,14 @@ class RateLimiter:
             self._stats["rate_limited_requests"] += 1
             return False
         
-        # Check token bucket
-        if not await self.token_bucket.acquire(tokens, wait=False):
+        # Check token bucket; with a scheduler, queued waiters go first
+        if self.scheduler:
+            granted = await self.scheduler.acquire(tokens, priority, wait=False)
+        else:
+            granted = await self.token_bucket.acquire(tokens, wait=False)
+        if not granted:
+            self.sliding_window.release(1)
             self._stats["rate_limited_requests"] += 1
-            
-            # Add to priority queue if enabled
-            if self.priority_queue and request_id:
-                metadata = RequestMetadata(
-                    request_id=request_id,
-                    priority=priority,
-                    tokens_required=tokens
-                )
-                await self.priority_queue.put(metadata)
-            
             return False
         
         self._stats["successful_requests"] += 1
@@ -560,7 +933,8 @@ class RateLimiter:
         tokens: int = 1,
         priority: int = 0,
         request_id: Optional[str] = None,
-        wait: bool = True
+        wait: bool = True,
+        lane: Optional[str] = None
     ):
         """Context manager for rate limiting.
         
@@ -569,6 +943,7 @@ class RateLimiter:
             priority: Request priority
             request_id: Optional request ID
             wait: Whether to wait for availability
+            lane: Scheduling lane when priority scheduling is enabled
             
         Example:
             >>> async with rate_limiter.limit(tokens=2):
@@ -580,8 +955,7 @@ class RateLimiter:
         try:
             # Try to acquire
             if wait:
-                while not await self.acquire(tokens, priority, request_id):
-                    await asyncio.sleep(0.1)
+                await self._acquire_waiting(tokens, priority, lane)
                 acquired = True
             else:
                 acquired = await self.acquire(tokens, priority, request_id)
@@ -605,6 +979,31 @@ class RateLimiter:
             # Could implement token return logic here if needed
             pass
     
+    async def _acquire_waiting(
+        self,
+        tokens: int,
+        priority: int = 0,
+        lane: Optional[str] = None
+    ) -> None:
+        """Wait for window room, then for tokens in scheduler order."""
+        self._stats["total_requests"] += 1
+        
+        if self.circuit_breaker.is_open:
+            self._stats["circuit_breaks"] += 1
+            raise RateLimitError("Circuit breaker is open", limit_type="circuit")
+        
+        await self.sliding_window.acquire(wait=True)
+        try:
+            if self.scheduler:
+                await self.scheduler.acquire(tokens, priority, lane)
+            else:
+                await self.token_bucket.acquire(tokens, wait=True)
+        except BaseException:
+            # Cancelled or failed while waiting for tokens: free the window slot
+            self.sliding_window.release(1)
+            raise
+        self._stats["successful_requests"] += 1
+    
     async def _dummy_fail(self, exception: Exception) -> None:
         """Dummy function for circuit breaker."""
         raise exception
@@ -650,35 +1049,279 @@ class RateLimiter:
         stats.update({
             "available_tokens": self.token_bucket.available_tokens,
             "current_rate": self.sliding_window.current_rate,
+            "token_bucket": self.token_bucket.get_stats(),
+            "sliding_window": self.sliding_window.get_stats(),
+            "waiters": (
+                self.token_bucket.queue_depth
+                + self.sliding_window.queue_depth
+                + (self.scheduler.queue_depth if self.scheduler else 0)
+            ),
             "circuit_breaker": self.circuit_breaker.get_status(),
-            "queue_size": self.priority_queue.size if self.priority_queue else 0
+            "queue_size": self.scheduler.queue_depth if self.scheduler else 0
         })
+        if self.scheduler:
+            stats["scheduler"] = self.scheduler.get_stats()
         return stats
     
     async def process_queue(self) -> None:
-        """Process priority queue (for background task)."""
-        if not self.priority_queue:
-            return
+        """Admit any queued requests that now fit.
+        
+        The scheduler wakes waiters on its own timer; this is kept for
+        callers that ran it as a background task.
+        """
+        if self.scheduler:
+            self.scheduler._dispatch()
+
+
+class UsageRateLimiter:
+    """Rate limiter for real LLM usage rather than abstract request tokens.
+    
+    Each key (project or session id) gets separate buckets for input tokens
+    per minute, output tokens per minute and cost per hour. A query first
+    reserves an estimated budget; once its ``ResultMessage`` arrives the
+    reservation is reconciled against the reported ``usage`` and
+    ``total_cost_usd``, refunding overestimates and debiting shortfalls.
+    
+    Example:
+        >>> limiter = UsageRateLimiter(UsageLimitConfig(
+        ...     input_tokens_per_minute=40000, cost_usd_per_hour=5.0
+        ... ))
+        >>> async with limiter.limit("project-a") as reservation:
+        ...     async for msg in query(prompt="Hello"):
+        ...         if isinstance(msg, ResultMessage):
+        ...             limiter.reconcile_result(reservation, msg)
+    """
+    
+    # Bucket name -> (config attribute, refill period in seconds)
+    _LIMITS = {
+        "input_tokens": ("input_tokens_per_minute", 60.0),
+        "output_tokens": ("output_tokens_per_minute", 60.0),
+        "cost_usd": ("cost_usd_per_hour", 3600.0),
+    }
+    
+    def __init__(self, config: Optional[UsageLimitConfig] = None):
+        """Initialize usage limiter.
+        
+        Args:
+            config: Usage limit configuration
+        """
+        self.config = config or UsageLimitConfig()
+        self._buckets: "OrderedDict[str, Dict[str, TokenBucket]]" = OrderedDict()
+        self._estimates: Dict[str, Dict[str, float]] = {}
+        self._stats = {
+            "reservations": 0,
+            "rejected": 0,
+            "reconciled": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cost_usd": 0.0,
+            "refunded": {name: 0.0 for name in self._LIMITS},
+            "debited": {name: 0.0 for name in self._LIMITS},
+        }
+    
+    def _get_buckets(self, key: str) -> Dict[str, TokenBucket]:
+        """Get or create the buckets for a key, evicting the least recent key."""
+        buckets = self._buckets.get(key)
+        if buckets is not None:
+            self._buckets.move_to_end(key)
+            return buckets
+        
+        buckets = {}
+        for name, (attr, period) in self._LIMITS.items():
+            limit = getattr(self.config, attr)
+            if limit is not None:
+                buckets[name] = TokenBucket(limit, limit / period)
+        self._buckets[key] = buckets
         
-        while not self.priority_queue.is_empty():
-            # Get next request
-            request = await self.priority_queue.get()
-            if not request:
+        while len(self._buckets) > self.config.max_keys:
+            old_key, old_buckets = next(iter(self._buckets.items()))
+            if any(bucket.queue_depth for bucket in old_buckets.values()):
                 break
+            self._buckets.popitem(last=False)
+            self._estimates.pop(old_key, None)
+        return buckets
+    
+    def estimate(self, key: str) -> Dict[str, float]:
+        """Current per-request usage estimate for a key."""
+        learned = self._estimates.get(key)
+        if learned is None:
+            return {
+                "input_tokens": float(self.config.default_input_tokens),
+                "output_tokens": float(self.config.default_output_tokens),
+                "cost_usd": self.config.default_cost_usd,
+            }
+        headroom = self.config.estimate_headroom
+        return {name: value * headroom for name, value in learned.items()}
+    
+    async def reserve(
+        self,
+        key: str = "default",
+        input_tokens: Optional[float] = None,
+        output_tokens: Optional[float] = None,
+        cost_usd: Optional[float] = None,
+        wait: bool = True,
+        timeout: Optional[float] = None
+    ) -> UsageReservation:
+        """Reserve budget for one query.
+        
+        Args:
+            key: Project or session id whose budget is charged
+            input_tokens: Expected input tokens (defaults to the estimate)
+            output_tokens: Expected output tokens (defaults to the estimate)
+            cost_usd: Expected cost (defaults to the estimate)
+            wait: Whether to wait for budget to refill
+            timeout: Maximum seconds to wait for all buckets
             
-            # Try to acquire tokens
-            if await self.acquire(
-                request.tokens_required,
-                request.priority,
-                request.request_id
-            ):
-                logger.debug(
-                    f"Processed queued request {request.request_id}"
-                )
-            else:
-                # Re-queue if still can't process
-                await self.priority_queue.put(request)
-                await asyncio.sleep(0.1)
+        Returns:
+            Reservation to pass to :meth:`reconcile`
+            
+        Raises:
+            RateLimitError: If budget is unavailable and not waiting, or the
+                timeout expires
+        """
+        estimate = self.estimate(key)
+        amounts = {
+            "input_tokens": input_tokens if input_tokens is not None else estimate["input_tokens"],
+            "output_tokens": output_tokens if output_tokens is not None else estimate["output_tokens"],
+            "cost_usd": cost_usd if cost_usd is not None else estimate["cost_usd"],
+        }
+        
+        buckets = self._get_buckets(key)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        taken: Dict[str, float] = {}
+        
+        try:
+            for name, bucket in buckets.items():
+                # A single query may legitimately exceed the whole budget;
+                # reserve what the bucket can hold and reconcile the rest later
+                amount = min(amounts[name], bucket.capacity)
+                remaining = None
+                if deadline is not None:
+                    remaining = max(0.0, deadline - time.monotonic())
+                
+                if not await bucket.acquire(amount, wait=wait, timeout=remaining):
+                    self._stats["rejected"] += 1
+                    retry_after = bucket._delay_until(amount, time.monotonic())
+                    raise RateLimitError(
+                        f"Usage budget exhausted for {key}: {name}",
+                        retry_after_seconds=retry_after,
+                        limit_type=name
+                    )
+                taken[name] = amount
+        except BaseException:
+            # Rejected, timed out or cancelled while waiting on a later
+            # bucket: refund what the earlier buckets already charged
+            for taken_name, taken_amount in taken.items():
+                buckets[taken_name].adjust(taken_amount)
+            raise
+        
+        self._stats["reservations"] += 1
+        return UsageReservation(
+            key=key,
+            input_tokens=taken.get("input_tokens", 0.0),
+            output_tokens=taken.get("output_tokens", 0.0),
+            cost_usd=taken.get("cost_usd", 0.0),
+        )
+    
+    def reconcile(
+        self,
+        reservation: UsageReservation,
+        usage: Optional[Dict[str, Any]] = None,
+        total_cost_usd: Optional[float] = None
+    ) -> None:
+        """Settle a reservation against actual usage.
+        
+        Args:
+            reservation: Reservation returned by :meth:`reserve`
+            usage: ``ResultMessage.usage`` dict (input/output token counts)
+            total_cost_usd: ``ResultMessage.total_cost_usd``
+        """
+        if reservation.reconciled:
+            return
+        reservation.reconciled = True
+        
+        usage = usage or {}
+        actual = {
+            "input_tokens": float(
+                usage.get("input_tokens", 0)
+                + usage.get("cache_creation_input_tokens", 0)
+            ),
+            "output_tokens": float(usage.get("output_tokens", 0)),
+            "cost_usd": float(total_cost_usd or 0.0),
+        }
+        reserved = {
+            "input_tokens": reservation.input_tokens,
+            "output_tokens": reservation.output_tokens,
+            "cost_usd": reservation.cost_usd,
+        }
+        
+        buckets = self._buckets.get(reservation.key, {})
+        for name, bucket in buckets.items():
+            delta = reserved[name] - actual[name]
+            if delta:
+                bucket.adjust(delta)
+                bucket_stat = "refunded" if delta > 0 else "debited"
+                self._stats[bucket_stat][name] += abs(delta)
+        
+        # Learn per-key estimates from what was actually used
+        alpha = self.config.estimate_smoothing
+        learned = self._estimates.get(reservation.key)
+        if learned is None:
+            self._estimates[reservation.key] = dict(actual)
+        else:
+            for name, value in actual.items():
+                learned[name] += alpha * (value - learned[name])
+        
+        self._stats["reconciled"] += 1
+        self._stats["input_tokens"] += actual["input_tokens"]
+        self._stats["output_tokens"] += actual["output_tokens"]
+        self._stats["cost_usd"] += actual["cost_usd"]
+    
+    def reconcile_result(self, reservation: UsageReservation, message: ResultMessage) -> None:
+        """Settle a reservation from a ``ResultMessage``."""
+        self.reconcile(reservation, message.usage, message.total_cost_usd)
+    
+    @asynccontextmanager
+    async def limit(
+        self,
+        key: str = "default",
+        wait: bool = True,
+        timeout: Optional[float] = None,
+        **estimates: float
+    ):
+        """Context manager that reserves budget for the enclosed query.
+        
+        If the block exits without a reconcile (for example, the query
+        failed before a ``ResultMessage``), the reservation stays charged.
+        
+        Args:
+            key: Project or session id
+            wait: Whether to wait for budget
+            timeout: Maximum seconds to wait
+            **estimates: Optional input_tokens, output_tokens or cost_usd
+        """
+        reservation = await self.reserve(key, wait=wait, timeout=timeout, **estimates)
+        yield reservation
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get usage limiter statistics."""
+        stats = dict(self._stats)
+        stats["tracked_keys"] = len(self._buckets)
+        stats["waiters"] = sum(
+            bucket.queue_depth
+            for buckets in self._buckets.values()
+            for bucket in buckets.values()
+        )
+        return stats
+    
+    def get_key_stats(self, key: str) -> Dict[str, Any]:
+        """Get remaining budget and estimates for a key."""
+        buckets = self._buckets.get(key, {})
+        return {
+            "available": {name: bucket.available_tokens for name, bucket in buckets.items()},
+            "waiters": {name: bucket.queue_depth for name, bucket in buckets.items()},
+            "estimate": self.estimate(key),
+        }
 
 
 # Global rate limiter instance
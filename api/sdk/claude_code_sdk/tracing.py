@@ -0,0 +1,448 @@
+"""Lightweight tracing spans for Hackathon Flow Blockchain Agents.
+
+This module provides:
+- Span objects with parent/child links propagated through contextvars, so
+  spans opened in the API server, the client, the control protocol and the
+  transport join the same trace without passing handles around
+- A process-wide Tracer that is disabled (near zero cost) until configured
+- Pluggable exporters: an OTLP/JSON file exporter that works offline and an
+  in-memory ring buffer for admin endpoints
+
+Example:
+    >>> from claude_code_sdk.tracing import configure_tracing, get_tracer
+    >>> configure_tracing([RingBufferExporter()])
+    >>> with get_tracer().span("turn", session_id="abc"):
+    ...     ...
+"""
+
+import functools
+import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Sequence, TypeVar, Union
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "kind",
+        "start_ns", "end_ns", "attributes", "events",
+        "status", "status_message", "_tracer",
+    )
+
+    def __init__(
+        self,
+        tracer: Optional["Tracer"],
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None
+    ):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = attributes or {}
+        self.events: List[tuple] = []
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes) -> None:
+        """Record a point-in-time event (e.g. first token) on the span."""
+        self.events.append((time.time_ns(), name, attributes))
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"
+        self.add_event("exception", type=type(exc).__name__, message=str(exc))
+
+    def end(self, error: Optional[str] = None) -> None:
+        """Finish the span and hand it to the exporters; later calls are ignored."""
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.status = STATUS_ERROR
+            self.status_message = error
+        elif self.status == STATUS_UNSET:
+            self.status = STATUS_OK
+        if self._tracer is not None:
+            self._tracer._on_end(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain representation used by the ring buffer and admin endpoints."""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_ns / 1e9,
+            "duration_ms": self.duration_ms,
+            "status": {STATUS_OK: "ok", STATUS_ERROR: "error"}.get(self.status, "unset"),
+            "status_message": self.status_message or None,
+            "attributes": dict(self.attributes),
+            "events": [
+                {"time": ts / 1e9, "name": name, "attributes": attrs}
+                for ts, name, attrs in self.events
+            ],
+        }
+
+
+class _NoopSpan:
+    """Returned while tracing is disabled; every operation does nothing."""
+
+    __slots__ = ()
+    trace_id = None
+    span_id = None
+    duration_ms = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+    def end(self, error: Optional[str] = None) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+# Holds NOOP_SPAN inside an unsampled trace so descendants stay unsampled
+_current_span: ContextVar[Union[Span, _NoopSpan, None]] = ContextVar(
+    "claude_sdk_current_span", default=None
+)
+
+
+def current_span() -> Optional[Span]:
+    """The active (recorded) span in this context, if any."""
+    span = _current_span.get()
+    return span if isinstance(span, Span) else None
+
+
+class SpanExporter(ABC):
+    """Abstract base class for span exporters."""
+
+    @abstractmethod
+    def export(self, spans: Sequence[Span]) -> None:
+        """Receive a batch of finished spans."""
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        self.flush()
+
+
+class Tracer:
+    """Creates spans and forwards finished ones to exporters.
+
+    A tracer with no exporters is disabled: ``span()`` yields a shared
+    no-op span and nothing is allocated per call.
+    """
+
+    def __init__(
+        self,
+        exporters: Optional[List[SpanExporter]] = None,
+        sample_rate: float = 1.0,
+        service_name: str = "claude-code-sdk"
+    ):
+        self.exporters: List[SpanExporter] = list(exporters or [])
+        self.sample_rate = sample_rate
+        self.service_name = service_name
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    def start_span(
+        self,
+        name: str,
+        parent: Union[Span, _NoopSpan, None] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        **attributes
+    ) -> Union[Span, _NoopSpan]:
+        """Start a span without making it current (end it explicitly).
+
+        Used for spans whose lifetime does not follow a code block, such as
+        a tool call that starts with tool_use and ends with tool_result.
+        """
+        if not self.exporters:
+            return NOOP_SPAN
+        if parent is None:
+            parent = _current_span.get()
+        if parent is NOOP_SPAN:
+            return NOOP_SPAN
+        if parent is None:
+            # Sampling is decided once per trace, at the root
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return NOOP_SPAN
+            trace_id = f"{random.getrandbits(128):032x}"
+            parent_id = None
+        else:
+            trace_id = parent.trace_id
+            parent_id = parent.span_id
+        return Span(self, name, trace_id, parent_id, kind, attributes)
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        kind: int = SPAN_KIND_INTERNAL,
+        **attributes
+    ) -> Iterator[Union[Span, _NoopSpan]]:
+        """Open a span as the current one for the duration of the block."""
+        if not self.exporters:
+            yield NOOP_SPAN
+            return
+
+        span = self.start_span(name, kind=kind, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.record_exception(e)
+            raise
+        except BaseException:
+            # Cancellation / generator close: not an error of the operation
+            span.set_attribute("cancelled", True)
+            raise
+        finally:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Generator finalized from another context
+                pass
+            span.end()
+
+    def _on_end(self, span: Span) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export((span,))
+            except Exception:
+                # Tracing must never break the traced operation
+                pass
+
+    def shutdown(self) -> None:
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"key": key, "value": _otlp_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+def span_to_otlp(span: Span) -> Dict[str, Any]:
+    """Convert a span to the OTLP/JSON span representation."""
+    otlp = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+        "attributes": _otlp_attributes(span.attributes),
+        "events": [
+            {"timeUnixNano": str(ts), "name": name, "attributes": _otlp_attributes(attrs)}
+            for ts, name, attrs in span.events
+        ],
+        "status": {"code": span.status},
+    }
+    if span.parent_id:
+        otlp["parentSpanId"] = span.parent_id
+    if span.status_message:
+        otlp["status"]["message"] = span.status_message
+    return otlp
+
+
+class OTLPJsonFileExporter(SpanExporter):
+    """Append spans to a file as OTLP/JSON, one ``ExportTraceServiceRequest`` per line.
+
+    Spans are buffered and written in batches of ``batch_size`` (and on
+    ``flush``/``shutdown``), so the file can be replayed into any OTLP
+    collector later without a network dependency at runtime.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        service_name: str = "claude-code-sdk",
+        batch_size: int = 64
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[Span]) -> None:
+        with self._lock:
+            self._buffer.extend(span_to_otlp(span) for span in spans)
+            # Write when a batch is full or a trace root finishes
+            if len(self._buffer) >= self.batch_size or any(s.parent_id is None for s in spans):
+                self._write_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._write_locked()
+
+    def _write_locked(self) -> None:
+        if not self._buffer:
+            return
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+                "scopeSpans": [{
+                    "scope": {"name": "claude_code_sdk.tracing"},
+                    "spans": self._buffer,
+                }],
+            }]
+        }
+        self._buffer = []
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(payload, default=str) + "\n")
+
+
+class RingBufferExporter(SpanExporter):
+    """Keep the most recent finished spans in memory."""
+
+    def __init__(self, capacity: int = 2000):
+        self._spans: Deque[Span] = deque(maxlen=capacity)
+
+    def export(self, spans: Sequence[Span]) -> None:
+        self._spans.extend(spans)
+
+    def recent(self, limit: int = 100, trace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most recent spans first, optionally restricted to one trace."""
+        spans = [s for s in reversed(self._spans) if trace_id is None or s.trace_id == trace_id]
+        return [span.to_dict() for span in spans[:limit]]
+
+    def traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent traces (newest root first) with their spans ordered by start."""
+        grouped: Dict[str, List[Span]] = {}
+        for span in self._spans:
+            grouped.setdefault(span.trace_id, []).append(span)
+
+        roots = [s for s in reversed(self._spans) if s.parent_id is None][:limit]
+        return [
+            {
+                "trace_id": root.trace_id,
+                "name": root.name,
+                "duration_ms": root.duration_ms,
+                "spans": [s.to_dict() for s in sorted(grouped[root.trace_id], key=lambda s: s.start_ns)],
+            }
+            for root in roots
+        ]
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """The process-wide tracer."""
+    return _tracer
+
+
+def traced(name: Optional[str] = None, kind: int = SPAN_KIND_INTERNAL, **attributes) -> Callable[[F], F]:
+    """Decorator that runs a coroutine function inside a span.
+
+    Example:
+        >>> @traced("session.create")
+        ... async def create_session(session_id): ...
+    """
+    def decorator(func: F) -> F:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not _tracer.exporters:
+                return await func(*args, **kwargs)
+            with _tracer.span(span_name, kind=kind, **attributes):
+                return await func(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return decorator
+
+
+def configure_tracing(
+    exporters: Optional[List[SpanExporter]] = None,
+    sample_rate: float = 1.0,
+    service_name: str = "claude-code-sdk"
+) -> Tracer:
+    """(Re)configure the process-wide tracer; no exporters disables tracing."""
+    _tracer.shutdown()
+    _tracer.exporters = list(exporters or [])
+    _tracer.sample_rate = sample_rate
+    _tracer.service_name = service_name
+    return _tracer
+
+
+def configure_tracing_from_env() -> Tracer:
+    """Configure from environment variables.
+
+    CLAUDE_SDK_TRACE_FILE: OTLP/JSON output path (enables the file exporter)
+    CLAUDE_SDK_TRACE_BUFFER: ring buffer capacity (enables the ring buffer)
+    CLAUDE_SDK_TRACE_SAMPLE_RATE: fraction of traces recorded (default 1.0)
+    """
+    exporters: List[SpanExporter] = []
+    if os.environ.get("CLAUDE_SDK_TRACE_FILE"):
+        exporters.append(OTLPJsonFileExporter(os.environ["CLAUDE_SDK_TRACE_FILE"]))
+    if os.environ.get("CLAUDE_SDK_TRACE_BUFFER"):
+        exporters.append(RingBufferExporter(int(os.environ["CLAUDE_SDK_TRACE_BUFFER"])))
+    return configure_tracing(
+        exporters,
+        sample_rate=float(os.environ.get("CLAUDE_SDK_TRACE_SAMPLE_RATE", "1.0"))
+    )
@@ -8,6 +8,7 @@ from dataclasses import dataclass
 from enum import Enum
 
 from ._errors import RateLimitError, TimeoutError, ValidationError
+from .quantiles import QuantileSketch, WindowedQuantileSketch
 
 
 class RetryStrategy(Enum):
@@ -251,9 +252,14 @@ class CallbackManager:
 
 
 class MetricsCollector:
-    """Collects metrics for SDK operations."""
+    """Collects metrics for SDK operations.
     
-    def __init__(self):
+    Request durations go into fixed-memory quantile sketches: one for the
+    whole lifetime and one over a sliding ``window_seconds`` window.
+    """
+    
+    def __init__(self, window_seconds: float = 300.0):
+        self.window_seconds = window_seconds
         self.reset()
     
     def reset(self):
@@ -263,7 +269,8 @@ class MetricsCollector:
         self.failed_requests = 0
         self.total_tokens = 0
         self.total_cost = 0.0
-        self.request_durations: List[float] = []
+        self.request_durations = QuantileSketch()
+        self.recent_durations = WindowedQuantileSketch(self.window_seconds)
         self.errors: Dict[str, int] = {}
         self.start_time = time.time()
     
@@ -282,7 +289,8 @@ class MetricsCollector:
         else:
             self.failed_requests += 1
         
-        self.request_durations.append(duration)
+        self.request_durations.add(duration)
+        self.recent_durations.add(duration)
         self.total_tokens += tokens
         self.total_cost += cost
     
@@ -303,7 +311,7 @@ class MetricsCollector:
             Dictionary with metrics
         """
         uptime = time.time() - self.start_time
-        avg_duration = sum(self.request_durations) / len(self.request_durations) if self.request_durations else 0
+        avg_duration = self.request_durations.mean or 0
         
         return {
             "total_requests": self.total_requests,
@@ -313,6 +321,8 @@ class MetricsCollector:
             "total_tokens": self.total_tokens,
             "total_cost_usd": self.total_cost,
             "average_duration_seconds": avg_duration,
+            "duration_seconds": self.request_durations.summary(),
+            "recent_duration_seconds": self.recent_durations.summary(),
             "errors": dict(self.errors),
             "uptime_seconds": uptime,
             "requests_per_minute": (self.total_requests / uptime) * 60 if uptime > 0 else 0
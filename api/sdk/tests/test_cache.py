@@ -0,0 +1,204 @@
+"""Test suite for the SDK cache backends and manager."""
+
+import asyncio
+
+import pytest
+
+from claude_code_sdk import ConfigurationError
+from claude_code_sdk.cache import CacheManager, DiskCacheBackend, MemoryCacheBackend
+
+
+class TestTagInvalidation:
+    """Test tag-based invalidation."""
+
+    @pytest.mark.asyncio
+    async def test_invalidate_tags_memory(self):
+        """Only entries carrying the tag are removed."""
+        cache = CacheManager(backend=MemoryCacheBackend())
+        await cache.set("a", 1, tags=["session:1"])
+        await cache.set("b", 2, tags=["session:1", "addr:0x01"])
+        await cache.set("c", 3, tags=["session:2"])
+
+        assert await cache.invalidate_tags("session:1") == 2
+        assert await cache.get("a") is None
+        assert await cache.get("b") is None
+        assert await cache.get("c") == 3
+        assert cache.backend._tag_index == {"session:2": {"c"}}
+
+    @pytest.mark.asyncio
+    async def test_overwrite_drops_old_tags(self):
+        """Re-setting a key replaces its tags and size accounting."""
+        backend = MemoryCacheBackend()
+        cache = CacheManager(backend=backend)
+        await cache.set("a", "x" * 100, tags=["old"])
+        await cache.set("a", "y", tags=["new"])
+
+        assert await cache.invalidate_tags("old") == 0
+        assert await cache.get("a") == "y"
+        stats = await backend.get_stats()
+        assert stats.total_items == 1
+
+    @pytest.mark.asyncio
+    async def test_eviction_unindexes_tags(self):
+        """LRU eviction removes keys from the tag index."""
+        backend = MemoryCacheBackend(max_size=1)
+        cache = CacheManager(backend=backend)
+        await cache.set("a", 1, tags=["t"])
+        await cache.set("b", 2)
+
+        assert "t" not in backend._tag_index
+
+    @pytest.mark.asyncio
+    async def test_prefix_isolates_tags(self):
+        """Managers with different prefixes do not invalidate each other."""
+        backend = MemoryCacheBackend()
+        first = CacheManager(backend=backend, key_prefix="one:")
+        second = CacheManager(backend=backend, key_prefix="two:")
+        await first.set("k", 1, tags=["shared"])
+        await second.set("k", 2, tags=["shared"])
+
+        assert await first.invalidate_tags("shared") == 1
+        assert await second.get("k") == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidate_tags_disk(self, tmp_path):
+        """Disk backend keeps a tag index in its metadata."""
+        backend = DiskCacheBackend(tmp_path)
+        cache = CacheManager(backend=backend)
+        await cache.set("a", 1, tags=["p"])
+        await cache.set("b", 2)
+
+        assert await cache.invalidate_tags("p") == 1
+        assert await cache.get("a") is None
+        assert await cache.get("b") == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidate_pattern(self):
+        """Pattern invalidation still works without deadlocking."""
+        cache = CacheManager(backend=MemoryCacheBackend())
+        await cache.set("user:1", 1)
+        await cache.set("user:2", 2)
+        await cache.set("other", 3)
+
+        assert await cache.invalidate_pattern("user:*") == 2
+        assert await cache.get("other") == 3
+
+
+class TestExpiry:
+    """Test heap-driven TTL expiry."""
+
+    @pytest.mark.asyncio
+    async def test_cleanup_only_removes_expired(self):
+        """Expired entries are reclaimed and reported in stats."""
+        backend = MemoryCacheBackend()
+        await backend.set("old", "x" * 50, ttl=-1)
+        await backend.set("live", "y", ttl=60)
+        await backend.set("forever", "z")
+
+        assert await backend.cleanup_expired() == 1
+        stats = await backend.get_stats()
+        assert stats.expirations == 1
+        assert stats.reclaimed_bytes > 50
+        assert stats.total_items == 2
+        assert await backend.get("live") == "y"
+
+    @pytest.mark.asyncio
+    async def test_reset_key_skips_stale_heap_record(self):
+        """Re-setting a key with a longer TTL keeps it alive."""
+        backend = MemoryCacheBackend()
+        await backend.set("k", 1, ttl=-1)
+        await backend.set("k", 2, ttl=60)
+
+        assert await backend.cleanup_expired() == 0
+        assert await backend.get("k") == 2
+
+    @pytest.mark.asyncio
+    async def test_cleanup_respects_batch_size(self):
+        """max_items bounds the work done per call."""
+        backend = MemoryCacheBackend()
+        for i in range(5):
+            await backend.set(f"k{i}", i, ttl=-1)
+
+        assert await backend.cleanup_expired(max_items=2) == 2
+        assert await backend.cleanup_expired() == 3
+
+    @pytest.mark.asyncio
+    async def test_reaper_drains_in_background(self):
+        """The reaper removes entries without any reads."""
+        backend = MemoryCacheBackend()
+        await backend.set("k", 1, ttl=0.01)
+        backend.start_reaper(interval=0.02, batch_size=1)
+        try:
+            await asyncio.sleep(0.1)
+        finally:
+            await backend.stop_reaper()
+
+        stats = await backend.get_stats()
+        assert stats.total_items == 0
+        assert stats.expirations == 1
+
+
+class TestCompressionAndSnapshot:
+    """Test compression and snapshot/restore."""
+
+    @pytest.mark.asyncio
+    async def test_memory_compression_counts_compressed_size(self):
+        """Large values are stored compressed and read back intact."""
+        value = {"text": "flow " * 2000}
+        plain = MemoryCacheBackend()
+        packed = MemoryCacheBackend(compress_threshold=1024, codec="zlib")
+        await plain.set("k", value)
+        await packed.set("k", value)
+
+        assert await packed.get("k") == value
+        assert packed._cache["k"].codec == "zlib"
+        assert (await packed.get_stats()).total_size_bytes < (
+            await plain.get_stats()
+        ).total_size_bytes
+
+    @pytest.mark.asyncio
+    async def test_small_values_stay_uncompressed(self):
+        """Values under the threshold are stored as-is."""
+        backend = MemoryCacheBackend(compress_threshold=1024)
+        await backend.set("k", "small")
+        assert backend._cache["k"].codec is None
+
+    @pytest.mark.asyncio
+    async def test_disk_compression_roundtrip(self, tmp_path):
+        """Disk backend compresses files above the threshold."""
+        backend = DiskCacheBackend(tmp_path, compress_threshold=1024, codec="zlib")
+        value = "cadence " * 2000
+        await backend.set("k", value)
+
+        assert backend._metadata["k"]["codec"] == "zlib"
+        assert backend._get_cache_file("k").stat().st_size < len(value)
+        assert await backend.get("k") == value
+
+    def test_unknown_codec_rejected(self):
+        """Invalid codecs raise ConfigurationError."""
+        with pytest.raises(ConfigurationError):
+            MemoryCacheBackend(codec="lz4")
+
+    @pytest.mark.asyncio
+    async def test_snapshot_restore(self, tmp_path):
+        """A snapshot restores live entries, tags and LRU order."""
+        path = tmp_path / "cache.snapshot"
+        source = MemoryCacheBackend(compress_threshold=64)
+        await source.set("a", "x" * 500, ttl=60, tags=["s1"])
+        await source.set("b", {"n": 1})
+        await source.set("gone", 1, ttl=-1)
+
+        assert await source.snapshot(path) == 2
+
+        target = MemoryCacheBackend()
+        assert await target.restore(path) == 2
+        assert await target.get("a") == "x" * 500
+        assert await target.get("b") == {"n": 1}
+        assert list(target._cache) == ["a", "b"]
+        assert await target.invalidate_tags(["s1"]) == 1
+
+    @pytest.mark.asyncio
+    async def test_restore_missing_file(self, tmp_path):
+        """Restoring from a missing snapshot is a no-op."""
+        backend = MemoryCacheBackend()
+        assert await backend.restore(tmp_path / "missing") == 0
@@ -0,0 +1,220 @@
+"""Test suite for the SDK structured logger."""
+
+import io
+import json
+import re
+import threading
+
+from claude_code_sdk.logging import (
+    JSONFormatter,
+    LogLevel,
+    SensitiveDataFilter,
+    StructuredLogger,
+)
+
+
+class TestBackgroundPipeline:
+    """Test the queued logging pipeline."""
+
+    def test_records_written_off_thread(self):
+        """Records are redacted, formatted and written by the worker."""
+        output = io.StringIO()
+        logger = StructuredLogger(
+            output=output, formatter=JSONFormatter(), background=True
+        )
+        try:
+            with logger.context(user_id="u1"):
+                logger.info("login", password="hunter2", note="mail a@b.com")
+            assert logger.flush(timeout=2)
+        finally:
+            logger.close()
+
+        record = json.loads(output.getvalue())
+        assert record["message"] == "login"
+        assert record["password"] == "[REDACTED]"
+        assert record["note"] == "mail [EMAIL]"
+        assert record["context"]["user_id"] == "u1"
+        assert "source" not in record
+        assert logger.get_stats()["log_counts"] == {"INFO": 1}
+
+    def test_error_stack_captured_on_caller_thread(self):
+        """Error records carry the caller's stack, not the worker's."""
+        output = io.StringIO()
+        logger = StructuredLogger(output=output, background=True)
+        try:
+            logger.error("boom")
+            logger.flush(timeout=2)
+        finally:
+            logger.close()
+
+        stack = "".join(json.loads(output.getvalue())["stacktrace"])
+        assert "test_error_stack_captured_on_caller_thread" in stack
+        assert threading.current_thread().name != "claude-sdk-log-writer"
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """A saturated queue drops records and counts them."""
+        output = io.StringIO()
+        logger = StructuredLogger(output=output, background=True, max_queue_size=1)
+        gate = threading.Event()
+        logger._render = lambda record: gate.wait() and "x"
+        try:
+            for _ in range(50):
+                logger.info("flood")
+            assert logger.get_stats()["dropped_records"] > 0
+        finally:
+            gate.set()
+            logger.close()
+
+    def test_loggers_share_one_writer_per_stream(self):
+        """Background loggers on the same stream share a worker thread."""
+        output = io.StringIO()
+        first = StructuredLogger(name="a", output=output, background=True)
+        second = StructuredLogger(name="b", output=output, background=True)
+        writer = first._writer
+        try:
+            assert second._writer is writer
+            first.close()
+            second.info("still running")
+            assert second.flush(timeout=2)
+        finally:
+            second.close()
+
+        assert json.loads(output.getvalue())["logger"] == "b"
+        assert not writer._thread.is_alive()
+
+    def test_mutations_after_logging_are_not_rendered(self):
+        """Mutable fields and context are snapshotted when the record is logged."""
+        output = io.StringIO()
+        logger = StructuredLogger(output=output, background=True)
+        gate = threading.Event()
+        render = logger._render
+        logger._render = lambda record: gate.wait() and render(record)
+        payload = {"items": [1]}
+        try:
+            with logger.context(user_id="u1") as ctx:
+                logger.info("snapshot", payload=payload)
+                payload["items"].append(2)
+                payload["late"] = True
+                ctx.user_id = "u2"
+            gate.set()
+            assert logger.flush(timeout=2)
+        finally:
+            gate.set()
+            logger.close()
+
+        record = json.loads(output.getvalue())
+        assert record["payload"] == {"items": [1]}
+        assert record["context"]["user_id"] == "u1"
+
+
+class TestCallerCapture:
+    """Test opt-in caller capture."""
+
+    def test_caller_points_at_call_site(self):
+        """capture_caller records the function that called the logger."""
+        output = io.StringIO()
+        logger = StructuredLogger(output=output, capture_caller=True, level=LogLevel.DEBUG)
+        logger.debug("here")
+
+        source = json.loads(output.getvalue())["source"]
+        assert source["function"] == "test_caller_points_at_call_site"
+
+
+class TestEventPolicies:
+    """Test per-event sampling and rate limiting."""
+
+    def test_every_n_reports_suppressed_counts(self):
+        """every_n emits one record per N occurrences with counters."""
+        output = io.StringIO()
+        logger = StructuredLogger(output=output)
+        logger.configure_event("checkout", every_n=3)
+        for _ in range(7):
+            logger.info("checkout", event="checkout")
+
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert [r["sampling"] for r in records] == [
+            {"occurrences": 1, "suppressed": 0},
+            {"occurrences": 4, "suppressed": 2},
+            {"occurrences": 7, "suppressed": 2},
+        ]
+        assert logger.get_stats()["events"]["checkout"] == {"occurrences": 7, "suppressed": 4}
+
+    def test_suppressed_records_skip_lazy_payload(self):
+        """Lazy payloads are only evaluated for emitted records."""
+        output = io.StringIO()
+        logger = StructuredLogger(output=output)
+        logger.configure_event("hot", rate_per_second=0.001, burst=1)
+        calls = []
+
+        def payload():
+            calls.append(1)
+            return {"size": 42}
+
+        for _ in range(5):
+            logger.info("hot", event="hot", lazy=payload)
+
+        assert len(calls) == 1
+        record = json.loads(output.getvalue())
+        assert record["size"] == 42
+        assert record["event"] == "hot"
+
+
+class TestSensitiveDataFilter:
+    """Test the single-pass redaction engine."""
+
+    def test_single_pass_matches_sequential_patterns(self):
+        """The combined alternation redacts like one sub per pattern."""
+        text = (
+            "mail a@b.com card 4111 1111 1111 1111 ssn 123-45-6789 "
+            "Password=abc API_KEY: 'zz' plain"
+        )
+        expected = text
+        for pattern, replacement in SensitiveDataFilter.DEFAULT_PATTERNS:
+            expected = re.sub(pattern, replacement, expected)
+
+        data_filter = SensitiveDataFilter()
+        assert data_filter.filter(text) == expected
+        assert data_filter.filter(text) == expected  # memoized
+
+    def test_safe_keys_and_non_strings_pass_through(self):
+        """Safe keys and scalars are untouched; nested values are filtered."""
+        data_filter = SensitiveDataFilter()
+        filtered = data_filter.filter_dict({
+            "event": "a@b.com",
+            "auth_header": 42,
+            "count": 3,
+            "items": ["x@y.io", {"ssn": "123-45-6789"}],
+        })
+        assert filtered == {
+            "event": "a@b.com",
+            "auth_header": "[REDACTED]",
+            "count": 3,
+            "items": ["[EMAIL]", {"ssn": "[SSN]"}],
+        }
+
+    def test_custom_patterns_without_triggers(self):
+        """Patterns with backreferences fall back to sequential subs."""
+        data_filter = SensitiveDataFilter(patterns=[(r"(\w)\1{3}", "[RUN]")])
+        assert data_filter.filter("aaaa bbb") == "[RUN] bbb"
+
+
+class TestOperationPercentiles:
+    """Test timer aggregation."""
+
+    def test_timer_durations_summarized_per_operation(self):
+        """Completed timers feed a per-operation sketch; errors are counted."""
+        logger = StructuredLogger(output=io.StringIO())
+        for _ in range(3):
+            with logger.timer("query"):
+                pass
+        try:
+            with logger.timer("query"):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+
+        stats = logger.get_stats()
+        assert stats["active_metrics"] == 0
+        assert stats["operations"]["query"]["count"] == 4
+        assert stats["operations"]["query"]["errors"] == 1
+        assert stats["operations"]["query"]["p99"] is not None
@@ -0,0 +1,85 @@
+"""Test suite for the streaming quantile sketches."""
+
+import random
+
+import pytest
+
+from claude_code_sdk import MetricsCollector
+from claude_code_sdk.quantiles import QuantileSketch, WindowedQuantileSketch
+
+
+class TestQuantileSketch:
+    """Test the fixed-memory quantile sketch."""
+
+    def test_quantiles_within_relative_accuracy(self):
+        """Reported percentiles stay within the configured relative error."""
+        rng = random.Random(7)
+        values = [rng.lognormvariate(0, 1.5) for _ in range(50000)]
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.add(value)
+
+        values.sort()
+        for q in (0.5, 0.9, 0.99, 0.999):
+            exact = values[int(q * (len(values) - 1))]
+            assert sketch.quantile(q) == pytest.approx(exact, rel=0.02)
+        assert sketch.count == len(values)
+        assert sketch.mean == pytest.approx(sum(values) / len(values))
+
+    def test_bucket_cap_bounds_memory(self):
+        """Collapsing keeps the bucket count fixed and the tail accurate."""
+        sketch = QuantileSketch(max_buckets=64)
+        for i in range(1, 100001):
+            sketch.add(i * 0.001)
+
+        assert len(sketch._bins) <= 64
+        assert sketch.quantile(0.99) == pytest.approx(99.0, rel=0.02)
+
+    def test_summary_labels(self):
+        """Summaries use pNN labels and None when empty."""
+        assert QuantileSketch().summary()["p999"] is None
+        sketch = QuantileSketch()
+        sketch.add(0.0)
+        sketch.add(2.0)
+        summary = sketch.summary()
+        assert summary["min"] == 0.0
+        assert summary["p50"] == 0.0
+        assert summary["max"] == 2.0
+
+
+class TestWindowedQuantileSketch:
+    """Test the sliding-window sketch."""
+
+    def test_old_slices_expire(self):
+        """Samples leave the window once their slice is older than it."""
+        now = [0.0]
+        sketch = WindowedQuantileSketch(window_seconds=60, slices=6, clock=lambda: now[0])
+        for _ in range(100):
+            sketch.add(1.0)
+        now[0] = 30.0
+        sketch.add(100.0)
+        assert sketch.summary()["count"] == 101
+
+        now[0] = 65.0
+        summary = sketch.summary()
+        assert summary["count"] == 1
+        assert summary["p50"] == pytest.approx(100.0, rel=0.02)
+
+        now[0] = 1000.0
+        assert sketch.summary()["count"] == 0
+
+
+class TestMetricsCollector:
+    """Test MetricsCollector on top of the sketches."""
+
+    def test_duration_percentiles(self):
+        """Durations are summarized without keeping every sample."""
+        collector = MetricsCollector()
+        for i in range(1, 1001):
+            collector.record_request(success=i % 10 != 0, duration=i / 1000)
+
+        stats = collector.get_stats()
+        assert stats["failed_requests"] == 100
+        assert stats["average_duration_seconds"] == pytest.approx(0.5005)
+        assert stats["duration_seconds"]["p90"] == pytest.approx(0.9, rel=0.02)
+        assert stats["recent_duration_seconds"]["count"] == 1000
@@ -0,0 +1,295 @@
+"""Test suite for the SDK rate limiter."""
+
+import asyncio
+import time
+
+import pytest
+
+from claude_code_sdk import RateLimitError, ResultMessage
+from claude_code_sdk.rate_limiter import (
+    PriorityScheduler,
+    RateLimitConfig,
+    RateLimiter,
+    SlidingWindowLimiter,
+    TokenBucket,
+    UsageLimitConfig,
+    UsageRateLimiter,
+)
+
+
+class TestTokenBucket:
+    """Test the FIFO token bucket."""
+
+    @pytest.mark.asyncio
+    async def test_immediate_acquire(self):
+        """Tokens are granted without waiting while available."""
+        bucket = TokenBucket(capacity=2, refill_rate=1)
+        assert await bucket.acquire()
+        assert await bucket.acquire()
+        assert not await bucket.acquire(wait=False)
+
+    @pytest.mark.asyncio
+    async def test_waiters_served_in_fifo_order(self):
+        """Waiters are woken in arrival order at the refill time."""
+        bucket = TokenBucket(capacity=1, refill_rate=10)
+        await bucket.acquire()
+        order = []
+
+        async def worker(n):
+            await bucket.acquire()
+            order.append(n)
+
+        tasks = [asyncio.create_task(worker(n)) for n in range(4)]
+        await asyncio.sleep(0)
+        assert bucket.queue_depth == 4
+
+        started = time.monotonic()
+        await asyncio.gather(*tasks)
+        assert order == [0, 1, 2, 3]
+        # Four refills at 10/s take about 400ms, with no polling slack
+        assert time.monotonic() - started < 1.0
+        assert bucket.get_stats()["max_queue_depth"] == 4
+
+    @pytest.mark.asyncio
+    async def test_non_waiting_caller_cannot_jump_queue(self):
+        """wait=False fails while others are queued."""
+        bucket = TokenBucket(capacity=1, refill_rate=20)
+        await bucket.acquire()
+        waiter = asyncio.create_task(bucket.acquire())
+        await asyncio.sleep(0)
+        bucket.tokens = 1.0  # Capacity arrives before the waiter's timer fires
+        assert not await bucket.acquire(wait=False)
+        assert await waiter
+
+    @pytest.mark.asyncio
+    async def test_timeout_and_cancel_leave_queue(self):
+        """Timed-out and cancelled waiters are removed from the queue."""
+        bucket = TokenBucket(capacity=1, refill_rate=0.1)
+        await bucket.acquire()
+        assert not await bucket.acquire(timeout=0.01)
+
+        task = asyncio.create_task(bucket.acquire())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert bucket.queue_depth == 0
+
+    @pytest.mark.asyncio
+    async def test_over_capacity_rejected(self):
+        """Requests larger than the bucket fail fast."""
+        bucket = TokenBucket(capacity=2, refill_rate=1)
+        with pytest.raises(RateLimitError):
+            await bucket.acquire(3)
+
+
+class TestSlidingWindow:
+    """Test the sliding window limiter."""
+
+    @pytest.mark.asyncio
+    async def test_window_waits_for_oldest(self):
+        """A full window admits the next caller once the oldest entry expires."""
+        window = SlidingWindowLimiter(window_size=0.05, max_requests=1)
+        assert await window.check_limit()
+        assert not await window.check_limit()
+        assert await window.acquire(timeout=1)
+        assert window.current_rate == pytest.approx(1 / 0.05)
+
+
+class TestRateLimiter:
+    """Test the combined limiter."""
+
+    @pytest.mark.asyncio
+    async def test_limit_waits_without_polling(self):
+        """limit(wait=True) blocks until tokens are available."""
+        limiter = RateLimiter(RateLimitConfig(max_tokens=1, refill_rate=50))
+        async with limiter.limit():
+            pass
+        async with limiter.limit():
+            pass
+        stats = limiter.get_stats()
+        assert stats["successful_requests"] == 2
+        assert stats["waiters"] == 0
+        assert stats["token_bucket"]["waited_total"] == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_wait_returns_window_slot(self):
+        """A caller cancelled while waiting for tokens frees its window slot."""
+        limiter = RateLimiter(RateLimitConfig(
+            max_tokens=1, refill_rate=0.01, max_requests_per_window=2
+        ))
+        async with limiter.limit():
+            pass
+
+        waiter = asyncio.create_task(limiter._acquire_waiting(1))
+        await asyncio.sleep(0.01)
+        assert len(limiter.sliding_window.requests) == 2
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert len(limiter.sliding_window.requests) == 1
+
+    @pytest.mark.asyncio
+    async def test_rejected_acquire_returns_window_slot(self):
+        """A non-waiting acquire refused by the bucket keeps the window intact."""
+        limiter = RateLimiter(RateLimitConfig(
+            max_tokens=1, refill_rate=0.01, max_requests_per_window=5
+        ))
+        assert await limiter.acquire()
+        assert not await limiter.acquire()
+        assert len(limiter.sliding_window.requests) == 1
+
+
+class TestPriorityScheduler:
+    """Test priority scheduling with lanes and aging."""
+
+    async def _drain(self, scheduler, requests):
+        """Queue requests behind an empty bucket and record grant order."""
+        order = []
+
+        async def worker(name, priority, lane):
+            await scheduler.acquire(priority=priority, lane=lane)
+            order.append(name)
+
+        tasks = []
+        for name, priority, lane in requests:
+            tasks.append(asyncio.create_task(worker(name, priority, lane)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return order
+
+    @pytest.mark.asyncio
+    async def test_priority_order_within_lane(self):
+        """Lower priority values are served first."""
+        bucket = TokenBucket(capacity=1, refill_rate=200)
+        scheduler = PriorityScheduler(bucket, aging_seconds=60)
+        await bucket.acquire()
+
+        order = await self._drain(scheduler, [
+            ("low", 2, "interactive"),
+            ("high", 0, "interactive"),
+            ("mid", 1, "interactive"),
+        ])
+        assert order == ["high", "mid", "low"]
+
+    @pytest.mark.asyncio
+    async def test_lane_weights_share_capacity(self):
+        """Interactive gets its weighted share while batch still progresses."""
+        bucket = TokenBucket(capacity=1, refill_rate=500)
+        scheduler = PriorityScheduler(
+            bucket, lane_weights={"interactive": 3.0, "batch": 1.0}
+        )
+        await bucket.acquire()
+
+        requests = [(f"b{i}", 0, "batch") for i in range(4)]
+        requests += [(f"i{i}", 0, "interactive") for i in range(6)]
+        order = await self._drain(scheduler, requests)
+
+        first_four = order[:4]
+        assert sum(name.startswith("i") for name in first_four) == 3
+        assert any(name.startswith("b") for name in first_four)
+        assert scheduler.get_stats()["lanes"]["batch"]["granted"] == 4
+
+    @pytest.mark.asyncio
+    async def test_aging_prevents_starvation(self):
+        """A long-waiting low-priority request overtakes fresh urgent ones."""
+        bucket = TokenBucket(capacity=1, refill_rate=0.001)
+        scheduler = PriorityScheduler(bucket, aging_seconds=0.01)
+        await bucket.acquire()
+
+        old = asyncio.create_task(scheduler.acquire(priority=2))
+        await asyncio.sleep(0.05)
+        fresh = asyncio.create_task(scheduler.acquire(priority=0))
+        await asyncio.sleep(0)
+
+        bucket.adjust(1)
+        scheduler._dispatch()
+        assert await asyncio.wait_for(old, 1)
+        assert not fresh.done()
+        fresh.cancel()
+
+    @pytest.mark.asyncio
+    async def test_rate_limiter_uses_scheduler(self):
+        """RateLimiter.limit routes through the scheduler when enabled."""
+        limiter = RateLimiter(RateLimitConfig(
+            max_tokens=1, refill_rate=100, enable_priority=True
+        ))
+        async with limiter.limit(lane="batch"):
+            pass
+        async with limiter.limit(lane="batch", priority=1):
+            pass
+        stats = limiter.get_stats()
+        assert stats["scheduler"]["lanes"]["batch"]["granted"] == 1
+        assert stats["queue_size"] == 0
+
+
+class TestUsageRateLimiter:
+    """Test LLM usage budgets."""
+
+    def _result(self, input_tokens, output_tokens, cost):
+        return ResultMessage(
+            subtype="success",
+            duration_ms=10,
+            duration_api_ms=8,
+            is_error=False,
+            num_turns=1,
+            session_id="s1",
+            total_cost_usd=cost,
+            usage={"input_tokens": input_tokens, "output_tokens": output_tokens},
+        )
+
+    @pytest.mark.asyncio
+    async def test_reconcile_refunds_overestimate(self):
+        """Unused reserved budget is returned to the buckets."""
+        limiter = UsageRateLimiter(UsageLimitConfig(
+            input_tokens_per_minute=10000, output_tokens_per_minute=5000
+        ))
+        reservation = await limiter.reserve("p1", input_tokens=4000, output_tokens=2000)
+        limiter.reconcile_result(reservation, self._result(1000, 500, 0.01))
+
+        available = limiter.get_key_stats("p1")["available"]
+        assert available["input_tokens"] == pytest.approx(9000, abs=5)
+        assert available["output_tokens"] == pytest.approx(4500, abs=5)
+
+    @pytest.mark.asyncio
+    async def test_budgets_are_per_key_and_reject_when_exhausted(self):
+        """One project's spend does not block another."""
+        limiter = UsageRateLimiter(UsageLimitConfig(cost_usd_per_hour=1.0))
+        reservation = await limiter.reserve("p1", cost_usd=0.5)
+        limiter.reconcile(reservation, total_cost_usd=1.0)
+
+        with pytest.raises(RateLimitError) as exc_info:
+            await limiter.reserve("p1", cost_usd=0.1, wait=False)
+        assert exc_info.value.limit_type == "cost_usd"
+        assert exc_info.value.retry_after_seconds > 0
+
+        await limiter.reserve("p2", cost_usd=0.1, wait=False)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_reserve_refunds_earlier_buckets(self):
+        """Cancelling a reserve blocked on one bucket refunds the others."""
+        limiter = UsageRateLimiter(UsageLimitConfig(
+            input_tokens_per_minute=1000, output_tokens_per_minute=100
+        ))
+        await limiter.reserve("k", input_tokens=100, output_tokens=100)
+
+        task = asyncio.create_task(limiter.reserve("k", input_tokens=500, output_tokens=100))
+        await asyncio.sleep(0.01)
+        assert not task.done()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        available = limiter.get_key_stats("k")["available"]
+        assert available["input_tokens"] == pytest.approx(900, abs=5)
+
+    @pytest.mark.asyncio
+    async def test_estimates_follow_actual_usage(self):
+        """Later reservations use learned usage instead of defaults."""
+        config = UsageLimitConfig(input_tokens_per_minute=100000, estimate_headroom=1.0)
+        limiter = UsageRateLimiter(config)
+        async with limiter.limit("p1") as reservation:
+            assert reservation.input_tokens == config.default_input_tokens
+            limiter.reconcile_result(reservation, self._result(200, 50, 0.001))
+
+        assert limiter.estimate("p1")["input_tokens"] == 200
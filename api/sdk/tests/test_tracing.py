@@ -0,0 +1,109 @@
+"""Test suite for tracing spans and exporters."""
+
+import asyncio
+import json
+
+import pytest
+
+from claude_code_sdk.tracing import (
+    NOOP_SPAN,
+    OTLPJsonFileExporter,
+    RingBufferExporter,
+    Tracer,
+    configure_tracing,
+    current_span,
+    get_tracer,
+    traced,
+)
+
+
+@pytest.fixture
+def ring():
+    """Enable the global tracer with a ring buffer for one test."""
+    exporter = RingBufferExporter()
+    configure_tracing([exporter])
+    yield exporter
+    configure_tracing([])
+
+
+class TestSpans:
+    """Test span creation and propagation."""
+
+    def test_disabled_tracer_is_noop(self):
+        """Without exporters no span is created or made current."""
+        tracer = Tracer()
+        with tracer.span("root") as span:
+            assert span is NOOP_SPAN
+            assert current_span() is None
+
+    @pytest.mark.asyncio
+    async def test_children_follow_context_across_tasks(self, ring):
+        """Spans opened in child tasks and decorated coroutines join the trace."""
+
+        @traced("child.decorated")
+        async def decorated():
+            return current_span().name
+
+        async def in_task():
+            with get_tracer().span("child.task"):
+                await asyncio.sleep(0)
+
+        with get_tracer().span("root") as root:
+            assert await decorated() == "child.decorated"
+            await asyncio.create_task(in_task())
+            tool = get_tracer().start_span("tool.Read", parent=root)
+            tool.end(error="tool_error")
+
+        spans = {s["name"]: s for s in ring.recent()}
+        assert set(spans) == {"root", "child.decorated", "child.task", "tool.Read"}
+        for name in ("child.decorated", "child.task", "tool.Read"):
+            assert spans[name]["trace_id"] == root.trace_id
+            assert spans[name]["parent_id"] == root.span_id
+        assert spans["tool.Read"]["status"] == "error"
+        assert ring.traces()[0]["spans"][0]["name"] == "root"
+
+    def test_exception_marks_span_error(self, ring):
+        """Exceptions escaping a span are recorded and re-raised."""
+        with pytest.raises(ValueError):
+            with get_tracer().span("failing"):
+                raise ValueError("boom")
+
+        span = ring.recent()[0]
+        assert span["status"] == "error"
+        assert span["events"][0]["name"] == "exception"
+
+    def test_unsampled_trace_stays_unsampled(self):
+        """Sampling is decided at the root and inherited by children."""
+        exporter = RingBufferExporter()
+        configure_tracing([exporter], sample_rate=0.0)
+        try:
+            with get_tracer().span("root"):
+                with get_tracer().span("child") as child:
+                    assert child is NOOP_SPAN
+        finally:
+            configure_tracing([])
+        assert len(exporter) == 0
+
+
+class TestOTLPJsonFileExporter:
+    """Test the offline OTLP/JSON exporter."""
+
+    def test_writes_otlp_batch_when_root_ends(self, tmp_path):
+        """A finished trace is written as one ExportTraceServiceRequest line."""
+        path = tmp_path / "traces.jsonl"
+        configure_tracing([OTLPJsonFileExporter(path)], service_name="api")
+        try:
+            with get_tracer().span("root", session_id="s1"):
+                with get_tracer().span("child", attempt=2):
+                    pass
+        finally:
+            configure_tracing([])
+
+        lines = path.read_text().splitlines()
+        assert len(lines) == 1
+        scope_spans = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]
+        child, root = scope_spans["spans"]
+        assert child["parentSpanId"] == root["spanId"]
+        assert root["status"] == {"code": 1}
+        assert {"key": "attempt", "value": {"intValue": "2"}} in child["attributes"]
+        assert int(root["endTimeUnixNano"]) >= int(root["startTimeUnixNano"])
@@ -3,12 +3,15 @@ Servidor FastAPI - Proxy REST para Claude Code SDK
 Baseado no projeto cc-sdk-chat funcional
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
 import asyncio
+import hmac
 import json
+import math
 import uuid
 import os
 import sys
@@ -25,7 +28,20 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'sdk'))
 
 # Importar handler e session manager
 from core.claude_handler import ClaudeHandler, SessionConfig
+from core.adaptive_limiter import ConcurrencyLimitExceeded
 from core.session_manager import ClaudeCodeSessionManager
+from monitoring import metrics
+from monitoring.loop_monitor import EventLoopMonitor
+from monitoring.stability_monitor import (
+    CircuitBreakerOpenException,
+    SlidingWindowConfig,
+    stability_monitor,
+)
+from monitoring.profiler import ProfilerBusy, cpu_profiler, memory_profiler, render_profile
+from services.flow_access import FlowAccessClient, FlowAccessError
+from utils import logging_config
+from middleware.tracing_middleware import TracingMiddleware
+from claude_code_sdk.tracing import RingBufferExporter, configure_tracing_from_env
 
 # Inicializar FastAPI
 app = FastAPI(
@@ -43,10 +59,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Tracing: CLAUDE_SDK_TRACE_FILE (OTLP/JSON) e/ou CLAUDE_SDK_TRACE_BUFFER (admin)
+tracer = configure_tracing_from_env()
+app.add_middleware(TracingMiddleware)
+
 # Inicializar handlers
 claude_handler = ClaudeHandler()
 session_manager = ClaudeCodeSessionManager()
 
+# Circuit breaker das chamadas REST ao access node da Flow
+flow_breaker = stability_monitor.register_sliding_window_breaker(
+    "flow_rest",
+    SlidingWindowConfig(window_seconds=60.0, minimum_calls=5, slow_call_duration=5.0, open_seconds=20.0)
+)
+# Leituras REST na Flow (FLOW_HEDGING=1 liga hedging; FLOW_ACCESS_NODES lista nós alternativos)
+flow_access = FlowAccessClient.from_env("testnet")
+
+metrics.register_handler_gauges(claude_handler)
+metrics.register_circuit_breaker_gauges(stability_monitor)
+
+# Watchdog do event loop (EVENT_LOOP_DEBUG=1 liga também o modo debug do asyncio)
+loop_monitor = EventLoopMonitor(
+    block_threshold=float(os.environ.get("EVENT_LOOP_BLOCK_THRESHOLD_MS", "100")) / 1000,
+    asyncio_debug=os.environ.get("EVENT_LOOP_DEBUG") == "1"
+)
+
+
+# Health checks (executados concorrentemente e em cache pelo StabilityMonitor)
+async def _check_event_loop() -> Dict[str, Any]:
+    """Falha se o loop ficou atrasado mais de 1s na última medição."""
+    if loop_monitor.running and loop_monitor.last_lag > 1.0:
+        raise RuntimeError(f"Event loop atrasado {loop_monitor.last_lag * 1000:.0f}ms")
+    return {"last_lag_ms": round(loop_monitor.last_lag * 1000, 3)}
+
+
+async def _check_concurrency() -> Dict[str, Any]:
+    """Falha quando a fila do limite adaptativo está cheia."""
+    limiter = claude_handler.concurrency_limiter
+    if limiter.queue_depth >= limiter.config.max_queue_size:
+        raise RuntimeError(f"Fila de concorrência cheia ({limiter.queue_depth})")
+    return {"in_flight": limiter.in_flight, "limit": limiter.limit, "queue_depth": limiter.queue_depth}
+
+
+stability_monitor.register_health_check("event_loop", _check_event_loop, timeout=1.0)
+stability_monitor.register_health_check("concurrency", _check_concurrency, timeout=1.0)
+stability_monitor.register_health_check(
+    "connection_pool", claude_handler.get_pool_status, timeout=2.0, critical=False
+)
+
 # Inicializar FNS
 # fns_service = FindNameService()
 # quiz_integration = QuizChatIntegration()
@@ -73,16 +133,57 @@ async def health_check():
         "sessions_active": len(session_manager.get_active_sessions())
     }
 
+@app.get("/api/health/live")
+async def liveness_probe():
+    """Liveness: o processo responde; não executa nenhum check."""
+    return stability_monitor.liveness()
+
+
+@app.get("/api/health/ready")
+async def readiness_probe():
+    """Readiness: checks críticos saudáveis (cache); 503 quando não está pronto."""
+    readiness = await stability_monitor.readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+
+@app.get("/api/health/checks")
+async def health_checks_report(max_age: Optional[float] = None):
+    """Resultado detalhado dos health checks (``max_age=0`` força nova rodada)."""
+    return await stability_monitor.run_health_checks(max_age=max_age)
+
+
 # Endpoint principal de chat com SSE
 @app.post("/api/chat")
 async def chat_stream(chat_message: ChatMessage):
     """
     Endpoint principal para chat com Claude via SSE.
     Usa o ClaudeHandler para processar mensagens.
+    
+    A vaga no limite adaptativo de concorrência é obtida antes de abrir o
+    stream; sem capacidade, responde 503 com Retry-After. Com o circuit
+    breaker do Claude aberto, o 503 é imediato.
     """
+    try:
+        claude_handler.circuit_breaker.check()
+    except CircuitBreakerOpenException as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after or 1))}
+        )
+
+    try:
+        slot = await claude_handler.concurrency_limiter.acquire()
+    except ConcurrencyLimitExceeded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
 
     async def generate_sse() -> AsyncGenerator[str, None]:
         """Gera eventos SSE para streaming."""
+        frames = metrics.SSEFrameRecorder()
 
         try:
             # Criar ou recuperar sessão
@@ -97,9 +198,10 @@ async def chat_stream(chat_message: ChatMessage):
                 await claude_handler.create_session(session_id, session_config)
 
                 # Notificar criação de sessão
-                yield f"data: {json.dumps({'type': 'session_created', 'session_id': session_id})}\n\n"
+                yield frames.record(f"data: {json.dumps({'type': 'session_created', 'session_id': session_id})}\n\n")
             else:
                 session_id = chat_message.session_id
+            logging_config.session_id.set(session_id)
 
             # Verificar se é comando FNS antes de enviar para Claude
             # fns_command = fns_service.parse_command(chat_message.message)
@@ -120,15 +222,17 @@ async def chat_stream(chat_message: ChatMessage):
             # else:
             # Processar mensagem normal com Claude Handler
             if True:
-                async for chunk in claude_handler.send_message(session_id, chat_message.message):
+                async for chunk in claude_handler.send_message(
+                    session_id, chat_message.message, slot=slot
+                ):
                     # Enviar chunk via SSE
-                    yield f"data: {json.dumps(chunk)}\n\n"
+                    yield frames.record(f"data: {json.dumps(chunk)}\n\n")
 
                     # Pequena pausa para streaming suave
                     await asyncio.sleep(0.01)
 
             # Evento final
-            yield f"data: {json.dumps({'type': 'done', 'session_id': session_id})}\n\n"
+            yield frames.record(f"data: {json.dumps({'type': 'done', 'session_id': session_id})}\n\n")
 
         except Exception as e:
             # Enviar erro via SSE
@@ -137,7 +241,9 @@ async def chat_stream(chat_message: ChatMessage):
                 "error": str(e),
                 "timestamp": datetime.now().isoformat()
             }
-            yield f"data: {json.dumps(error_data)}\n\n"
+            yield frames.record(f"data: {json.dumps(error_data)}\n\n")
+        finally:
+            slot.release()
 
     # Retornar streaming response
     return StreamingResponse(
@@ -147,7 +253,9 @@ async def chat_stream(chat_message: ChatMessage):
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "X-Accel-Buffering": "no"
-        }
+        },
+        # Garante a devolução da vaga mesmo se o gerador nunca iniciar
+        background=BackgroundTask(slot.release)
     )
 
 # Criar nova sessão
@@ -244,6 +352,7 @@ async def sdk_status():
         "info": sdk_info,
         "handler_status": "active" if claude_handler else "inactive",
         "sessions_active": len(session_manager.get_active_sessions()),
+        "concurrency": claude_handler.concurrency_limiter.get_status(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -257,43 +366,66 @@ async def get_flow_balance(address: str):
     if address.startswith('0x'):
         address = address[2:]
 
+    # Circuito aberto: 503 imediato em vez de esperar o timeout do access node
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"https://rest-testnet.onflow.org/v1/accounts/{address}"
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    balance = int(data.get('balance', 0))
-                    flow_balance = balance / 100_000_000
-
-                    # Formatar para mostrar 101,000 sem decimais desnecessários
-                    if flow_balance >= 1000:
-                        balance_formatted = f"{flow_balance:,.0f}"
-                    else:
-                        balance_formatted = f"{flow_balance:.4f} FLOW"
-
-                    return {
-                        "address": f"0x{address}",
-                        "balance": flow_balance,
-                        "balance_formatted": balance_formatted,
-                        "network": "testnet",
-                        "timestamp": datetime.now().isoformat()
-                    }
-                else:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Account not found on testnet: {address}"
-                    )
-    except aiohttp.ClientError as e:
+        started = flow_breaker.acquire()
+    except CircuitBreakerOpenException as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Flow testnet indisponível: {e}",
+            headers={"Retry-After": str(math.ceil(e.retry_after or 1))}
+        )
+
+    try:
+        data = await flow_access.get_account(address)
+    except FlowAccessError as e:
+        # 5xx e 429 contam como falha do access node
+        flow_breaker.record(started, failed=e.retryable)
+        if e.retryable:
+            raise HTTPException(status_code=503, detail=f"Flow testnet indisponível: {str(e)}")
+        raise HTTPException(status_code=404, detail=f"Account not found on testnet: {address}")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        flow_breaker.record(started, failed=True)
         raise HTTPException(
             status_code=503,
             detail=f"Failed to connect to Flow testnet: {str(e)}"
         )
     except Exception as e:
+        flow_breaker.record(started, failed=True)
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching balance: {str(e)}"
         )
+    except BaseException:
+        # Cliente desconectou: devolve a reserva sem contar resultado
+        flow_breaker.release(started)
+        raise
+
+    # 404 é resposta válida
+    flow_breaker.record(started, failed=False)
+
+    if data is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Account not found on testnet: {address}"
+        )
+
+    balance = int(data.get('balance', 0))
+    flow_balance = balance / 100_000_000
+
+    # Formatar para mostrar 101,000 sem decimais desnecessários
+    if flow_balance >= 1000:
+        balance_formatted = f"{flow_balance:,.0f}"
+    else:
+        balance_formatted = f"{flow_balance:.4f} FLOW"
+
+    return {
+        "address": f"0x{address}",
+        "balance": flow_balance,
+        "balance_formatted": balance_formatted,
+        "network": "testnet",
+        "timestamp": datetime.now().isoformat()
+    }
 
 # Endpoint simplificado para o saldo padrão
 @app.get("/api/flow/balance")
@@ -367,10 +499,131 @@ async def get_default_flow_balance():
 #     except Exception as e:
 #         raise HTTPException(status_code=500, detail=str(e))
 
+# Endpoints administrativos
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Exige X-Admin-Token igual a ADMIN_TOKEN.
+
+    Sem ADMIN_TOKEN configurado os endpoints de admin ficam desligados (404),
+    já que expõem traces, pilhas e controle do profiler.
+    """
+    expected = os.environ.get("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Admin token inválido")
+
+
+@app.get("/api/admin/traces", dependencies=[Depends(require_admin)])
+async def recent_traces(limit: int = 20, trace_id: Optional[str] = None):
+    """Traces recentes do ring buffer (CLAUDE_SDK_TRACE_BUFFER)."""
+    ring = next((e for e in tracer.exporters if isinstance(e, RingBufferExporter)), None)
+    if ring is None:
+        raise HTTPException(status_code=404, detail="Ring buffer de traces não configurado")
+    if trace_id:
+        return {"trace_id": trace_id, "spans": ring.recent(limit=1000, trace_id=trace_id)}
+    return {"traces": ring.traces(limit=limit), "buffered_spans": len(ring)}
+
+
+@app.get("/api/admin/event-loop", dependencies=[Depends(require_admin)])
+async def event_loop_stats(top: int = 10):
+    """Lag do event loop, bloqueios detectados e os locais mais frequentes."""
+    return loop_monitor.get_stats(top=top)
+
+
+@app.get("/api/admin/resources", dependencies=[Depends(require_admin)])
+async def cli_resources():
+    """RSS, CPU e fds dos subprocessos do CLI por sessão, agregados e limites de reciclagem."""
+    return claude_handler.get_resource_usage()
+
+
+@app.get("/api/admin/flow-access", dependencies=[Depends(require_admin)])
+async def flow_access_stats():
+    """Endpoints do access node e hedging por operação (enviados, vencidos, orçamento)."""
+    return flow_access.get_stats()
+
+
+@app.post("/api/admin/profile/cpu/start", dependencies=[Depends(require_admin)])
+async def start_cpu_profile(seconds: float = 30, interval_ms: float = 5, mode: str = "cpu"):
+    """Inicia o profiler de amostragem; para sozinho após ``seconds``."""
+    try:
+        return cpu_profiler.start(seconds=seconds, interval=interval_ms / 1000, mode=mode)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/api/admin/profile/cpu/stop", dependencies=[Depends(require_admin)])
+async def stop_cpu_profile(format: str = "collapsed", group_by: str = "none"):
+    """
+    Encerra o profiling (ou usa o último concluído) e devolve o arquivo.
+
+    ``format``: ``collapsed`` (flamegraph.pl/speedscope) ou ``speedscope``;
+    ``group_by``: ``none``, ``route`` ou ``session``.
+    """
+    profile = cpu_profiler.stop() or cpu_profiler.last_profile
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Nenhum profiling de CPU executado")
+    try:
+        body, media_type = render_profile(profile, format, group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    extension = "txt" if format == "collapsed" else "speedscope.json"
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="cpu-profile.{extension}"',
+            "X-Profile-Samples": str(profile.sample_count),
+        },
+    )
+
+
+@app.get("/api/admin/profile/cpu", dependencies=[Depends(require_admin)])
+async def cpu_profile_status():
+    """Estado do profiler de CPU e resumo do último perfil (amostras por rota/sessão)."""
+    last = cpu_profiler.last_profile
+    return {"active": cpu_profiler.active, "last_profile": last.summary() if last else None}
+
+
+@app.post("/api/admin/profile/memory/start", dependencies=[Depends(require_admin)])
+async def start_memory_profile(frames: int = 25):
+    """Liga o tracemalloc guardando até ``frames`` frames por alocação."""
+    return memory_profiler.start(frames=frames)
+
+
+@app.post("/api/admin/profile/memory/snapshot", dependencies=[Depends(require_admin)])
+async def memory_snapshot(top: int = 25, key_type: str = "lineno", diff: bool = True):
+    """Snapshot do tracemalloc com os maiores pontos de alocação e o diff desde o anterior."""
+    try:
+        return await asyncio.to_thread(memory_profiler.snapshot, top, key_type, diff)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/api/admin/profile/memory/stop", dependencies=[Depends(require_admin)])
+async def stop_memory_profile():
+    """Desliga o tracemalloc e descarta a linha de base."""
+    return memory_profiler.stop()
+
+
+# Métricas Prometheus
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Exposição das métricas do pipeline de chat no formato do Prometheus."""
+    body, content_type = metrics.render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 # Inicialização
 @app.on_event("startup")
 async def startup_event():
     """Inicialização do servidor."""
+    loop_monitor.start()
+    stability_monitor.start_background_refresh()
     print("=" * 60)
     print("🚀 PROXY REST - Claude Code SDK")
     print("=" * 60)
@@ -378,6 +631,7 @@ async def startup_event():
     print("🔌 Endpoint principal: POST /api/chat")
     print("📊 Health check: GET /api/health")
     print("🔍 SDK status: GET /api/sdk-status")
+    print("📈 Métricas: GET /metrics")
     # print("🔍 FNS integrado: resolve, check, register, quiz")
     print("=" * 60)
 
@@ -387,6 +641,11 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Desligamento do servidor."""
+    tracer.shutdown()
+    loop_monitor.stop()
+    await stability_monitor.stop_background_refresh()
+    cpu_profiler.stop()
+    await flow_access.close()
     # Fechar todas as sessões
     for session_id in list(session_manager.get_active_sessions().keys()):
         try:
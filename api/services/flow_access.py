@@ -0,0 +1,146 @@
+"""
+Leituras na Flow via REST do access node, com hedging opcional.
+
+Só expõe operações idempotentes (conta, último bloco, scripts): são as
+únicas em que é seguro enviar a mesma requisição duas vezes. A tentativa
+primária vai para o primeiro endpoint e o hedge para o seguinte (rodízio),
+de modo que um access node lento não atrasa as duas.
+"""
+
+import base64
+import json
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.hedging import HedgedExecutor, HedgePolicy
+
+NETWORK_ENDPOINTS = {
+    "mainnet": "https://rest-mainnet.onflow.org",
+    "testnet": "https://rest-testnet.onflow.org",
+    "emulator": "http://localhost:8888",
+}
+
+
+class FlowAccessError(Exception):
+    """Resposta de erro (4xx/5xx, exceto 404) do access node."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+    @property
+    def retryable(self) -> bool:
+        """5xx e 429 indicam problema do access node, não da requisição."""
+        return self.status >= 500 or self.status == 429
+
+
+class FlowAccessClient:
+    """
+    Cliente assíncrono da REST API da Flow.
+
+    Exemplo:
+        access = FlowAccessClient("testnet", hedge_policy=HedgePolicy(enabled=True))
+        account = await access.get_account("36395f9dde50ea27")
+        await access.close()
+    """
+
+    def __init__(
+        self,
+        network: str = "testnet",
+        endpoints: Optional[List[str]] = None,
+        hedge_policy: Optional[HedgePolicy] = None,
+        timeout: float = 10.0
+    ):
+        self.network = network
+        self.endpoints = [e.rstrip("/") for e in endpoints] if endpoints else [
+            NETWORK_ENDPOINTS.get(network, NETWORK_ENDPOINTS["testnet"])
+        ]
+        self.hedger = HedgedExecutor(hedge_policy)
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @classmethod
+    def from_env(cls, network: str = "testnet") -> "FlowAccessClient":
+        """
+        Configura pelo ambiente: FLOW_ACCESS_NODES (URLs separadas por vírgula)
+        e FLOW_HEDGING=1 para ligar o hedging.
+        """
+        nodes = [n.strip() for n in os.environ.get("FLOW_ACCESS_NODES", "").split(",") if n.strip()]
+        return cls(
+            network,
+            endpoints=nodes or None,
+            hedge_policy=HedgePolicy(enabled=os.environ.get("FLOW_HEDGING") == "1"),
+        )
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(
+        self, attempt: int, method: str, path: str, payload: Optional[Dict[str, Any]] = None
+    ) -> Any:
+        """Uma tentativa; ``attempt`` escolhe o endpoint. None para 404."""
+        url = self.endpoints[attempt % len(self.endpoints)] + path
+        async with self._get_session().request(method, url, json=payload) as response:
+            if response.status == 404:
+                return None
+            if response.status >= 400:
+                raise FlowAccessError(response.status, (await response.text())[:200])
+            return await response.json()
+
+    async def get_account(self, address: str) -> Optional[Dict[str, Any]]:
+        """Conta (saldo, chaves, contratos) ou None se não existir."""
+        address = address[2:] if address.startswith("0x") else address
+        return await self.hedger.run(
+            "get_account",
+            lambda attempt: self._request(attempt, "GET", f"/v1/accounts/{address}")
+        )
+
+    async def get_latest_block(self, sealed: bool = True) -> Dict[str, Any]:
+        """Cabeçalho do último bloco selado (ou finalizado)."""
+        height = "sealed" if sealed else "final"
+        blocks = await self.hedger.run(
+            "get_latest_block",
+            lambda attempt: self._request(attempt, "GET", f"/v1/blocks?height={height}")
+        )
+        if not blocks:
+            raise FlowAccessError(404, "Nenhum bloco retornado")
+        return blocks[0]
+
+    async def execute_script(self, code: str, arguments: Optional[List[Dict[str, Any]]] = None) -> Any:
+        """
+        Executa um script Cadence (somente leitura) no último bloco selado.
+
+        Args:
+            code: Código do script
+            arguments: Argumentos em JSON-Cadence, ex. {"type": "Address", "value": "0x01"}
+
+        Returns:
+            Resultado decodificado em JSON-Cadence
+        """
+        payload = {
+            "script": base64.b64encode(code.encode()).decode(),
+            "arguments": [
+                base64.b64encode(json.dumps(arg).encode()).decode()
+                for arg in arguments or []
+            ],
+        }
+        encoded = await self.hedger.run(
+            "execute_script",
+            lambda attempt: self._request(attempt, "POST", "/v1/scripts?block_height=sealed", payload)
+        )
+        return json.loads(base64.b64decode(encoded))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"endpoints": self.endpoints, "hedging": self.hedger.get_stats()}
@@ -0,0 +1,6 @@
+"""Pytest configuration for API tests."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,140 @@
+"""Test suite for the adaptive concurrency limiter queue and limit updates."""
+
+import asyncio
+
+import pytest
+
+from core.adaptive_limiter import (
+    AdaptiveConcurrencyLimiter,
+    AdaptiveLimitConfig,
+    ConcurrencyLimitExceeded,
+)
+
+
+def make_limiter(**overrides) -> AdaptiveConcurrencyLimiter:
+    # Machine load must not influence the limit during tests
+    settings = dict(
+        initial_limit=1, min_limit=1, max_limit=1, max_queue_size=2,
+        queue_timeout_seconds=5.0, cpu_high_percent=101.0, memory_high_percent=101.0
+    )
+    settings.update(overrides)
+    return AdaptiveConcurrencyLimiter(AdaptiveLimitConfig(**settings))
+
+
+class TestQueueing:
+    @pytest.mark.asyncio
+    async def test_sheds_when_queue_full(self):
+        limiter = make_limiter(max_queue_size=1)
+        slot = await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queue_depth == 1
+
+        with pytest.raises(ConcurrencyLimitExceeded) as exc_info:
+            await limiter.acquire()
+        assert exc_info.value.retry_after >= 1.0
+        assert limiter.get_status()["shed"] == 1
+
+        slot.release()
+        (await waiter).release()
+        assert limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout(self):
+        limiter = make_limiter()
+        slot = await limiter.acquire()
+
+        with pytest.raises(ConcurrencyLimitExceeded) as exc_info:
+            await limiter.acquire(timeout=0.01)
+        assert exc_info.value.retry_after >= 1.0
+        assert limiter.queue_depth == 0
+        assert limiter.in_flight == 1
+
+        slot.release()
+        assert limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_cancel_while_queued(self):
+        limiter = make_limiter()
+        slot = await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.queue_depth == 0
+        assert limiter.in_flight == 1
+
+        slot.release()
+        assert limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_cancel_after_slot_granted(self):
+        """A caller cancelled right after being woken never leaks the slot."""
+        limiter = make_limiter()
+        slot = await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+
+        slot.release()
+        assert limiter.in_flight == 1  # Granted to the waiter
+        waiter.cancel()
+        try:
+            # Some Python versions let wait_for deliver the result instead
+            (await waiter).release()
+        except asyncio.CancelledError:
+            pass
+        assert limiter.in_flight == 0
+        assert limiter.queue_depth == 0
+
+    @pytest.mark.asyncio
+    async def test_cancel_racing_grant_returns_slot(self):
+        """Cancellation delivered before the grant is seen gives the slot back."""
+        limiter = make_limiter()
+        slot = await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        slot.release()  # Grants the slot before the waiter observes the cancel
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.in_flight == 0
+        assert limiter.queue_depth == 0
+
+    @pytest.mark.asyncio
+    async def test_release_is_idempotent(self):
+        limiter = make_limiter()
+        slot = await limiter.acquire()
+        slot.release(error=True)
+        slot.release(error=True)
+        assert limiter.in_flight == 0
+        assert limiter.get_status()["errors"] == 1
+
+
+class TestLimitUpdates:
+    @pytest.mark.asyncio
+    async def test_error_lowers_limit(self):
+        limiter = make_limiter(initial_limit=4, max_limit=10)
+        slot = await limiter.acquire()
+        slot.release(error=True)
+        assert limiter.limit == 3
+        assert limiter.get_status()["limit_decreases"] == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_ttft_lowers_limit(self):
+        limiter = make_limiter(initial_limit=4, max_limit=10, ttft_threshold_seconds=0.5)
+        slot = await limiter.acquire()
+        slot.first_token_at = slot.started_at + 1.0
+        slot.release()
+        assert limiter.limit == 3
+
+    @pytest.mark.asyncio
+    async def test_fast_turns_at_limit_raise_it(self):
+        limiter = make_limiter(initial_limit=1, max_limit=10)
+        for _ in range(2):
+            slot = await limiter.acquire()
+            slot.mark_first_token()
+            slot.release()
+        assert limiter.limit == 2
@@ -0,0 +1,85 @@
+"""Test suite for hedged reads and the hedge budget."""
+
+import asyncio
+
+import pytest
+
+from core.hedging import HedgedExecutor, HedgePolicy
+
+
+def make_policy(**overrides) -> HedgePolicy:
+    settings = dict(enabled=True, min_delay=0.01, max_delay=0.02)
+    settings.update(overrides)
+    return HedgePolicy(**settings)
+
+
+class TestHedgedExecutor:
+    @pytest.mark.asyncio
+    async def test_hedge_wins_and_primary_cancelled(self):
+        hedger = HedgedExecutor(make_policy())
+        cancelled = []
+
+        async def attempt(n):
+            if n == 0:
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.append(n)
+                    raise
+            return f"attempt-{n}"
+
+        assert await hedger.run("read", attempt) == "attempt-1"
+        await asyncio.sleep(0)
+        assert cancelled == [0]
+
+        stats = hedger.get_stats()["operations"]["read"]
+        assert stats["hedged"] == 1
+        assert stats["hedge_won"] == 1
+
+    @pytest.mark.asyncio
+    async def test_hedge_denied_when_budget_empty(self):
+        hedger = HedgedExecutor(make_policy(budget_burst=0.0))
+        attempts = []
+
+        async def attempt(n):
+            attempts.append(n)
+            await asyncio.sleep(0.05)
+            return n
+
+        assert await hedger.run("read", attempt) == 0
+        assert attempts == [0]
+
+        stats = hedger.get_stats()["operations"]["read"]
+        assert stats["hedged"] == 0
+        assert stats["budget_denied"] == 1
+
+    @pytest.mark.asyncio
+    async def test_fast_primary_error_raised_without_hedge(self):
+        hedger = HedgedExecutor(make_policy())
+        attempts = []
+
+        async def attempt(n):
+            attempts.append(n)
+            raise ValueError("access node down")
+
+        with pytest.raises(ValueError):
+            await hedger.run("read", attempt)
+        assert attempts == [0]
+
+        stats = hedger.get_stats()["operations"]["read"]
+        assert stats["hedged"] == 0
+        assert stats["errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_disabled_policy_runs_single_attempt(self):
+        hedger = HedgedExecutor(HedgePolicy(enabled=False, max_delay=0.01))
+        attempts = []
+
+        async def attempt(n):
+            attempts.append(n)
+            await asyncio.sleep(0.05)
+            return n
+
+        assert await hedger.run("read", attempt) == 0
+        assert attempts == [0]
+        assert hedger.get_stats()["operations"]["read"]["hedged"] == 0
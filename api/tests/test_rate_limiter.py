@@ -0,0 +1,171 @@
+"""Test suite for the GCRA in-memory limiter and the Redis Lua script path."""
+
+import os
+import types
+import uuid
+
+import pytest
+import pytest_asyncio
+
+from middleware import rate_limiter
+from middleware.rate_limiter import GCRARateLimiter, RateLimitRule, RedisRateLimiter
+
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379")
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # Only the limiter module sees the fake clock; the event loop keeps the real one
+    monkeypatch.setattr(rate_limiter, "time", types.SimpleNamespace(monotonic=clock))
+    return clock
+
+
+class TestGCRARateLimiter:
+    @pytest.mark.asyncio
+    async def test_burst_then_blocked_then_recovers(self, clock):
+        limiter = GCRARateLimiter(RateLimitRule(requests_per_minute=5, block_duration_seconds=0))
+
+        remaining = []
+        for _ in range(5):
+            result = await limiter.check_rate_limit("client")
+            assert result.allowed
+            remaining.append(result.requests_remaining)
+        assert remaining == [4, 3, 2, 1, 0]
+
+        result = await limiter.check_rate_limit("client")
+        assert not result.allowed
+        assert result.retry_after_seconds == 12  # One emission interval
+
+        clock.now += 12
+        assert (await limiter.check_rate_limit("client")).allowed
+        assert not (await limiter.check_rate_limit("client")).allowed
+
+    @pytest.mark.asyncio
+    async def test_overflow_blocks_for_block_duration(self, clock):
+        limiter = GCRARateLimiter(RateLimitRule(requests_per_minute=5, block_duration_seconds=300))
+        for _ in range(5):
+            assert (await limiter.check_rate_limit("client")).allowed
+
+        result = await limiter.check_rate_limit("client")
+        assert not result.allowed
+        assert result.retry_after_seconds == 300
+
+        # Retrying during the block does not extend it
+        clock.now += 100
+        assert (await limiter.check_rate_limit("client")).retry_after_seconds == 200
+
+        clock.now += 200
+        assert (await limiter.check_rate_limit("client")).allowed
+
+    @pytest.mark.asyncio
+    async def test_clients_are_independent(self, clock):
+        limiter = GCRARateLimiter(RateLimitRule(requests_per_minute=1))
+        assert (await limiter.check_rate_limit("a")).allowed
+        assert not (await limiter.check_rate_limit("a")).allowed
+        assert (await limiter.check_rate_limit("b")).allowed
+
+    @pytest.mark.asyncio
+    async def test_cleanup_drops_expired_clients(self, clock):
+        limiter = GCRARateLimiter(RateLimitRule(requests_per_minute=60), shards=4)
+        await limiter.check_rate_limit("client")
+        assert len(limiter) == 1
+
+        clock.now += 2
+        await limiter.cleanup_old_data()
+        assert len(limiter) == 0
+
+    def test_shards_must_be_power_of_two(self):
+        with pytest.raises(ValueError):
+            GCRARateLimiter(RateLimitRule(), shards=3)
+
+
+class FakeScript:
+    """Stands in for the registered script and records its calls."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+
+    async def __call__(self, keys, args):
+        self.calls.append((keys, args))
+        return self.reply
+
+
+class TestRedisRateLimiter:
+    @pytest.mark.asyncio
+    async def test_script_reply_mapped_to_result(self):
+        limiter = RedisRateLimiter(RateLimitRule(requests_per_minute=10, block_duration_seconds=60))
+        limiter.redis_client = object()
+        limiter._script = FakeScript([1, 7, 3, b"42.5"])
+
+        result = await limiter.check_rate_limit("client")
+        assert result.allowed
+        assert result.requests_remaining == 7
+        assert result.current_usage == 3
+
+        keys, args = limiter._script.calls[0]
+        # The hash tag keeps both keys in the same cluster slot
+        assert keys == ["rate_limit:{client}", "rate_limit:blocked:{client}"]
+        assert args[:3] == [10, 60, 60]
+
+    @pytest.mark.asyncio
+    async def test_script_denial_sets_retry_after(self):
+        limiter = RedisRateLimiter(RateLimitRule(requests_per_minute=10))
+        limiter.redis_client = object()
+        limiter._script = FakeScript([0, 0, 10, b"12.2"])
+
+        result = await limiter.check_rate_limit("client")
+        assert not result.allowed
+        assert result.retry_after_seconds == 13
+
+    @pytest.mark.asyncio
+    async def test_requires_connection(self):
+        with pytest.raises(RuntimeError):
+            await RedisRateLimiter(RateLimitRule()).check_rate_limit("client")
+
+
+@pytest_asyncio.fixture
+async def redis_limiter():
+    limiter = RedisRateLimiter(
+        RateLimitRule(requests_per_minute=3, block_duration_seconds=30), REDIS_URL
+    )
+    try:
+        await limiter.connect()
+    except Exception:
+        pytest.skip(f"Redis not available at {REDIS_URL}")
+    limiter.prefix = f"test_rate_limit:{uuid.uuid4().hex}:"
+    yield limiter
+    keys = [key async for key in limiter.redis_client.scan_iter(f"{limiter.prefix}*")]
+    if keys:
+        await limiter.redis_client.delete(*keys)
+    await limiter.redis_client.aclose()
+
+
+class TestRateLimitScript:
+    @pytest.mark.asyncio
+    async def test_window_then_block(self, redis_limiter):
+        remaining = []
+        for _ in range(3):
+            result = await redis_limiter.check_rate_limit("client")
+            assert result.allowed
+            remaining.append(result.requests_remaining)
+        assert remaining == [2, 1, 0]
+
+        result = await redis_limiter.check_rate_limit("client")
+        assert not result.allowed
+        assert result.retry_after_seconds == 30
+
+        # While blocked, the remaining TTL becomes the Retry-After
+        result = await redis_limiter.check_rate_limit("client")
+        assert not result.allowed
+        assert 1 <= result.retry_after_seconds <= 30
+        assert (await redis_limiter.check_rate_limit("other")).allowed
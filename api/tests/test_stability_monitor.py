@@ -0,0 +1,138 @@
+"""Test suite for the sliding-window circuit breaker state machine."""
+
+import asyncio
+
+import pytest
+
+from monitoring.stability_monitor import (
+    CircuitBreakerOpenException,
+    CircuitState,
+    SlidingWindowCircuitBreaker,
+    SlidingWindowConfig,
+)
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    config = SlidingWindowConfig(
+        window_seconds=60.0, bucket_seconds=5.0, minimum_calls=4,
+        failure_rate_threshold=0.5, slow_call_duration=10.0,
+        open_seconds=30.0, half_open_max_calls=2
+    )
+    return SlidingWindowCircuitBreaker("test", config, clock=clock)
+
+
+def trip(breaker):
+    for _ in range(4):
+        breaker.record(breaker.acquire(), failed=True)
+    assert breaker.state == CircuitState.OPEN
+
+
+class TestSlidingWindowCircuitBreaker:
+    """Test transitions between CLOSED, OPEN and HALF_OPEN."""
+
+    def test_opens_on_failure_rate_after_minimum_calls(self, breaker):
+        """Failures below minimum_calls do not open; reaching the rate does."""
+        for _ in range(2):
+            breaker.record(breaker.acquire(), failed=False)
+        breaker.record(breaker.acquire(), failed=True)
+        assert breaker.state == CircuitState.CLOSED
+        breaker.record(breaker.acquire(), failed=True)
+        assert breaker.state == CircuitState.OPEN
+
+        with pytest.raises(CircuitBreakerOpenException) as exc:
+            breaker.acquire()
+        assert exc.value.retry_after == pytest.approx(30.0)
+
+    def test_old_failures_leave_the_window(self, breaker, clock):
+        """Buckets older than window_seconds stop counting."""
+        for _ in range(3):
+            breaker.record(breaker.acquire(), failed=True)
+        clock.now += 61
+        breaker.record(breaker.acquire(), failed=True)
+        assert breaker.state == CircuitState.CLOSED
+        assert breaker.rates()["calls"] == 1
+
+    def test_half_open_probes_close_or_reopen(self, breaker, clock):
+        """All probes succeeding closes; a failing probe reopens."""
+        trip(breaker)
+        clock.now += 30
+        breaker.record(breaker.acquire(), failed=True)
+        assert breaker.state == CircuitState.OPEN
+
+        clock.now += 30
+        probes = [breaker.acquire(), breaker.acquire()]
+        assert breaker.state == CircuitState.HALF_OPEN
+        with pytest.raises(CircuitBreakerOpenException):
+            breaker.acquire()
+        for started in probes:
+            breaker.record(started, failed=False)
+        assert breaker.state == CircuitState.CLOSED
+        assert breaker.rates()["calls"] == 0
+
+    def test_release_returns_probe_slot(self, breaker, clock):
+        """A cancelled probe frees its slot without counting as a result."""
+        trip(breaker)
+        clock.now += 30
+        first = breaker.acquire()
+        breaker.acquire()
+        breaker.release(first)
+        breaker.acquire()
+        assert breaker.state == CircuitState.HALF_OPEN
+
+    def test_leaked_probes_reopen_after_deadline(self, breaker, clock):
+        """Probes that never report cannot wedge the breaker in HALF_OPEN."""
+        trip(breaker)
+        clock.now += 30
+        breaker.acquire()
+        breaker.acquire()
+        with pytest.raises(CircuitBreakerOpenException):
+            breaker.acquire()
+
+        clock.now += 30
+        with pytest.raises(CircuitBreakerOpenException):
+            breaker.acquire()
+        assert breaker.state == CircuitState.OPEN
+
+        clock.now += 30
+        breaker.record(breaker.acquire(), failed=False)
+        breaker.record(breaker.acquire(), failed=False)
+        assert breaker.state == CircuitState.CLOSED
+
+    def test_calls_started_before_opening_are_ignored(self, breaker, clock):
+        """A slow call that began while CLOSED does not affect HALF_OPEN."""
+        early = breaker.acquire()
+        clock.now += 1
+        trip(breaker)
+        clock.now += 30
+        probe = breaker.acquire()
+        breaker.record(early, failed=True)
+        assert breaker.state == CircuitState.HALF_OPEN
+        breaker.record(probe, failed=False)
+
+    @pytest.mark.asyncio
+    async def test_execute_releases_on_cancellation(self, breaker, clock):
+        """Cancelling a protected call returns its probe slot."""
+        trip(breaker)
+        clock.now += 30
+
+        task = asyncio.ensure_future(breaker.execute(asyncio.sleep, 10))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert breaker.half_open_in_flight == 0
+        assert breaker.state == CircuitState.HALF_OPEN
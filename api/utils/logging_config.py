@@ -2,23 +2,37 @@
 Configuração de logging estruturado para API Claude Code SDK.
 
 Sistema de logging com formatação JSON, rotação automática e níveis apropriados.
+Por padrão os records são apenas enfileirados na thread da request; formatação
+JSON e escrita em lote acontecem numa thread de background.
+Eventos de hot path podem ser amostrados ou limitados por nome de evento
+(``configure_log_event``).
 """
 
+import atexit
 import logging
 import logging.handlers
 import json
+import queue
+import os
 import sys
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional, Union
 import traceback
 import uuid
 from contextvars import ContextVar
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sdk'))
+
+from claude_code_sdk.logging import EventPolicy
+
 # Context variables para rastreamento de requests
 request_id: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
 session_id: ContextVar[Optional[str]] = ContextVar('session_id', default=None)
 user_ip: ContextVar[Optional[str]] = ContextVar('user_ip', default=None)
+request_route: ContextVar[Optional[str]] = ContextVar('request_route', default=None)
 
 class StructuredFormatter(logging.Formatter):
     """Formatter personalizado que produz logs em formato JSON estruturado."""
@@ -28,7 +42,7 @@ class StructuredFormatter(logging.Formatter):
         
         # Dados básicos do log
         log_data = {
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'timestamp': datetime.utcfromtimestamp(record.created).isoformat() + 'Z',
             'level': record.levelname,
             'logger': record.name,
             'message': record.getMessage(),
@@ -39,16 +53,18 @@ class StructuredFormatter(logging.Formatter):
             'thread_id': record.thread,
         }
         
-        # Adiciona contexto da request se disponível
-        req_id = request_id.get()
+        # Adiciona contexto da request (capturado ao enfileirar, se em background)
+        if hasattr(record, 'ctx_request_id'):
+            req_id, sess_id, ip = record.ctx_request_id, record.ctx_session_id, record.ctx_user_ip
+        else:
+            req_id, sess_id, ip = request_id.get(), session_id.get(), user_ip.get()
+        
         if req_id:
             log_data['request_id'] = req_id
             
-        sess_id = session_id.get()
         if sess_id:
             log_data['session_id'] = sess_id
             
-        ip = user_ip.get()
         if ip:
             log_data['client_ip'] = ip
         
@@ -73,8 +89,59 @@ class StructuredFormatter(logging.Formatter):
             
         return json.dumps(log_data, ensure_ascii=False)
 
+# Política de emissão por evento (a cada N, amostragem, token bucket):
+# a mesma implementação do SDK, para as duas não divergirem
+LogEventPolicy = EventPolicy
+
+
+# Políticas por nome de evento (compartilhadas por todos os ContextualLogger)
+_event_policies: Dict[str, LogEventPolicy] = {}
+
+
+def configure_log_event(
+    event: str,
+    sample_rate: float = 1.0,
+    rate_per_second: Optional[float] = None,
+    burst: Optional[int] = None,
+    every_n: Optional[int] = None,
+    replace: bool = True
+) -> LogEventPolicy:
+    """
+    Configura amostragem/limite de taxa para um evento.
+    
+    Com ``replace=False`` uma política já existente é mantida, o que permite
+    que módulos registrem padrões sem sobrescrever a configuração da aplicação.
+    
+    Exemplo:
+        configure_log_event("client_from_pool", every_n=100)
+        configure_log_event("session_created", rate_per_second=5, burst=20)
+    """
+    if not replace and event in _event_policies:
+        return _event_policies[event]
+    policy = LogEventPolicy(sample_rate, rate_per_second, burst, every_n)
+    _event_policies[event] = policy
+    return policy
+
+
+def get_log_event_stats() -> Dict[str, Dict[str, int]]:
+    """Ocorrências e supressões por evento configurado."""
+    return {
+        event: {"occurrences": policy.occurrences, "suppressed": policy.suppressed_total}
+        for event, policy in _event_policies.items()
+    }
+
+
+LogExtra = Union[Dict[str, Any], Callable[[], Dict[str, Any]], None]
+
+
 class ContextualLogger:
-    """Logger que inclui automaticamente informações de contexto."""
+    """
+    Logger que inclui automaticamente informações de contexto.
+    
+    ``extra`` pode ser um dict ou uma função sem argumentos que retorna o
+    dict; a função só é chamada se o record for de fato emitido (nível
+    habilitado e evento não suprimido pela política).
+    """
     
     def __init__(self, name: str):
         self.logger = logging.getLogger(name)
@@ -91,36 +158,212 @@ class ContextualLogger:
                 
         return context
     
-    def debug(self, message: str, extra: Optional[Dict[str, Any]] = None, **kwargs):
-        """Log de debug com contexto."""
+    def _log(
+        self,
+        level: int,
+        message: str,
+        extra: LogExtra,
+        event: Optional[str],
+        **kwargs
+    ):
+        if not self.logger.isEnabledFor(level):
+            return
+        
+        if event is None and isinstance(extra, dict):
+            event = extra.get('event')
+        
+        counters = None
+        if event is not None:
+            policy = _event_policies.get(event)
+            if policy is not None:
+                counters = policy.admit()
+                if counters is None:
+                    return
+                if not (counters["suppressed"] or policy.every_n):
+                    counters = None
+        
+        if callable(extra):
+            extra = extra()
         extra_data = self._add_context(extra)
-        self.logger.debug(message, extra={'extra_data': extra_data}, **kwargs)
+        if event is not None:
+            extra_data.setdefault('event', event)
+        if counters is not None:
+            extra_data['log_sampling'] = counters
+        self.logger.log(level, message, extra={'extra_data': extra_data}, stacklevel=3, **kwargs)
+    
+    def debug(self, message: str, extra: LogExtra = None, event: Optional[str] = None, **kwargs):
+        """Log de debug com contexto."""
+        self._log(logging.DEBUG, message, extra, event, **kwargs)
         
-    def info(self, message: str, extra: Optional[Dict[str, Any]] = None, **kwargs):
+    def info(self, message: str, extra: LogExtra = None, event: Optional[str] = None, **kwargs):
         """Log de info com contexto."""
-        extra_data = self._add_context(extra)
-        self.logger.info(message, extra={'extra_data': extra_data}, **kwargs)
+        self._log(logging.INFO, message, extra, event, **kwargs)
         
-    def warning(self, message: str, extra: Optional[Dict[str, Any]] = None, **kwargs):
+    def warning(self, message: str, extra: LogExtra = None, event: Optional[str] = None, **kwargs):
         """Log de warning com contexto."""
-        extra_data = self._add_context(extra)
-        self.logger.warning(message, extra={'extra_data': extra_data}, **kwargs)
+        self._log(logging.WARNING, message, extra, event, **kwargs)
         
-    def error(self, message: str, extra: Optional[Dict[str, Any]] = None, exc_info: bool = True, **kwargs):
+    def error(self, message: str, extra: LogExtra = None, exc_info: bool = True, event: Optional[str] = None, **kwargs):
         """Log de erro com contexto e stack trace."""
-        extra_data = self._add_context(extra)
-        self.logger.error(message, extra={'extra_data': extra_data}, exc_info=exc_info, **kwargs)
+        self._log(logging.ERROR, message, extra, event, exc_info=exc_info, **kwargs)
         
-    def critical(self, message: str, extra: Optional[Dict[str, Any]] = None, exc_info: bool = True, **kwargs):
+    def critical(self, message: str, extra: LogExtra = None, exc_info: bool = True, event: Optional[str] = None, **kwargs):
         """Log crítico com contexto."""
-        extra_data = self._add_context(extra)
-        self.logger.critical(message, extra={'extra_data': extra_data}, exc_info=exc_info, **kwargs)
+        self._log(logging.CRITICAL, message, extra, event, exc_info=exc_info, **kwargs)
+
+class BatchingStreamHandler(logging.StreamHandler):
+    """StreamHandler sem flush por record; o listener faz flush por lote."""
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+class BatchingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler que formata uma vez e não faz flush por record."""
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            msg = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self.stream.tell() + len(msg) >= self.maxBytes:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(msg)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que só faz a captura barata na thread da request.
+    
+    Resolve a mensagem e guarda o contexto (contextvars não são visíveis na
+    thread do listener); exceções são formatadas depois, no listener.
+    Com a fila cheia o record é descartado e contado, sem bloquear.
+    """
+    
+    def __init__(self, log_queue: "queue.Queue"):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        record.ctx_request_id = request_id.get()
+        record.ctx_session_id = session_id.get()
+        record.ctx_user_ip = user_ip.get()
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BackgroundLogListener:
+    """
+    Consome a fila de logs numa thread própria.
+    
+    Processa records em lotes, repassa a cada handler respeitando o nível
+    dele e faz flush no máximo a cada ``flush_interval`` segundos (ou quando
+    a fila fica ociosa), em vez de um flush por record.
+    """
+    
+    _STOP = object()
+    
+    def __init__(
+        self,
+        log_queue: "queue.Queue",
+        handlers: List[logging.Handler],
+        flush_interval: float = 0.5,
+        batch_size: int = 256
+    ):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="log-listener", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5.0) -> None:
+        """Escreve o que estiver pendente e encerra a thread."""
+        if self._thread and self._thread.is_alive():
+            self.queue.put(self._STOP)
+            self._thread.join(timeout)
+        self._thread = None
+        self._flush()
+    
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        pending = False
+        
+        while True:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if pending:
+                    self._flush()
+                    pending = False
+                last_flush = time.monotonic()
+                continue
+            
+            batch = [record]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stop = False
+            for record in batch:
+                if record is self._STOP:
+                    stop = True
+                    continue
+                for handler in self.handlers:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+                pending = True
+            
+            now = time.monotonic()
+            if pending and (stop or now - last_flush >= self.flush_interval):
+                self._flush()
+                pending = False
+                last_flush = now
+            if stop:
+                return
+    
+    def _flush(self) -> None:
+        for handler in self.handlers:
+            try:
+                handler.flush()
+            except Exception:
+                pass
+
+
+_listener: Optional[BackgroundLogListener] = None
+
 
 def setup_logging(
     level: str = "INFO",
     log_file: Optional[str] = None,
     max_bytes: int = 10 * 1024 * 1024,  # 10MB
-    backup_count: int = 5
+    backup_count: int = 5,
+    queued: bool = True,
+    flush_interval: float = 0.5,
+    max_queue_size: int = 10000
 ) -> None:
     """
     Configura sistema de logging estruturado.
@@ -130,12 +373,17 @@ def setup_logging(
         log_file: Caminho para arquivo de log (opcional)
         max_bytes: Tamanho máximo do arquivo antes da rotação
         backup_count: Número de arquivos de backup a manter
+        queued: Formata e escreve numa thread de background
+        flush_interval: Intervalo máximo entre flushes no modo em fila
+        max_queue_size: Records em espera antes de descartar novos
     """
+    global _listener
     
     # Remove handlers existentes
     root_logger = logging.getLogger()
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
+    shutdown_logging()
     
     # Define nível de logging
     log_level = getattr(logging, level.upper(), logging.INFO)
@@ -143,19 +391,23 @@ def setup_logging(
     
     # Formatter estruturado
     formatter = StructuredFormatter()
+    handlers: List[logging.Handler] = []
     
     # Handler para console
-    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler = (BatchingStreamHandler if queued else logging.StreamHandler)(sys.stdout)
     console_handler.setFormatter(formatter)
     console_handler.setLevel(log_level)
-    root_logger.addHandler(console_handler)
+    handlers.append(console_handler)
     
     # Handler para arquivo com rotação (se especificado)
     if log_file:
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
         
-        file_handler = logging.handlers.RotatingFileHandler(
+        file_handler_class = (
+            BatchingRotatingFileHandler if queued else logging.handlers.RotatingFileHandler
+        )
+        file_handler = file_handler_class(
             log_file,
             maxBytes=max_bytes,
             backupCount=backup_count,
@@ -163,11 +415,31 @@ def setup_logging(
         )
         file_handler.setFormatter(formatter)
         file_handler.setLevel(log_level)
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
+    
+    if queued:
+        log_queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        root_logger.addHandler(ContextQueueHandler(log_queue))
+        _listener = BackgroundLogListener(log_queue, handlers, flush_interval=flush_interval)
+        _listener.start()
+    else:
+        for handler in handlers:
+            root_logger.addHandler(handler)
     
     # Configura loggers específicos
     _configure_specific_loggers()
 
+
+def shutdown_logging() -> None:
+    """Escreve os logs pendentes e para a thread de background."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
 def _configure_specific_loggers():
     """Configura loggers para módulos específicos."""
     
@@ -202,7 +474,12 @@ def get_contextual_logger(name: str) -> ContextualLogger:
     """
     return ContextualLogger(name)
 
-def set_request_context(req_id: str, sess_id: Optional[str] = None, client_ip: Optional[str] = None):
+def set_request_context(
+    req_id: str,
+    sess_id: Optional[str] = None,
+    client_ip: Optional[str] = None,
+    route: Optional[str] = None
+):
     """
     Define contexto da request atual.
     
@@ -210,18 +487,22 @@ def set_request_context(req_id: str, sess_id: Optional[str] = None, client_ip: O
         req_id: ID único da request
         sess_id: ID da sessão (opcional)
         client_ip: IP do cliente (opcional)
+        route: Método e caminho, ex. "POST /api/chat" (opcional)
     """
     request_id.set(req_id)
     if sess_id:
         session_id.set(sess_id)
     if client_ip:
         user_ip.set(client_ip)
+    if route:
+        request_route.set(route)
 
 def clear_request_context():
     """Limpa contexto da request."""
     request_id.set(None)
     session_id.set(None)
     user_ip.set(None)
+    request_route.set(None)
 
 def generate_request_id() -> str:
     """Gera ID único para a request."""